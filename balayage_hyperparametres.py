@@ -0,0 +1,168 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import numpy
+import spacy
+
+from fine_tuner_spacy import (CHEMIN_DONNEES_ENTRAINEMENT, MODELES_SPACY_FR, PROPORTION_DEV, charger_donnees_entrainement,
+                              entrainer_ner, preparer_composant_ner)
+
+# --- Configuration ---
+# Espace de recherche par défaut : valeurs essayées pour chaque paramètre (lots de taille fixe)
+ESPACE_RECHERCHE = {
+    "modele": list(MODELES_SPACY_FR.values()),
+    "iterations": [5, 10, 20],
+    "dropout": [0.2, 0.35, 0.5],
+    "taille_lot": [4, 8, 32],
+}
+CHEMIN_RESULTATS = "resultats_balayage.csv"
+GRAINE = 0 # Tirage des essais (recherche aléatoire) et initialisation de chaque essai
+# Pendant un balayage, chaque essai va jusqu'à son nombre d'itérations (pas d'arrêt anticipé) ;
+# son score est celui de sa meilleure itération sur le jeu de dev, identique pour tous les essais.
+PATIENCE_BALAYAGE = 0
+COLONNES_RESULTATS = ["essai", "modele", "iterations", "dropout", "taille_lot", "precision", "rappel", "f", "duree_s", "erreur"]
+
+_chemin_donnees_worker = None
+_donnees_par_modele = {} # Données d'entraînement chargées une fois par processus de travail et par modèle de base (validées avec son tokeniseur)
+
+
+def _initialiser_worker(chemin_donnees):
+    global _chemin_donnees_worker
+    _chemin_donnees_worker = chemin_donnees
+    _donnees_par_modele.clear()
+
+
+def donnees_worker(nlp, modele):
+    if modele not in _donnees_par_modele:
+        _donnees_par_modele[modele] = charger_donnees_entrainement(_chemin_donnees_worker, nlp)
+    return _donnees_par_modele[modele]
+
+
+def generer_essais(espace, nb_aleatoires=0, graine=GRAINE):
+    """
+    Liste des essais ({paramètre: valeur}) : toute la grille, ou `nb_aleatoires` combinaisons distinctes
+    tirées au hasard dans la grille (recherche aléatoire, reproductible avec `graine`).
+    """
+    noms = list(espace)
+    grille = [dict(zip(noms, valeurs)) for valeurs in itertools.product(*(espace[nom] for nom in noms))]
+    if nb_aleatoires and nb_aleatoires < len(grille):
+        return random.Random(graine).sample(grille, nb_aleatoires)
+    return grille
+
+
+def executer_essai(tache):
+    """
+    Entraîne un modèle pour une combinaison de paramètres et l'évalue sur le jeu de dev (le même pour tous les essais,
+    voir fine_tuner_spacy.separer_dev). Le modèle n'est pas sauvegardé. Retourne une ligne du tableau de résultats.
+    Un essai qui échoue est noté dans la colonne `erreur` : il n'interrompt pas le balayage.
+    L'essai est reproductible : `random`, numpy et l'ordre de lecture des sources en flux (.jsonl, DocBin) partent de `graine` + numéro.
+    """
+    numero, parametres, proportion_dev, graine = tache
+    resultat = dict(parametres, essai=numero, precision="", rappel="", f="", duree_s="", erreur="")
+    random.seed(graine + numero)
+    numpy.random.seed(graine + numero)
+    debut = time.perf_counter()
+    try:
+        nlp = spacy.load(parametres["modele"])
+    except OSError:
+        resultat["erreur"] = f"modèle '{parametres['modele']}' introuvable"
+        return resultat
+    try:
+        donnees = donnees_worker(nlp, parametres["modele"])
+        if hasattr(donnees, "rng"):
+            donnees.rng.seed(graine + numero) # Source partagée par les essais du processus : son ordre de lecture repart de la graine de l'essai
+        journal_muet = lambda message: None
+        preparer_composant_ner(nlp, donnees, journal=journal_muet)
+        scores = entrainer_ner(nlp, donnees, parametres["iterations"], parametres["dropout"], parametres["taille_lot"],
+                               journal=journal_muet, proportion_dev=proportion_dev, patience=PATIENCE_BALAYAGE)
+    except Exception as e:
+        resultat.update(duree_s=round(time.perf_counter() - debut, 1), erreur=f"{type(e).__name__} : {e}")
+        return resultat
+    resultat["duree_s"] = round(time.perf_counter() - debut, 1)
+    if scores is None:
+        resultat["erreur"] = "pas de jeu de dev"
+    else:
+        resultat.update(precision=round(scores["ents_p"], 4), rappel=round(scores["ents_r"], 4), f=round(scores["ents_f"], 4))
+    return resultat
+
+
+def lancer_balayage(chemin_donnees, essais, n_process=None, proportion_dev=PROPORTION_DEV, graine=GRAINE):
+    """
+    Exécute les essais en parallèle sur `n_process` processus (par défaut, un par cœur disponible).
+    Les données sont validées ici une fois par modèle de base (avec son tokeniseur), puis chargées une fois par processus
+    et par modèle. Retourne les résultats, meilleur F en tête.
+    """
+    for modele in dict.fromkeys(essai["modele"] for essai in essais): # Index de validation calculés une fois pour tous les processus
+        try:
+            charger_donnees_entrainement(chemin_donnees, spacy.load(modele))
+        except (OSError, ValueError):
+            pass # Modèle absent ou corpus DocBin d'un autre tokeniseur : signalé par chaque essai qui l'utilise
+    n_process = max(1, min(n_process or os.cpu_count() or 1, len(essais)))
+    taches = [(numero, parametres, proportion_dev, graine) for numero, parametres in enumerate(essais, 1)]
+    print(f"{len(essais)} essais sur {n_process} processus...")
+
+    resultats = []
+    if n_process > 1:
+        with Pool(n_process, initializer=_initialiser_worker, initargs=(chemin_donnees,)) as pool:
+            for resultat in pool.imap_unordered(executer_essai, taches):
+                afficher_avancement(resultat, len(resultats) + 1, len(essais))
+                resultats.append(resultat)
+    else:
+        _initialiser_worker(chemin_donnees)
+        for tache in taches:
+            resultat = executer_essai(tache)
+            afficher_avancement(resultat, len(resultats) + 1, len(essais))
+            resultats.append(resultat)
+    return sorted(resultats, key=lambda r: (r["f"] == "", -(r["f"] or 0), r["essai"]))
+
+
+def afficher_avancement(resultat, nb_termines, nb_essais):
+    description = f"{resultat['modele']}, {resultat['iterations']} it., dropout {resultat['dropout']}, lots de {resultat['taille_lot']}"
+    issue = f"ERREUR : {resultat['erreur']}" if resultat["erreur"] else f"F = {resultat['f']} ({resultat['duree_s']} s)"
+    print(f"[{nb_termines}/{nb_essais}] Essai {resultat['essai']} ({description}) : {issue}")
+
+
+def ecrire_resultats(resultats, chemin_fichier):
+    with open(chemin_fichier, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLONNES_RESULTATS)
+        writer.writeheader()
+        writer.writerows(resultats)
+    print(f"Tableau des résultats écrit dans : '{chemin_fichier}'")
+
+
+def afficher_tableau(resultats):
+    largeurs = {colonne: max(len(colonne), *(len(str(r[colonne])) for r in resultats)) for colonne in COLONNES_RESULTATS}
+    print("  ".join(colonne.ljust(largeurs[colonne]) for colonne in COLONNES_RESULTATS))
+    for r in resultats:
+        print("  ".join(str(r[colonne]).ljust(largeurs[colonne]) for colonne in COLONNES_RESULTATS))
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balayage des hyperparamètres du fine-tuning (modèle de base, itérations, dropout, taille de lot).")
+    parser.add_argument("--donnees", default=CHEMIN_DONNEES_ENTRAINEMENT, help=f"Données d'entraînement : .json, .jsonl, .spacy ou dossier DocBin (défaut: {CHEMIN_DONNEES_ENTRAINEMENT}).")
+    parser.add_argument("--modeles", nargs="+", default=ESPACE_RECHERCHE["modele"], help="Modèles de base à essayer (noms ou chemins).")
+    parser.add_argument("--iterations", nargs="+", type=int, default=ESPACE_RECHERCHE["iterations"], help="Nombres d'itérations à essayer.")
+    parser.add_argument("--dropout", nargs="+", type=float, default=ESPACE_RECHERCHE["dropout"], help="Taux de dropout à essayer.")
+    parser.add_argument("--taille_lot", nargs="+", type=int, default=ESPACE_RECHERCHE["taille_lot"], help="Tailles de lot (fixes) à essayer.")
+    parser.add_argument("--aleatoire", type=int, default=0, help="Nombre d'essais tirés au hasard dans la grille ; 0 pour essayer toute la grille (défaut: 0).")
+    parser.add_argument("--n_process", type=int, default=None, help="Nombre d'essais menés en parallèle (défaut: nombre de cœurs).")
+    parser.add_argument("--proportion_dev", type=float, default=PROPORTION_DEV, help=f"Part des exemples réservée à l'évaluation des essais (défaut: {PROPORTION_DEV}).")
+    parser.add_argument("--graine", type=int, default=GRAINE, help=f"Graine du tirage des essais et de leur initialisation (défaut: {GRAINE}).")
+    parser.add_argument("--sortie", default=CHEMIN_RESULTATS, help=f"Fichier CSV du tableau des résultats (défaut: {CHEMIN_RESULTATS}).")
+    args = parser.parse_args()
+
+    if args.proportion_dev <= 0:
+        print("ERREUR : le balayage a besoin d'un jeu de dev (--proportion_dev > 0) pour comparer les essais.")
+    else:
+        espace = {"modele": args.modeles, "iterations": args.iterations, "dropout": args.dropout, "taille_lot": args.taille_lot}
+        essais = generer_essais(espace, args.aleatoire, args.graine)
+        resultats = lancer_balayage(args.donnees, essais, args.n_process, args.proportion_dev, args.graine)
+        print()
+        afficher_tableau(resultats)
+        ecrire_resultats(resultats, args.sortie)
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+# --- Configuration ---
+TAILLE_MAX_PAR_DEFAUT = 200000 # Nombre maximal de paragraphes gardés en cache (éviction LRU au-delà)
+TAILLE_REQUETE_SQL = 500 # Nombre de clés par requête "IN (...)" (limite de variables de SQLite)
+
+
+def calculer_empreinte_modele(nlp):
+    """
+    Calcule l'empreinte d'un pipeline chargé : configuration (dont les composants désactivés)
+    et poids de tous les composants. Un modèle ré-entraîné ou un autre mode de détection
+    donne une autre empreinte, ce qui invalide naturellement le cache.
+    Le vocabulaire est exclu car sa table de chaînes grossit au fil des textes traités.
+    """
+    return hashlib.sha256(nlp.to_bytes(exclude=["vocab"])).hexdigest()
+
+
+def calculer_empreinte_paragraphe(paragraphe):
+    """Empreinte du contenu d'un paragraphe (clé du cache avec l'empreinte du modèle)."""
+    return hashlib.sha256(paragraphe.encode("utf-8")).hexdigest()
+
+
+class CacheEntites:
+    """
+    Cache sur disque (SQLite) des entités détectées par paragraphe.
+    Clé : (empreinte du modèle, empreinte du paragraphe). Valeur : liste de (debut, fin, label)
+    relatifs au paragraphe. Les entrées les moins récemment utilisées sont supprimées
+    quand le cache dépasse `taille_max` paragraphes.
+    """
+
+    def __init__(self, chemin_cache, empreinte_modele, taille_max=TAILLE_MAX_PAR_DEFAUT):
+        self.empreinte_modele = empreinte_modele
+        self.taille_max = taille_max
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.connexion = sqlite3.connect(chemin_cache)
+        self.connexion.execute(
+            "CREATE TABLE IF NOT EXISTS entites ("
+            " empreinte_modele TEXT NOT NULL,"
+            " empreinte_paragraphe TEXT NOT NULL,"
+            " spans TEXT NOT NULL,"
+            " dernier_acces INTEGER NOT NULL,"
+            " PRIMARY KEY (empreinte_modele, empreinte_paragraphe))"
+        )
+        self.connexion.execute("CREATE INDEX IF NOT EXISTS idx_entites_dernier_acces ON entites (dernier_acces)")
+        self.connexion.commit()
+
+    def obtenir_lot(self, empreintes_paragraphes):
+        """Retourne {empreinte_paragraphe: spans} pour les paragraphes présents en cache et marque ces entrées comme utilisées."""
+        empreintes = list(set(empreintes_paragraphes))
+        trouves = {}
+        for i in range(0, len(empreintes), TAILLE_REQUETE_SQL):
+            tranche = empreintes[i:i + TAILLE_REQUETE_SQL]
+            marqueurs = ",".join("?" * len(tranche))
+            lignes = self.connexion.execute(
+                f"SELECT empreinte_paragraphe, spans FROM entites WHERE empreinte_modele = ? AND empreinte_paragraphe IN ({marqueurs})",
+                [self.empreinte_modele, *tranche],
+            )
+            for empreinte, spans in lignes:
+                trouves[empreinte] = [tuple(span) for span in json.loads(spans)]
+
+        maintenant = time.time_ns()
+        self.connexion.executemany(
+            "UPDATE entites SET dernier_acces = ? WHERE empreinte_modele = ? AND empreinte_paragraphe = ?",
+            [(maintenant, self.empreinte_modele, empreinte) for empreinte in trouves],
+        )
+        self.connexion.commit()
+        self.succes += len(trouves)
+        self.echecs += len(empreintes) - len(trouves)
+        return trouves
+
+    def enregistrer_lot(self, spans_par_paragraphe):
+        """Enregistre {empreinte_paragraphe: spans} puis applique l'éviction LRU si nécessaire."""
+        maintenant = time.time_ns()
+        self.connexion.executemany(
+            "INSERT OR REPLACE INTO entites (empreinte_modele, empreinte_paragraphe, spans, dernier_acces) VALUES (?, ?, ?, ?)",
+            [(self.empreinte_modele, empreinte, json.dumps(spans), maintenant) for empreinte, spans in spans_par_paragraphe.items()],
+        )
+        nb_entrees = self.connexion.execute("SELECT COUNT(*) FROM entites").fetchone()[0]
+        if nb_entrees > self.taille_max:
+            excedent = nb_entrees - self.taille_max
+            self.connexion.execute(
+                "DELETE FROM entites WHERE rowid IN (SELECT rowid FROM entites ORDER BY dernier_acces LIMIT ?)",
+                (excedent,),
+            )
+            self.evictions += excedent
+        self.connexion.commit()
+
+    def statistiques(self):
+        """Statistiques de la session : succès, échecs, taux de succès, évictions et taille du cache."""
+        total = self.succes + self.echecs
+        return {
+            "succes": self.succes,
+            "echecs": self.echecs,
+            "taux_succes": self.succes / total if total else 0.0,
+            "evictions": self.evictions,
+            "entrees": self.connexion.execute("SELECT COUNT(*) FROM entites").fetchone()[0],
+        }
+
+    def fermer(self):
+        self.connexion.close()
@@ -0,0 +1,122 @@
+import random
+import re
+from collections import namedtuple
+
+# --- Configuration ---
+MOTIF_PLACEHOLDER = re.compile(r"\{[A-Z]+\}")
+# Placeholders reconnus et label SpaCy associé. Un placeholder absent de cette table reste du texte littéral.
+PLACEHOLDERS_LABELS = {"{NOM}": "PER", "{PER}": "PER", "{LOC}": "LOC", "{ORG}": "ORG"}
+# En mode budget, nombre maximal de tirages par exemple demandé avant d'abandonner (phrases en double)
+TIRAGES_MAX_PAR_EXEMPLE = 20
+
+# litteraux : fragments de texte fixes, un de plus que d'emplacements ;
+# emplacements : placeholders dans l'ordre d'apparition ; labels : label de chaque emplacement.
+ModeleCompile = namedtuple("ModeleCompile", ["litteraux", "emplacements", "labels"])
+
+
+def compiler_modele(phrase_modele, placeholders_labels=PLACEHOLDERS_LABELS):
+    """
+    Découpe une phrase modèle, une seule fois, en fragments littéraux et emplacements.
+    Exemple : "{NOM} travaille au {ORG}." -> litteraux ["", " travaille au ", "."], emplacements ["{NOM}", "{ORG}"].
+    """
+    litteraux = []
+    emplacements = []
+    debut_litteral = 0
+    for match in MOTIF_PLACEHOLDER.finditer(phrase_modele):
+        if match.group(0) not in placeholders_labels:
+            continue
+        litteraux.append(phrase_modele[debut_litteral:match.start()])
+        emplacements.append(match.group(0))
+        debut_litteral = match.end()
+    litteraux.append(phrase_modele[debut_litteral:])
+    labels = [placeholders_labels[p] for p in emplacements]
+    return ModeleCompile(tuple(litteraux), tuple(emplacements), tuple(labels))
+
+
+def remplir_modele(modele, valeurs):
+    """
+    Remplit un modèle compilé avec `valeurs` ({placeholder: texte}) et retourne l'exemple au format SpaCy.
+    Les positions des entités sont calculées en additionnant les longueurs des fragments :
+    aucune recherche dans la phrase, donc pas de faux positif si le texte apparaît ailleurs.
+    Chaque occurrence d'un placeholder donne une entité.
+    """
+    morceaux = [modele.litteraux[0]]
+    entites = []
+    position = len(modele.litteraux[0])
+    for placeholder, label, litteral_suivant in zip(modele.emplacements, modele.labels, modele.litteraux[1:]):
+        valeur = valeurs[placeholder]
+        entites.append((position, position + len(valeur), label))
+        morceaux.append(valeur)
+        morceaux.append(litteral_suivant)
+        position += len(valeur) + len(litteral_suivant)
+    return "".join(morceaux), {"entities": entites}
+
+
+def filtrer_modeles_utilisables(modeles_compiles, placeholder, entites_par_placeholder):
+    """Écarte (avec un avertissement) les modèles dont un autre placeholder n'a aucune valeur disponible."""
+    modeles_utilisables = []
+    for modele in modeles_compiles:
+        manquants = {p for p in modele.emplacements if p != placeholder and not entites_par_placeholder.get(p)}
+        if manquants:
+            print(f"Attention : modèle ignoré, aucune valeur pour {', '.join(sorted(manquants))} : '{''.join(modele.litteraux)[:60]}...'")
+        else:
+            modeles_utilisables.append(modele)
+    return modeles_utilisables
+
+
+def remplir_avec_entite(modele, entite_texte, placeholder, entites_par_placeholder, rng):
+    """Remplit `placeholder` avec l'entité donnée et les autres placeholders par tirage au hasard."""
+    valeurs = {p: rng.choice(entites_par_placeholder[p]) for p in modele.emplacements if p != placeholder}
+    valeurs[placeholder] = entite_texte
+    return remplir_modele(modele, valeurs)
+
+
+def iterer_exemples_modeles(liste_entites, modeles_compiles, placeholder, entites_par_placeholder=None, rng=None):
+    """
+    Produit un exemple par couple (entité, modèle) : `placeholder` reçoit l'entité courante.
+    Les autres placeholders d'un modèle (ex: {ORG} dans une phrase {NOM}) sont remplis par une valeur
+    tirée au hasard dans `entites_par_placeholder` ({placeholder: liste}), ce qui donne des exemples
+    à plusieurs entités. Les modèles dont un placeholder n'a pas de valeurs disponibles sont ignorés.
+    """
+    rng = rng or random
+    entites_par_placeholder = entites_par_placeholder or {}
+    modeles_utilisables = filtrer_modeles_utilisables(modeles_compiles, placeholder, entites_par_placeholder)
+
+    for entite_texte in liste_entites:
+        for modele in modeles_utilisables:
+            yield remplir_avec_entite(modele, entite_texte, placeholder, entites_par_placeholder, rng)
+
+
+def echantillonner_exemples_modeles(liste_entites, modeles_compiles, placeholder, budget, entites_par_placeholder=None, rng=None):
+    """
+    Produit au plus `budget` exemples au lieu du produit cartésien complet entités × modèles.
+    Tirage stratifié : modèles et entités sont parcourus par permutations aléatoires successives,
+    donc chacun est utilisé un nombre de fois égal à un près. Les phrases identiques sont éliminées.
+    Avec un `rng` initialisé par une graine (random.Random(graine)), le tirage est reproductible.
+    """
+    rng = rng or random
+    entites_par_placeholder = entites_par_placeholder or {}
+    modeles_utilisables = filtrer_modeles_utilisables(modeles_compiles, placeholder, entites_par_placeholder)
+    if not modeles_utilisables or not liste_entites or budget <= 0:
+        return
+    # Le budget ne dépasse jamais la taille du produit cartésien.
+    budget = min(budget, len(modeles_utilisables) * len(liste_entites))
+
+    phrases_vues = set()
+    ordre_modeles = []
+    ordre_entites = []
+    tirages_restants = budget * TIRAGES_MAX_PAR_EXEMPLE
+    while len(phrases_vues) < budget and tirages_restants > 0:
+        tirages_restants -= 1
+        if not ordre_modeles:
+            ordre_modeles = rng.sample(modeles_utilisables, len(modeles_utilisables))
+        if not ordre_entites:
+            ordre_entites = rng.sample(liste_entites, len(liste_entites))
+        texte, annotations = remplir_avec_entite(ordre_modeles.pop(), ordre_entites.pop(), placeholder, entites_par_placeholder, rng)
+        if texte in phrases_vues:
+            continue
+        phrases_vues.add(texte)
+        yield texte, annotations
+
+    if len(phrases_vues) < budget:
+        print(f"Attention : seulement {len(phrases_vues)} phrases distinctes obtenues pour un budget de {budget} ({placeholder}).")
@@ -0,0 +1,202 @@
+import glob
+import itertools
+import json
+import os
+import random
+from multiprocessing import Pool
+
+import spacy
+from spacy.tokens import Doc, DocBin
+from spacy.training.example import Example
+from spacy.vocab import Vocab
+from valider_donnees import empreinte_tokeniseur, verifier_exemple
+
+# --- Configuration ---
+LANGUE_TOKENISEUR = "fr" # Tokeniseur utilisé quand aucun modèle de base n'est donné
+TAILLE_PARTIE_PAR_DEFAUT = 5000 # Nombre d'exemples par fichier .spacy
+PREFIXE_PARTIE = "partie_"
+# Écrit avec les parties : modèle et empreinte du tokeniseur qui a découpé le corpus. Le fine-tuning refuse
+# un corpus découpé par un autre tokeniseur que celui du modèle entraîné.
+FICHIER_TOKENISEUR = "tokeniseur.json"
+
+_nlp_worker = None # Tokeniseur propre à chaque processus de travail
+
+
+def charger_tokeniseur(modele=None):
+    """Pipeline dont le tokeniseur découpe le corpus : le modèle de base du fine-tuning, ou à défaut le tokeniseur français de base."""
+    return spacy.load(modele) if modele else spacy.blank(LANGUE_TOKENISEUR)
+
+
+def _initialiser_worker(modele):
+    global _nlp_worker
+    _nlp_worker = charger_tokeniseur(modele)
+
+
+def construire_docbin(nlp, exemples):
+    """
+    Tokenise les exemples (texte, annotations) et place les entités sur les Doc.
+    Retourne le DocBin et le nombre d'exemples ignorés (entités non alignées sur les tokens ou qui se chevauchent) :
+    un corpus DocBin ne contient donc que des exemples validés.
+    """
+    docbin = DocBin(attrs=["ORTH", "ENT_IOB", "ENT_TYPE"], store_user_data=False)
+    nb_ignores = 0
+    for texte, annotations in exemples:
+        doc = nlp.make_doc(texte)
+        entites = annotations.get("entities", [])
+        if verifier_exemple(nlp, texte, entites, doc) is not None:
+            nb_ignores += 1
+            continue
+        doc.ents = [doc.char_span(debut, fin, label=label) for debut, fin, label in entites]
+        docbin.add(doc)
+    return docbin, nb_ignores
+
+
+def _ecrire_partie(tache):
+    """Construit et écrit un fichier .spacy dans un processus de travail."""
+    chemin_partie, exemples = tache
+    docbin, nb_ignores = construire_docbin(_nlp_worker, exemples)
+    docbin.to_disk(chemin_partie)
+    return len(docbin), nb_ignores
+
+
+def ecrire_exemples_docbin(exemples, dossier_sortie, taille_partie=TAILLE_PARTIE_PAR_DEFAUT, n_process=1, modele=None):
+    """
+    Écrit les exemples dans `dossier_sortie` sous forme de fichiers DocBin (partie_0000.spacy, ...)
+    de `taille_partie` exemples chacun, tokenisés une fois pour toutes et construits en parallèle
+    sur `n_process` processus. `exemples` peut être un générateur : il est consommé par parties.
+    Les textes sont découpés par le tokeniseur de `modele`, qui doit être le modèle de base du fine-tuning ;
+    son empreinte est écrite dans FICHIER_TOKENISEUR.
+    Retourne (nombre d'exemples écrits, nombre de fichiers, nombre d'exemples ignorés).
+    """
+    global _nlp_worker
+    nlp = charger_tokeniseur(modele) # Avant toute écriture : un modèle introuvable laisse le dossier intact
+    os.makedirs(dossier_sortie, exist_ok=True)
+    # Les parties d'une génération précédente plus volumineuse ne doivent pas être relues avec les nouvelles.
+    for ancien_fichier in glob.glob(os.path.join(dossier_sortie, f"{PREFIXE_PARTIE}*.spacy")):
+        os.remove(ancien_fichier)
+    with open(os.path.join(dossier_sortie, FICHIER_TOKENISEUR), "w", encoding="utf-8") as f:
+        json.dump({"modele": modele or f"spacy.blank('{LANGUE_TOKENISEUR}')", "empreinte_tokeniseur": empreinte_tokeniseur(nlp)}, f, ensure_ascii=False, indent=4)
+
+    exemples = iter(exemples)
+    parties = iter(lambda: list(itertools.islice(exemples, taille_partie)), [])
+    taches = ((os.path.join(dossier_sortie, f"{PREFIXE_PARTIE}{indice:04d}.spacy"), partie) for indice, partie in enumerate(parties))
+
+    resultats = []
+    if n_process > 1:
+        with Pool(n_process, initializer=_initialiser_worker, initargs=(modele,)) as pool:
+            # Parties distribuées par vagues : seules quelques parties sont en mémoire à la fois.
+            while True:
+                vague = list(itertools.islice(taches, 2 * n_process))
+                if not vague:
+                    break
+                resultats.extend(pool.map(_ecrire_partie, vague))
+    else:
+        _nlp_worker = nlp # Tokeniseur déjà chargé ci-dessus : inutile de le recharger dans ce processus
+        resultats = [_ecrire_partie(tache) for tache in taches]
+
+    nb_ignores = sum(ignores for _, ignores in resultats)
+    if nb_ignores:
+        print(f"Attention : {nb_ignores} exemples ignorés (entités non alignées sur les tokens ou qui se chevauchent).")
+    return sum(nb for nb, _ in resultats), len(resultats), nb_ignores
+
+
+def lister_fichiers_docbin(chemin):
+    """Un fichier .spacy, ou tous les fichiers .spacy d'un dossier et de ses sous-dossiers (triés)."""
+    if os.path.isdir(chemin):
+        return sorted(glob.glob(os.path.join(chemin, "**", "*.spacy"), recursive=True))
+    return [chemin]
+
+
+def est_corpus_docbin(chemin):
+    return chemin.endswith(".spacy") or (os.path.isdir(chemin) and bool(lister_fichiers_docbin(chemin)))
+
+
+def verifier_tokeniseur_corpus(chemin, nlp):
+    """
+    Vérifie qu'un corpus DocBin a été découpé par le tokeniseur de `nlp` (le modèle entraîné) : les Doc prédits
+    reprennent les tokens du corpus, un autre découpage entraînerait le modèle sur des tokens qu'il ne produira jamais.
+    Lève ValueError si l'empreinte manque ou diffère.
+    """
+    dossier = chemin if os.path.isdir(chemin) else os.path.dirname(chemin)
+    chemin_empreinte = os.path.join(dossier, FICHIER_TOKENISEUR)
+    if not os.path.exists(chemin_empreinte):
+        raise ValueError(f"Corpus DocBin '{chemin}' sans empreinte de tokeniseur ({FICHIER_TOKENISEUR}) : "
+                         "régénérez-le avec --format spacy --modele <modèle de base>.")
+    with open(chemin_empreinte, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    if corpus["empreinte_tokeniseur"] != empreinte_tokeniseur(nlp):
+        raise ValueError(f"Corpus DocBin '{chemin}' découpé par le tokeniseur de '{corpus['modele']}', différent de celui du modèle entraîné : "
+                         "régénérez-le avec --format spacy --modele <modèle de base>.")
+
+
+def example_depuis_reference(vocab, reference):
+    """Example dont le Doc prédit reprend les tokens du Doc de référence annoté (aucune re-tokenisation)."""
+    predit = Doc(vocab, words=[token.text for token in reference], spaces=[bool(token.whitespace_) for token in reference])
+    return Example(predit, reference)
+
+
+class ExemplesDocBin:
+    """
+    Corpus pré-tokenisé (fichiers .spacy) relu à chaque époque. Les Doc de référence portent déjà
+    les entités : les Example sont construits sans re-tokeniser ni ré-aligner le texte.
+    Le mélange se fait sur l'ordre des fichiers puis à l'intérieur de chaque fichier.
+    `exclus` : numéros de Doc à sauter, numérotés dans l'ordre des fichiers triés (ex: exemples réservés au jeu de dev).
+    """
+
+    def __init__(self, chemin, melanger=True, graine=None, exclus=None):
+        self.chemin = chemin
+        self.fichiers = lister_fichiers_docbin(chemin)
+        self.melanger = melanger
+        self.rng = random.Random(graine)
+        self.exclus = exclus or {}
+        self.tailles_fichiers = None
+
+    def premiers_numeros(self):
+        """Numéro du premier Doc de chaque fichier dans la numérotation globale."""
+        if self.tailles_fichiers is None:
+            self.tailles_fichiers = [len(DocBin().from_disk(chemin_fichier)) for chemin_fichier in self.fichiers]
+        return dict(zip(self.fichiers, itertools.accumulate([0] + self.tailles_fichiers)))
+
+    def iterer_docs(self, vocab):
+        premiers = self.premiers_numeros() if self.exclus else {}
+        fichiers = list(self.fichiers)
+        if self.melanger:
+            self.rng.shuffle(fichiers)
+        for chemin_fichier in fichiers:
+            docs = DocBin().from_disk(chemin_fichier).get_docs(vocab)
+            if self.exclus:
+                docs = (doc for numero, doc in enumerate(docs, premiers[chemin_fichier]) if numero not in self.exclus)
+            docs = list(docs)
+            if self.melanger:
+                self.rng.shuffle(docs)
+            yield from docs
+
+    def iterer_examples(self, vocab):
+        for reference in self.iterer_docs(vocab):
+            yield example_depuis_reference(vocab, reference)
+
+    def labels(self):
+        return {ent.label_ for doc in self.iterer_docs(Vocab()) for ent in doc.ents}
+
+    def __len__(self):
+        self.premiers_numeros()
+        return sum(self.tailles_fichiers) - len(self.exclus)
+
+
+def collecter_labels(donnees):
+    """Labels présents dans des données d'entraînement (liste/flux de (texte, annotations) ou ExemplesDocBin)."""
+    if isinstance(donnees, ExemplesDocBin):
+        return donnees.labels()
+    return {ent[2] for _, annotations in donnees for ent in annotations.get("entities", [])}
+
+
+def iterer_examples(nlp, donnees):
+    """
+    Example prêts pour nlp.update : relus tels quels depuis un corpus DocBin,
+    sinon construits à partir du texte (tokenisation et alignement à chaque passage).
+    """
+    if isinstance(donnees, ExemplesDocBin):
+        yield from donnees.iterer_examples(nlp.vocab)
+        return
+    for texte, annotations in donnees:
+        yield Example.from_dict(nlp.make_doc(texte), annotations)
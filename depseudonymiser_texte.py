@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+# --- Configuration ---
+# Forme des pseudonymes produits par pseudonymiser_texte.py : [PERSONNE_1], [LIEU_2], [ORGANISATION_3]...
+MOTIF_PSEUDONYME = re.compile(r"\[[A-Z]+_\d+\]")
+LONGUEUR_MAX_PSEUDONYME = 64 # Au-delà, un "[" sans "]" en fin de bloc ne peut pas être le début d'un pseudonyme
+TAILLE_BLOC_PAR_DEFAUT = 4 * 1024 * 1024 # Nombre de caractères lus à chaque itération en mode flux
+
+
+def charger_table_inverse(chemins_json):
+    """
+    Charge une ou plusieurs tables *_correspondances.json ({label: {original: pseudonyme}}, ou {original: pseudonyme}
+    pour les tables plus anciennes et le stock exporté avec un label) et retourne la table inverse {pseudonyme: original}.
+    """
+    table_inverse = {}
+    for chemin_json in chemins_json:
+        with open(chemin_json, 'r', encoding='utf-8') as f:
+            correspondances = json.load(f)
+        if all(isinstance(valeur, dict) for valeur in correspondances.values()):
+            correspondances_par_label = correspondances.values()
+        else:
+            correspondances_par_label = [correspondances]
+        for original, pseudonyme in (couple for par_label in correspondances_par_label for couple in par_label.items()):
+            if pseudonyme in table_inverse and table_inverse[pseudonyme] != original:
+                print(f"Attention : le pseudonyme {pseudonyme} correspond à plusieurs originaux ('{table_inverse[pseudonyme]}' et '{original}'). Le premier est conservé.")
+                continue
+            table_inverse[pseudonyme] = original
+    return table_inverse
+
+
+def creer_fonction_remplacement(table_inverse):
+    """Fonction de remplacement pour MOTIF_PSEUDONYME.sub : les pseudonymes inconnus sont laissés tels quels."""
+    obtenir = table_inverse.get
+
+    def remplacer(match):
+        pseudonyme = match.group(0)
+        return obtenir(pseudonyme, pseudonyme)
+
+    return remplacer
+
+
+def depseudonymiser_texte(texte, table_inverse):
+    """Restaure tous les pseudonymes d'un texte en un seul passage du motif compilé."""
+    return MOTIF_PSEUDONYME.sub(creer_fonction_remplacement(table_inverse), texte)
+
+
+def depseudonymiser_fichier_en_flux(chemin_input, chemin_output, table_inverse, taille_bloc=TAILLE_BLOC_PAR_DEFAUT):
+    """
+    Ré-identifie un fichier de taille arbitraire bloc par bloc, en une seule passe linéaire.
+    Un pseudonyme coupé par la fin d'un bloc est reporté en tête du bloc suivant.
+    Retourne le nombre de caractères traités.
+    """
+    remplacer = creer_fonction_remplacement(table_inverse)
+    nb_caracteres = 0
+    reste = ""
+    with open(chemin_input, 'r', encoding='utf-8') as entree, open(chemin_output, 'w', encoding='utf-8') as sortie:
+        while True:
+            bloc = entree.read(taille_bloc)
+            if not bloc:
+                break
+            nb_caracteres += len(bloc)
+            bloc = reste + bloc
+            # Si le dernier "[" n'est pas refermé, il peut s'agir du début d'un pseudonyme coupé en deux.
+            position_crochet = bloc.rfind("[")
+            if position_crochet != -1 and "]" not in bloc[position_crochet:] and len(bloc) - position_crochet < LONGUEUR_MAX_PSEUDONYME:
+                bloc, reste = bloc[:position_crochet], bloc[position_crochet:]
+            else:
+                reste = ""
+            sortie.write(MOTIF_PSEUDONYME.sub(remplacer, bloc))
+        sortie.write(reste)
+    return nb_caracteres
+
+
+def depseudonymiser_par_remplacements(texte, table_inverse):
+    """Approche naïve (un str.replace par pseudonyme), conservée uniquement comme référence de mesure."""
+    # Chaque pseudonyme se termine par "]" : [PERSONNE_1] ne peut pas correspondre au début de [PERSONNE_10].
+    for pseudonyme in table_inverse:
+        texte = texte.replace(pseudonyme, table_inverse[pseudonyme])
+    return texte
+
+
+def mesurer_debit(chemin_exemple, table_inverse, taille_mo, taille_bloc=TAILLE_BLOC_PAR_DEFAUT):
+    """
+    Génère un fichier d'environ `taille_mo` Mo en répétant `chemin_exemple`, le ré-identifie en flux
+    et affiche le débit. L'approche naïve par str.replace est mesurée sur un échantillon de 10 Mo.
+    """
+    with open(chemin_exemple, 'r', encoding='utf-8') as f:
+        motif = f.read()
+    dossier_temp = tempfile.mkdtemp()
+    chemin_input = os.path.join(dossier_temp, "benchmark_pseudonymise.txt")
+    chemin_output = os.path.join(dossier_temp, "benchmark_reidentifie.txt")
+    repetitions = max(1, (taille_mo * 1024 * 1024) // len(motif.encode("utf-8")))
+    print(f"Génération d'un fichier de test de {taille_mo} Mo ({repetitions} répétitions de '{chemin_exemple}')...")
+    with open(chemin_input, 'w', encoding='utf-8') as f:
+        for _ in range(repetitions):
+            f.write(motif)
+    taille_octets = os.path.getsize(chemin_input)
+
+    try:
+        debut = time.perf_counter()
+        depseudonymiser_fichier_en_flux(chemin_input, chemin_output, table_inverse, taille_bloc)
+        duree_flux = time.perf_counter() - debut
+        print(f"Flux (motif compilé) : {taille_octets / 1024 / 1024:.0f} Mo en {duree_flux:.2f} s -> {taille_octets / 1024 / 1024 / duree_flux:.1f} Mo/s")
+
+        echantillon = motif * max(1, (10 * 1024 * 1024) // len(motif.encode("utf-8")))
+        taille_echantillon_mo = len(echantillon.encode("utf-8")) / 1024 / 1024
+        debut = time.perf_counter()
+        resultat_motif = depseudonymiser_texte(echantillon, table_inverse)
+        duree_motif = time.perf_counter() - debut
+        debut = time.perf_counter()
+        resultat_naif = depseudonymiser_par_remplacements(echantillon, table_inverse)
+        duree_naif = time.perf_counter() - debut
+        print(f"Échantillon de {taille_echantillon_mo:.0f} Mo : motif compilé {taille_echantillon_mo / duree_motif:.1f} Mo/s, "
+              f"str.replace ({len(table_inverse)} pseudonymes) {taille_echantillon_mo / duree_naif:.1f} Mo/s, "
+              f"résultats identiques : {resultat_motif == resultat_naif}")
+    finally:
+        for chemin in (chemin_input, chemin_output):
+            if os.path.exists(chemin):
+                os.remove(chemin)
+        os.rmdir(dossier_temp)
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ré-identifie un texte pseudonymisé à partir de sa ou ses tables de correspondance.")
+    parser.add_argument("--input", help="Chemin vers le fichier .txt pseudonymisé.")
+    parser.add_argument("--correspondances", nargs="+", required=True, help="Un ou plusieurs fichiers *_correspondances.json.")
+    parser.add_argument("--output_txt", help="Chemin vers le fichier .txt de sortie (défaut : <input>_reidentifie.txt).")
+    parser.add_argument("--taille_bloc", type=int, default=TAILLE_BLOC_PAR_DEFAUT, help=f"Nombre de caractères lus par bloc (défaut: {TAILLE_BLOC_PAR_DEFAUT}).")
+    parser.add_argument("--benchmark_mo", type=int, help="Mesure le débit sur un fichier synthétique de cette taille (en Mo) construit en répétant --input.")
+    args = parser.parse_args()
+
+    table = charger_table_inverse(args.correspondances)
+    print(f"{len(table)} pseudonymes chargés.")
+
+    if not args.input:
+        print("ERREUR : --input est requis.")
+    elif args.benchmark_mo:
+        mesurer_debit(args.input, table, args.benchmark_mo, args.taille_bloc)
+    else:
+        nom_base_input = os.path.splitext(args.input)[0]
+        chemin_sortie = args.output_txt or f"{nom_base_input}_reidentifie.txt"
+        debut_traitement = time.perf_counter()
+        nb_caracteres_traites = depseudonymiser_fichier_en_flux(args.input, chemin_sortie, table, args.taille_bloc)
+        duree_traitement = time.perf_counter() - debut_traitement
+        print(f"Texte ré-identifié sauvegardé dans : '{chemin_sortie}'")
+        print(f"{nb_caracteres_traites} caractères traités en {duree_traitement:.2f} s")
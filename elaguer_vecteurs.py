@@ -0,0 +1,88 @@
+import argparse
+import os
+import time
+
+import spacy
+
+from exporter_modele_inference import mesurer_modele
+from fine_tuner_spacy import CHEMIN_DONNEES_ENTRAINEMENT, CHEMIN_MODELE_FINETUNE, GRAINE_DEV, PROPORTION_DEV, charger_donnees_entrainement, separer_dev
+
+# --- Configuration ---
+CHEMIN_SORTIE_PAR_DEFAUT = "./modele_pseudonymisation_vecteurs" # Un sous-dossier par taille de table essayée
+# Nombres de vecteurs gardés. Les vecteurs des modèles SpaCy sont rangés par fréquence décroissante :
+# les N premiers sont gardés, les mots des autres sont rattachés au plus proche des vecteurs restants.
+TAILLES_VECTEURS = [10000, 5000, 2000, 1000]
+TAILLE_LOT_ELAGAGE = 1024 # Vecteurs comparés à la fois pour trouver leur plus proche voisin
+COLONNES_RAPPORT = [("modele", "Modèle"), ("nb_vecteurs", "Vecteurs"), ("nb_cles", "Clés"), ("vecteurs_mo", "Fichier vecteurs (Mo)"), ("disque_mo", "Disque (Mo)"), ("chargement_s", "spacy.load (s)"),
+                    ("rss_max_mo", "RSS max (Mo)"), ("f", "F dev")]
+
+
+def elaguer_vecteurs(chemin_modele, nb_vecteurs, chemin_sortie):
+    """
+    Écrit dans `chemin_sortie` une copie du modèle dont la table de vecteurs est réduite aux `nb_vecteurs` premiers vecteurs
+    (Vocab.prune_vectors) : aucun mot n'est perdu, chacun est rattaché au vecteur restant le plus proche.
+    Retourne le nombre de mots rattachés à un autre vecteur.
+    """
+    nlp = spacy.load(chemin_modele)
+    debut = time.perf_counter()
+    rattaches = nlp.vocab.prune_vectors(nb_vecteurs, batch_size=TAILLE_LOT_ELAGAGE)
+    os.makedirs(chemin_sortie, exist_ok=True)
+    nlp.to_disk(chemin_sortie)
+    print(f"{nb_vecteurs} vecteurs gardés, {len(rattaches)} mots rattachés à leur plus proche voisin "
+          f"({time.perf_counter() - debut:.1f} s) : '{chemin_sortie}'")
+    return len(rattaches)
+
+
+def evaluer_modele(chemin_modele, donnees, proportion_dev=PROPORTION_DEV, graine=GRAINE_DEV):
+    """
+    Mesures d'un modèle pour le rapport : table de vecteurs, taille, chargement et F du NER sur le jeu de dev.
+    Le jeu de dev est tiré comme pendant le fine-tuning (fine_tuner_spacy.separer_dev) : ces exemples n'ont pas servi à l'entraînement.
+    """
+    nlp = spacy.load(chemin_modele)
+    vecteurs = nlp.vocab.vectors
+    mesures = {"modele": os.path.basename(chemin_modele.rstrip("/\\")), "nb_vecteurs": vecteurs.shape[0], "nb_cles": vecteurs.n_keys,
+               "vecteurs_mo": round(os.path.getsize(os.path.join(chemin_modele, "vocab", "vectors")) / (1024 * 1024), 2)}
+    mesures.update(mesurer_modele(chemin_modele))
+    _, examples_dev = separer_dev(nlp, donnees, proportion_dev, graine)
+    mesures["f"] = round(nlp.evaluate(examples_dev)["ents_f"], 4) if examples_dev else ""
+    return mesures
+
+
+def afficher_rapport(lignes):
+    largeurs = {cle: max(len(libelle), *(len(str(ligne[cle])) for ligne in lignes)) for cle, libelle in COLONNES_RAPPORT}
+    print("  ".join(libelle.ljust(largeurs[cle]) for cle, libelle in COLONNES_RAPPORT))
+    for ligne in lignes:
+        print("  ".join(str(ligne[cle]).ljust(largeurs[cle]) for cle, _ in COLONNES_RAPPORT))
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Réduit la table de vecteurs d'un modèle aux N mots les plus fréquents et compare mémoire, chargement et F du NER.")
+    parser.add_argument("--modele", default=CHEMIN_MODELE_FINETUNE, help=f"Modèle SpaCy dont les vecteurs sont élagués (défaut: {CHEMIN_MODELE_FINETUNE}).")
+    parser.add_argument("--sortie", default=CHEMIN_SORTIE_PAR_DEFAUT, help=f"Dossier des modèles élagués, un sous-dossier par taille (défaut: {CHEMIN_SORTIE_PAR_DEFAUT}).")
+    parser.add_argument("--tailles", nargs="+", type=int, default=TAILLES_VECTEURS, help=f"Nombres de vecteurs à garder (défaut: {' '.join(map(str, TAILLES_VECTEURS))}).")
+    parser.add_argument("--donnees", default=CHEMIN_DONNEES_ENTRAINEMENT, help=f"Données du fine-tuning, dont le jeu de dev sert à l'évaluation (défaut: {CHEMIN_DONNEES_ENTRAINEMENT}).")
+    parser.add_argument("--proportion_dev", type=float, default=PROPORTION_DEV, help=f"Part des exemples réservée au dev, comme au fine-tuning (défaut: {PROPORTION_DEV}).")
+    args = parser.parse_args()
+
+    nlp_modele = spacy.load(args.modele)
+    nb_vecteurs_modele = nlp_modele.vocab.vectors.shape[0]
+    if not nb_vecteurs_modele:
+        print(f"ERREUR : le modèle '{args.modele}' n'a pas de table de vecteurs à élaguer.")
+        exit()
+    try:
+        donnees = charger_donnees_entrainement(args.donnees, nlp_modele) # Élagage des vecteurs seulement : le tokeniseur reste le même
+    except ValueError as e:
+        print(f"ERREUR : {e}")
+        exit()
+
+    lignes = [evaluer_modele(args.modele, donnees, args.proportion_dev)]
+    for nb_vecteurs in sorted(set(args.tailles), reverse=True):
+        if nb_vecteurs >= nb_vecteurs_modele:
+            print(f"{nb_vecteurs} vecteurs ou plus : rien à élaguer (le modèle en a {nb_vecteurs_modele}).")
+            continue
+        chemin_sortie = os.path.join(args.sortie, f"vecteurs_{nb_vecteurs}")
+        elaguer_vecteurs(args.modele, nb_vecteurs, chemin_sortie)
+        lignes.append(evaluer_modele(chemin_sortie, donnees, args.proportion_dev))
+    print()
+    afficher_rapport(lignes)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import time
+
+from listes_entites import lire_entites_depuis_fichier
+
+# --- Configuration ---
+# Listes d'entités déjà maintenues pour la génération des données d'entraînement.
+# Chemins relatifs au dossier du projet, pour que les scripts fonctionnent depuis n'importe quel dossier courant.
+DOSSIER_PROJET = os.path.dirname(os.path.abspath(__file__))
+LISTES_ENTITES_PAR_DEFAUT = [
+    (os.path.join(DOSSIER_PROJET, "annuaire_pour_finetuning.txt"), "PER"),
+    (os.path.join(DOSSIER_PROJET, "organisations.txt"), "ORG"),
+    (os.path.join(DOSSIER_PROJET, "lieux.txt"), "LOC"),
+]
+NOM_COMPOSANT = "entites_connues"
+# "ner"     : modèle statistique seul (comportement historique)
+# "liste"   : correspondance exacte avec les listes seule, tous les autres composants sont désactivés
+# "hybride" : les listes étiquettent d'abord les entités connues, le NER complète le reste
+MODES_DETECTION = ("ner", "liste", "hybride")
+
+
+def construire_motifs(listes_entites):
+    """
+    Construit les motifs de l'EntityRuler à partir de couples (fichier, label).
+    Les doublons sont ignorés ; un fichier illisible est signalé et ignoré.
+    """
+    motifs = []
+    deja_vus = set()
+    for chemin_fichier, label in listes_entites:
+        entites = lire_entites_depuis_fichier(chemin_fichier)
+        if not entites:
+            continue
+        for entite_texte in entites:
+            if (entite_texte, label) not in deja_vus:
+                deja_vus.add((entite_texte, label))
+                motifs.append({"label": label, "pattern": entite_texte})
+    return motifs
+
+
+def configurer_detection(nlp, mode="ner", listes_entites=LISTES_ENTITES_PAR_DEFAUT):
+    """
+    Configure le pipeline selon le mode de détection choisi (voir MODES_DETECTION).
+    Les listes sont compilées une seule fois dans un PhraseMatcher (via l'EntityRuler de SpaCy),
+    qui étiquette toutes les entités connues en une passe linéaire sur les tokens.
+    La correspondance se fait sur la forme en minuscules (LOWER), car l'annuaire écrit les noms de famille en capitales.
+    """
+    if mode not in MODES_DETECTION:
+        raise ValueError(f"Mode de détection inconnu : '{mode}' (attendu : {', '.join(MODES_DETECTION)})")
+    if mode == "ner":
+        return nlp
+
+    options = {"phrase_matcher_attr": "LOWER", "overwrite_ents": False}
+    if "ner" in nlp.pipe_names:
+        ruler = nlp.add_pipe("entity_ruler", name=NOM_COMPOSANT, before="ner", config=options)
+    else:
+        ruler = nlp.add_pipe("entity_ruler", name=NOM_COMPOSANT, config=options)
+
+    motifs = construire_motifs(listes_entites)
+    # Les motifs n'ont besoin que du tokenizer : inutile de les faire passer dans les autres composants.
+    with nlp.select_pipes(enable=[NOM_COMPOSANT]):
+        ruler.add_patterns(motifs)
+    print(f"{len(motifs)} entités connues chargées (mode de détection : {mode}).")
+
+    if mode == "liste":
+        for nom_composant in nlp.pipe_names:
+            if nom_composant != NOM_COMPOSANT:
+                nlp.disable_pipe(nom_composant)
+    return nlp
+
+
+def mesurer_mode(chemin_modele, mode, exemples, listes_entites, batch_size=64):
+    """
+    Mesure la vitesse et la qualité d'un mode de détection sur des exemples annotés
+    (format des données d'entraînement : [texte, {"entities": [[debut, fin, label], ...]}]).
+    Une entité est comptée comme trouvée si le début, la fin et le label sont identiques.
+    Retourne None si le modèle ne peut pas être chargé.
+    """
+    from pseudonymiser_texte import charger_modele_spacy # Import local : pseudonymiser_texte importe ce module
+
+    nlp = charger_modele_spacy(chemin_modele)
+    if not nlp:
+        return None
+    nlp = configurer_detection(nlp, mode, listes_entites)
+    textes = [texte for texte, _ in exemples]
+
+    debut = time.perf_counter()
+    docs = list(nlp.pipe(textes, batch_size=batch_size))
+    duree = time.perf_counter() - debut
+
+    par_label = {}
+    for doc, (_, annotations) in zip(docs, exemples):
+        attendues = {tuple(ent) for ent in annotations.get("entities", [])}
+        predites = {(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents}
+        for debut_ent, fin_ent, label in attendues | predites:
+            compteurs = par_label.setdefault(label, {"vp": 0, "fp": 0, "fn": 0})
+            if (debut_ent, fin_ent, label) in attendues and (debut_ent, fin_ent, label) in predites:
+                compteurs["vp"] += 1
+            elif (debut_ent, fin_ent, label) in attendues:
+                compteurs["fn"] += 1
+            else:
+                compteurs["fp"] += 1
+
+    resultat = {
+        "mode": mode,
+        "duree_s": duree,
+        "docs_par_s": len(docs) / duree if duree > 0 else 0.0,
+        "caracteres_par_s": sum(len(t) for t in textes) / duree if duree > 0 else 0.0,
+        "labels": {},
+    }
+    for label, c in sorted(par_label.items()):
+        resultat["labels"][label] = {
+            "rappel": c["vp"] / (c["vp"] + c["fn"]) if c["vp"] + c["fn"] else 0.0,
+            "precision": c["vp"] / (c["vp"] + c["fp"]) if c["vp"] + c["fp"] else 0.0,
+        }
+    return resultat
+
+
+def comparer_modes(chemin_modele, chemin_donnees, nb_exemples=2000, listes_entites=LISTES_ENTITES_PAR_DEFAUT, modes=MODES_DETECTION):
+    """
+    Compare vitesse et rappel/précision de chaque mode et affiche un tableau récapitulatif.
+    Attention : si les exemples ont été générés à partir des mêmes listes (cas des données
+    produites par preparer_donnees_multi_types.py), le rappel du mode "liste" est optimiste.
+    """
+    with open(chemin_donnees, 'r', encoding='utf-8') as f:
+        exemples = json.load(f)[:nb_exemples]
+    print(f"{len(exemples)} exemples annotés chargés depuis '{chemin_donnees}'.\n")
+
+    resultats = [mesurer_mode(chemin_modele, mode, exemples, listes_entites) for mode in modes]
+    if None in resultats:
+        return None
+
+    print(f"\n{'Mode':<10} {'docs/s':>10} {'car./s':>12}  Label  Rappel  Précision")
+    for resultat in resultats:
+        premiere_ligne = True
+        for label, scores in resultat["labels"].items():
+            prefixe = f"{resultat['mode']:<10} {resultat['docs_par_s']:>10.1f} {resultat['caracteres_par_s']:>12.0f}" if premiere_ligne else " " * 34
+            print(f"{prefixe}  {label:<5}  {scores['rappel']:>6.3f}  {scores['precision']:>9.3f}")
+            premiere_ligne = False
+    return resultats
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare la détection par listes d'entités connues au NER statistique (vitesse et rappel).")
+    parser.add_argument("--modele", default="./modele_pseudonymisation_finetune", help="Chemin vers le dossier du modèle SpaCy fine-tuné.")
+    parser.add_argument("--donnees", default="donnees_entrainement_combinees.json", help="Fichier JSON d'exemples annotés utilisé comme référence.")
+    parser.add_argument("--nb_exemples", type=int, default=2000, help="Nombre d'exemples utilisés pour la mesure (défaut: 2000).")
+    args = parser.parse_args()
+
+    comparer_modes(args.modele, args.donnees, args.nb_exemples)
@@ -0,0 +1,140 @@
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+import spacy
+import srsly
+
+from format_donnees import iterer_exemples
+
+# --- Configuration ---
+CHEMIN_MODELE_PAR_DEFAUT = "./modele_pseudonymisation_finetune"
+CHEMIN_EXPORT_PAR_DEFAUT = "./modele_pseudonymisation_inference"
+# Composants qui produisent doc.ents : les seuls utiles à la pseudonymisation (avec ceux dont ils dépendent)
+COMPOSANTS_INFERENCE = ["ner", "entity_ruler"]
+NB_TEXTES_CONTROLE = 200 # Textes des données d'entraînement utilisés pour vérifier que l'export prédit la même chose
+TEXTES_CONTROLE = [
+    "Jean Dupont habite à Lyon et travaille chez Renault.",
+    "Marie Martin a rencontré le directeur de la SNCF à Marseille.",
+    "Le rendez-vous avec Paul Durand est fixé à la mairie de Bordeaux.",
+]
+# Mesure faite dans un interpréteur neuf. spacy.blank charge d'abord les données de la langue (quelques secondes,
+# identiques pour tous les modèles) : seule la durée propre au modèle est mesurée. Le pic de mémoire est lu dans
+# /proc (VmHWM) quand c'est possible, car ru_maxrss hérite du pic du processus parent sous Linux.
+SCRIPT_MESURE = """
+import json, os, resource, sys, time
+import spacy
+spacy.blank(json.load(open(os.path.join(sys.argv[1], "meta.json"), encoding="utf-8"))["lang"])
+debut = time.perf_counter()
+nlp = spacy.load(sys.argv[1])
+duree = time.perf_counter() - debut
+nlp("Jean Dupont habite à Lyon.")
+rss_max = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+if os.path.exists("/proc/self/status"):
+    with open("/proc/self/status") as f:
+        rss_max = next(int(ligne.split()[1]) for ligne in f if ligne.startswith("VmHWM")) / 1024
+print(json.dumps({"chargement_s": round(duree, 3), "rss_max_mo": round(rss_max, 1)}))
+"""
+
+def composants_necessaires(nlp, composants=COMPOSANTS_INFERENCE):
+    """
+    Noms des composants à garder : ceux de `composants` présents dans le pipeline, plus les composants partagés
+    (tok2vec, transformer) dont l'un d'eux écoute la sortie.
+    """
+    a_garder = {nom for nom in nlp.component_names if nom in composants}
+    ajout = True
+    while ajout:
+        ajout = False
+        for nom in nlp.component_names:
+            ecouteurs = getattr(nlp.get_pipe(nom), "listening_components", None) or []
+            if nom not in a_garder and a_garder.intersection(ecouteurs):
+                a_garder.add(nom)
+                ajout = True
+    return a_garder
+
+
+def chaines_necessaires(nlp):
+    """
+    Chaînes à garder dans le StringStore exporté : les labels des composants gardés et les identifiants de l'entity_ruler.
+    Les autres chaînes (mots vus à l'entraînement) sont ajoutées à la volée quand un texte est traité.
+    """
+    chaines = set()
+    for _, composant in nlp.pipeline:
+        chaines.update(getattr(composant, "labels", ()) or ())
+        chaines.update(getattr(composant, "ent_ids", ()) or ())
+    return chaines
+
+
+def entites_predites(nlp, textes):
+    return [[(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents] for doc in nlp.pipe(textes)]
+
+
+def exporter_modele(chemin_modele, chemin_sortie, textes_controle=TEXTES_CONTROLE):
+    """
+    Écrit dans `chemin_sortie` un modèle réduit à la reconnaissance d'entités : composants inutiles à doc.ents retirés
+    et StringStore élagué. Vérifie sur `textes_controle` que les entités prédites sont identiques à celles du modèle d'origine.
+    Retourne True si c'est le cas.
+    """
+    nlp = spacy.load(chemin_modele)
+    entites_avant = entites_predites(nlp, textes_controle)
+
+    a_garder = composants_necessaires(nlp)
+    if not a_garder:
+        print(f"ERREUR : aucun composant {COMPOSANTS_INFERENCE} dans le modèle '{chemin_modele}'.")
+        return False
+    retires = [nom for nom in nlp.component_names if nom not in a_garder]
+    for nom in retires:
+        nlp.remove_pipe(nom)
+    print(f"Composants gardés : {', '.join(nlp.component_names)} ; retirés : {', '.join(retires) or 'aucun'}")
+
+    nb_chaines_avant = len(nlp.vocab.strings)
+    nlp.to_disk(chemin_sortie)
+    chaines = sorted(chaines_necessaires(nlp))
+    srsly.write_json(os.path.join(chemin_sortie, "vocab", "strings.json"), chaines)
+    print(f"StringStore élagué : {nb_chaines_avant} -> {len(chaines)} chaînes.")
+
+    entites_apres = entites_predites(spacy.load(chemin_sortie), textes_controle)
+    nb_differences = sum(avant != apres for avant, apres in zip(entites_avant, entites_apres))
+    if nb_differences:
+        print(f"Attention : {nb_differences}/{len(textes_controle)} textes de contrôle ont des entités différentes après l'export.")
+    else:
+        print(f"Contrôle : entités identiques sur {len(textes_controle)} textes.")
+    print(f"Modèle d'inférence exporté dans : '{chemin_sortie}'")
+    return nb_differences == 0
+
+
+def taille_dossier_mo(chemin_dossier):
+    total = sum(os.path.getsize(os.path.join(racine, fichier)) for racine, _, fichiers in os.walk(chemin_dossier) for fichier in fichiers)
+    return round(total / (1024 * 1024), 2)
+
+
+def mesurer_modele(chemin_modele):
+    """Taille sur disque, durée de spacy.load et pic de mémoire résidente, mesurés dans un processus séparé."""
+    sortie = subprocess.run([sys.executable, "-c", SCRIPT_MESURE, chemin_modele], capture_output=True, text=True, check=True).stdout
+    mesures = json.loads(sortie.strip().splitlines()[-1])
+    mesures["disque_mo"] = taille_dossier_mo(chemin_modele)
+    return mesures
+
+
+def afficher_comparaison(mesures_avant, mesures_apres):
+    print(f"{'Mesure':<24}{'Avant':>12}{'Après':>12}")
+    for cle, libelle in [("disque_mo", "Taille sur disque (Mo)"), ("chargement_s", "spacy.load (s)"), ("rss_max_mo", "RSS max (Mo)")]:
+        print(f"{libelle:<24}{mesures_avant[cle]:>12}{mesures_apres[cle]:>12}")
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporte un modèle fine-tuné réduit à l'inférence NER (composants utiles à doc.ents, StringStore élagué).")
+    parser.add_argument("--modele", default=CHEMIN_MODELE_PAR_DEFAUT, help=f"Modèle SpaCy à exporter (défaut: {CHEMIN_MODELE_PAR_DEFAUT}).")
+    parser.add_argument("--sortie", default=CHEMIN_EXPORT_PAR_DEFAUT, help=f"Dossier du modèle d'inférence (défaut: {CHEMIN_EXPORT_PAR_DEFAUT}).")
+    parser.add_argument("--donnees", help=f"Fichier .json/.jsonl dont les {NB_TEXTES_CONTROLE} premiers textes servent au contrôle des entités prédites.")
+    args = parser.parse_args()
+
+    textes = list(TEXTES_CONTROLE)
+    if args.donnees:
+        textes += [texte for texte, _ in itertools.islice(iterer_exemples(args.donnees), NB_TEXTES_CONTROLE)]
+    if exporter_modele(args.modele, args.sortie, textes):
+        afficher_comparaison(mesurer_modele(args.modele), mesurer_modele(args.sortie))
@@ -1,105 +1,512 @@
+import argparse
+import contextlib
+import cProfile
+import itertools
+import json
+import os
+import pickle
 import spacy
 import random # Pour mélanger les données d'entraînement
-import json # Pour charger les données préparées
-from spacy.training.example import Example # Nécessaire pour SpaCy v3.x
+import sys
+import time
+import numpy
+try:
+    import resource # Pic de mémoire (RSS) ; absent sous Windows
+except ImportError:
+    resource = None
+from spacy.util import minibatch
+from thinc.api import compounding
+from corpus_docbin import LANGUE_TOKENISEUR, ExemplesDocBin, collecter_labels, est_corpus_docbin, example_depuis_reference, iterer_examples, verifier_tokeniseur_corpus
+from format_donnees import ExemplesEnFlux, iterer_exemples
+from valider_donnees import obtenir_index_validation
 
 # --- Configuration ---
 MODELE_BASE = "fr_core_news_md"  # Modèle SpaCy pré-entraîné à fine-tuner
+MODELES_SPACY_FR = {"Petit (sm)": "fr_core_news_sm", "Moyen (md)": "fr_core_news_md", "Grand (lg)": "fr_core_news_lg"} # Modèles de base proposés
 CHEMIN_DONNEES_ENTRAINEMENT = "donnees_entrainement_spacy.json" # Fichier généré par preparer_donnees.py
 CHEMIN_MODELE_FINETUNE = "./modele_pseudonymisation_finetune" # Dossier où sauvegarder le modèle fine-tuné
 NOMBRE_ITERATIONS = 10 # Nombre de passages sur l'ensemble des données d'entraînement
 DROPOUT = 0.35 # Taux de dropout pour la régularisation (aide à prévenir le surapprentissage)
+# Taille des lots d'exemples passés à nlp.update : croissante de TAILLE_LOT à TAILLE_LOT_MAX (x FACTEUR_LOT à chaque lot),
+# ou fixe si TAILLE_LOT_MAX vaut 0. Les petits lots du début stabilisent l'entraînement, les gros lots l'accélèrent.
+TAILLE_LOT = 4
+TAILLE_LOT_MAX = 32
+FACTEUR_LOT = 1.001
+# Part des exemples mise de côté (jeu de dev) pour évaluer le modèle à chaque itération ; 0 pour ne pas évaluer.
+PROPORTION_DEV = 0.1
+GRAINE_DEV = 0 # Le découpage entraînement/dev est le même d'un lancement à l'autre
+# Arrêt anticipé après PATIENCE itérations sans amélioration du score F sur le dev ; 0 pour aller jusqu'au bout.
+PATIENCE = 3
+# Point de reprise (poids du NER, état de l'optimiseur, des générateurs aléatoires et itération atteinte),
+# écrit toutes les INTERVALLE_POINT_DE_REPRISE itérations à côté du dossier de sortie : <sortie>_reprise.pkl
+SUFFIXE_POINT_DE_REPRISE = "_reprise.pkl"
+INTERVALLE_POINT_DE_REPRISE = 1
+VERSION_POINT_DE_REPRISE = 1
+# Métriques d'entraînement (par lot et par itération), une ligne JSON par événement : <sortie>_metriques.jsonl
+SUFFIXE_METRIQUES = "_metriques.jsonl"
+# Mode rapide : le tok2vec interne du NER (plongements + encodeur) garde ses poids pré-entraînés et n'est plus entraîné ;
+# ses sorties sont calculées une fois par Doc d'entraînement puis réutilisées à chaque itération (seule la tête du NER apprend).
+GELER_TOK2VEC = False
+TAILLE_LOT_PRECALCUL = 256 # Doc passés ensemble au tok2vec gelé lors du précalcul
 
-def charger_donnees_entrainement(chemin_fichier):
-    """Charge les données d'entraînement depuis un fichier JSON."""
-    with open(chemin_fichier, 'r', encoding='utf-8') as f:
-        donnees = json.load(f)
-    # SpaCy s'attend à des tuples, mais JSON sauvegarde des listes.
-    # Convertir les listes d'entités en tuples.
-    # Exemple: ["texte", {"entities": [[0, 4, "PER"]]}] -> ("texte", {"entities": [(0, 4, "PER")]})
-    donnees_formatees = []
-    for texte, annotations in donnees:
-        entites_formatees = []
-        if "entities" in annotations:
-            for debut, fin, label in annotations["entities"]:
-                entites_formatees.append((debut, fin, label))
-            donnees_formatees.append((texte, {"entities": entites_formatees}))
-        else:
-            # Gérer les cas où il n'y a pas d'entités (ne devrait pas arriver avec nos données générées)
-            donnees_formatees.append((texte, annotations))
-            
-    return donnees_formatees
-
-def fine_tuner_modele_spacy(donnees_entrainement):
+def charger_donnees_entrainement(chemin_fichier, nlp=None):
     """
-    Fine-tune un modèle SpaCy pour la reconnaissance d'entités nommées.
+    Charge les données d'entraînement depuis un fichier JSON.
+    Un fichier .jsonl n'est pas chargé en mémoire : il est relu et mélangé en flux à chaque itération.
+    Un corpus DocBin (.spacy ou dossier de .spacy) est relu déjà tokenisé et annoté (il est validé à sa construction),
+    à condition d'avoir été découpé par le tokeniseur du modèle entraîné (sinon ValueError).
+    Les fichiers .json/.jsonl sont validés une fois (index mis en cache, voir valider_donnees.py) :
+    seuls les exemples valides sont retournés, l'entraînement n'a donc plus à intercepter d'erreurs.
+    `nlp` : le modèle qui sera entraîné ; c'est avec son tokeniseur que l'alignement des entités est vérifié.
     """
-    try:
-        # Charger le modèle SpaCy pré-entraîné
-        nlp = spacy.load(MODELE_BASE)
-        print(f"Modèle de base '{MODELE_BASE}' chargé.")
-    except OSError:
-        print(f"ERREUR: Le modèle de base '{MODELE_BASE}' n'a pas été trouvé.")
-        print(f"Veuillez le télécharger en utilisant la commande : python -m spacy download {MODELE_BASE}")
-        return
+    if est_corpus_docbin(chemin_fichier):
+        verifier_tokeniseur_corpus(chemin_fichier, nlp or spacy.blank(LANGUE_TOKENISEUR))
+        return ExemplesDocBin(chemin_fichier)
+    index = obtenir_index_validation(chemin_fichier, nlp)
+    if chemin_fichier.endswith(".jsonl"):
+        return ExemplesEnFlux(chemin_fichier, exclus=index["exclus"])
+    # SpaCy s'attend à des tuples, mais JSON sauvegarde des listes : iterer_exemples fait la conversion.
+    # Exemple: ["texte", {"entities": [[0, 4, "PER"]]}] -> ("texte", {"entities": [(0, 4, "PER")]})
+    return list(iterer_exemples(chemin_fichier, index["exclus"]))
+
+def tailles_de_lots(taille_lot=TAILLE_LOT, taille_lot_max=TAILLE_LOT_MAX, facteur=FACTEUR_LOT):
+    """Taille fixe (si `taille_lot_max` est nul) ou suite croissante de tailles, à passer à spacy.util.minibatch."""
+    if not taille_lot_max or taille_lot_max <= taille_lot:
+        return taille_lot
+    return compounding(taille_lot, taille_lot_max, facteur)
 
+def preparer_composant_ner(nlp, donnees_entrainement, journal=print):
+    """Obtient (ou crée) le composant NER et y ajoute tous les labels présents dans les données."""
     # Obtenir le composant NER (Reconnaissance d'Entités Nommées)
     if "ner" not in nlp.pipe_names:
         # Créer le composant NER s'il n'existe pas (peu probable pour fr_core_news_md)
         ner = nlp.add_pipe("ner", last=True)
-        print("Composant NER ajouté au pipeline.")
+        journal("Composant NER ajouté au pipeline.")
     else:
         ner = nlp.get_pipe("ner")
-        print("Composant NER existant obtenu du pipeline.")
+        journal("Composant NER existant obtenu du pipeline.")
 
     # Ajouter la nouvelle étiquette (label) au composant NER si elle n'existe pas.
     # Pour "PER", elle devrait déjà exister dans fr_core_news_md.
     # Cette boucle s'assure que toutes les étiquettes présentes dans nos données sont connues du NER.
-    for _, annotations in donnees_entrainement:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2]) # ent[2] est le label, par exemple "PER"
+    labels = collecter_labels(donnees_entrainement)
+    for label in labels:
+        ner.add_label(label) # Par exemple "PER"
+    journal(f"Labels pour NER : {sorted(labels)}")
+    return ner
+
+def separer_dev(nlp, donnees_entrainement, proportion=PROPORTION_DEV, graine=GRAINE_DEV):
+    """
+    Met de côté une part `proportion` des exemples, tirée au hasard mais de façon reproductible (`graine`).
+    Retourne (données d'entraînement restantes, du même type que `donnees_entrainement`, liste d'Example de dev).
+    Pour les sources en flux (.jsonl, DocBin), les exemples de dev sont ajoutés aux exemples exclus de l'entraînement ;
+    la source d'entraînement garde le générateur aléatoire de `donnees_entrainement` (ordre de lecture reproductible).
+    """
+    nb_exemples = len(donnees_entrainement)
+    nb_dev = min(round(nb_exemples * proportion), nb_exemples - 1)
+    if nb_dev <= 0:
+        return donnees_entrainement, []
+    rng = random.Random(graine)
+
+    if isinstance(donnees_entrainement, list):
+        numeros_dev = set(rng.sample(range(nb_exemples), nb_dev))
+        entrainement = [exemple for numero, exemple in enumerate(donnees_entrainement) if numero not in numeros_dev]
+        dev = [exemple for numero, exemple in enumerate(donnees_entrainement) if numero in numeros_dev]
+        return entrainement, list(iterer_examples(nlp, dev))
+
+    # Sources en flux : numérotation de iterer_exemples / ExemplesDocBin sans exclusion, en sautant les exemples déjà exclus.
+    exclus = donnees_entrainement.exclus or {}
+    numeros_valides = [numero for numero in range(nb_exemples + len(exclus)) if numero not in exclus]
+    numeros_dev = set(rng.sample(numeros_valides, nb_dev))
+    exclus_entrainement = {**exclus, **{numero: "dev" for numero in numeros_dev}}
+    if isinstance(donnees_entrainement, ExemplesDocBin):
+        references = ExemplesDocBin(donnees_entrainement.chemin, melanger=False).iterer_docs(nlp.vocab)
+        dev = [example_depuis_reference(nlp.vocab, doc) for numero, doc in enumerate(references) if numero in numeros_dev]
+        entrainement = ExemplesDocBin(donnees_entrainement.chemin, donnees_entrainement.melanger, exclus=exclus_entrainement)
+    else:
+        exemples = iterer_exemples(donnees_entrainement.chemin_fichier)
+        dev = list(iterer_examples(nlp, (exemple for numero, exemple in enumerate(exemples) if numero in numeros_dev)))
+        entrainement = ExemplesEnFlux(donnees_entrainement.chemin_fichier, donnees_entrainement.taille_tampon,
+                                      donnees_entrainement.melanger, exclus=exclus_entrainement)
+    entrainement.rng = donnees_entrainement.rng
+    return entrainement, dev
+
+def couche_tok2vec_interne(ner):
+    """Tok2vec propre au NER (plongements + encodeur), ou None si le NER n'en a pas (ex: tok2vec partagé via un listener)."""
+    if not ner.model.has_ref("tok2vec"):
+        return None
+    couche = ner.model.get_ref("tok2vec").layers[0]
+    return None if "listener" in couche.name else couche
+
+def cle_cache_tok2vec(doc):
+    """Clé de cache d'un Doc : ses tokens. Les sorties du tok2vec ne dépendent que des tokens (NORM, préfixes, suffixes, formes, vecteurs)."""
+    return tuple(token.text for token in doc)
+
+def activer_cache_tok2vec(couche, docs, taille_lot=TAILLE_LOT_PRECALCUL):
+    """
+    Gèle le tok2vec `couche` : ses sorties pour `docs` sont calculées une seule fois, puis relues à chaque passage,
+    sans dropout ni rétropropagation (ses poids ne changent plus). Les Doc sont reconnus par leurs tokens
+    (cle_cache_tok2vec) et non par identité : nlp.update travaille sur des copies des Doc des Example.
+    Tout Doc absent du cache (ex: dev) est calculé à la volée.
+    Seule la fonction de calcul de la couche est remplacée, sa structure et ses poids sont inchangés (sérialisation,
+    points de reprise). Retourne la fonction qui rétablit le tok2vec normal.
+    """
+    forward_original = couche._func
+    cache = {} # tokens du Doc -> sortie du tok2vec
+    for lot in minibatch(docs, size=taille_lot):
+        for doc, sortie in zip(lot, forward_original(couche, lot, is_train=False)[0]):
+            cache[cle_cache_tok2vec(doc)] = sortie
+
+    def forward_en_cache(model, docs, is_train):
+        cles = [cle_cache_tok2vec(doc) for doc in docs]
+        manquants = [doc for doc, cle in zip(docs, cles) if cle not in cache]
+        calcules = dict(zip(map(cle_cache_tok2vec, manquants), forward_original(model, manquants, is_train=False)[0])) if manquants else {}
+        sorties = [cache[cle] if cle in cache else calcules[cle] for cle in cles]
+        return sorties, lambda d_sorties: [] # Pas de gradient vers le tok2vec gelé
+
+    def retablir():
+        couche._func = forward_original
+
+    couche._func = forward_en_cache
+    return retablir
+
+def evaluer_ner(nlp, examples_dev, journal=print):
+    """Évalue le NER sur le jeu de dev (nlp.evaluate) et affiche précision, rappel et F, au total et par label."""
+    scores = nlp.evaluate(examples_dev)
+    journal(f"  Dev ({len(examples_dev)} ex.) - P : {scores['ents_p']:.3f} - R : {scores['ents_r']:.3f} - F : {scores['ents_f']:.3f}")
+    for label, score_label in sorted((scores.get("ents_per_type") or {}).items()):
+        journal(f"    {label} - P : {score_label['p']:.3f} - R : {score_label['r']:.3f} - F : {score_label['f']:.3f}")
+    return scores
+
+def chemin_point_de_reprise(chemin_sortie):
+    return chemin_sortie.rstrip("/\\") + SUFFIXE_POINT_DE_REPRISE
+
+def etat_optimiseur(optimizer, modele):
+    """
+    État de l'optimiseur (moments d'Adam, moyennes, compteurs de mises à jour) pour les paramètres de `modele`.
+    Thinc indexe cet état par (identifiant du nœud, nom du paramètre) ; les identifiants changent d'un processus
+    à l'autre, ils sont donc remplacés par la position du nœud dans modele.walk(), qui est stable.
+    """
+    positions = {noeud.id: position for position, noeud in enumerate(modele.walk())}
+    def convertir(table):
+        return {(positions[id_noeud], nom): valeur for (id_noeud, nom), valeur in (table or {}).items() if id_noeud in positions}
+    return {
+        "mom1": convertir(optimizer.mom1),
+        "mom2": convertir(optimizer.mom2),
+        "averages": convertir(optimizer.averages) if optimizer.averages is not None else None,
+        "nr_update": convertir(optimizer.nr_update),
+        "last_seen": convertir(optimizer.last_seen),
+    }
+
+def restaurer_optimiseur(optimizer, modele, etat):
+    """Inverse de etat_optimiseur : ré-indexe l'état sur les identifiants des nœuds de `modele` dans ce processus."""
+    identifiants = [noeud.id for noeud in modele.walk()]
+    def convertir(table):
+        return {(identifiants[position], nom): valeur for (position, nom), valeur in table.items()}
+    optimizer.mom1.update(convertir(etat["mom1"]))
+    optimizer.mom2.update(convertir(etat["mom2"]))
+    if optimizer.averages is not None and etat["averages"] is not None:
+        optimizer.averages.update(convertir(etat["averages"]))
+    optimizer.nr_update.update(convertir(etat["nr_update"]))
+    optimizer.last_seen.update(convertir(etat["last_seen"]))
+
+def sauvegarder_point_de_reprise(chemin_fichier, etat):
+    """Écrit le point de reprise dans un fichier temporaire puis le renomme : un arrêt pendant l'écriture laisse le précédent intact."""
+    chemin_temporaire = chemin_fichier + ".tmp"
+    with open(chemin_temporaire, "wb") as f:
+        pickle.dump(etat, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(chemin_temporaire, chemin_fichier)
+
+def charger_point_de_reprise(chemin_fichier):
+    """Relit un point de reprise écrit par entrainer_ner (fichier local de confiance), ou None s'il est absent ou d'une autre version."""
+    if not os.path.exists(chemin_fichier):
+        return None
+    with open(chemin_fichier, "rb") as f:
+        etat = pickle.load(f)
+    if etat.get("version") != VERSION_POINT_DE_REPRISE:
+        print(f"Attention : point de reprise '{chemin_fichier}' d'une autre version, ignoré.")
+        return None
+    return etat
+
+def chemin_metriques_par_defaut(chemin_sortie):
+    return chemin_sortie.rstrip("/\\") + SUFFIXE_METRIQUES
+
+def rss_max_mo():
+    """Pic de mémoire résidente du processus, en Mo (None si le module resource n'est pas disponible)."""
+    if resource is None:
+        return None
+    rss_max = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Ko sous Linux, octets sous macOS
+    return round(rss_max / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def ecrire_metrique(fichier_metriques, evenement, **valeurs):
+    """Ajoute un événement au fichier de métriques JSONL (rien si aucun fichier n'est ouvert)."""
+    if fichier_metriques is None:
+        return
+    fichier_metriques.write(json.dumps({"evenement": evenement, "horodatage": round(time.time(), 3), **valeurs}, ensure_ascii=False) + "\n")
+    fichier_metriques.flush()
+
+def chronometrer(elements, chronos, phase):
+    """Produit les éléments de `elements` en ajoutant à chronos[phase] le temps passé à les obtenir (ex: création des Doc en flux)."""
+    iterateur = iter(elements)
+    while True:
+        debut = time.perf_counter()
+        element = next(iterateur, None)
+        chronos[phase] += time.perf_counter() - debut
+        if element is None:
+            return
+        yield element
+
+def passer_lots(nlp, examples, tailles_lots, optimizer, dropout, pertes, chronos, fichier_metriques=None, iteration=0, annulation=None):
+    """
+    Boucle chaude d'une itération : nlp.update sur chaque lot d'Example. Fonction à part pour apparaître telle quelle
+    dans les profils (cProfile, py-spy). S'interrompt avant le lot suivant dès que `annulation` (threading.Event) est levé.
+    Retourne (nombre d'exemples, nombre de mots, nombre de lots).
+    """
+    nb_exemples = nb_mots = nb_lots = 0
+    for lot in minibatch(examples, size=tailles_lots):
+        if annulation is not None and annulation.is_set():
+            break
+        perte_avant = pertes.get("ner", 0.0)
+        debut = time.perf_counter()
+        nlp.update(lot, sgd=optimizer, drop=dropout, losses=pertes) # Mettre à jour le modèle
+        duree = time.perf_counter() - debut
+        chronos["mise_a_jour"] += duree
+        nb_mots_lot = sum(len(eg.predicted) for eg in lot)
+        nb_exemples += len(lot)
+        nb_mots += nb_mots_lot
+        nb_lots += 1
+        ecrire_metrique(fichier_metriques, "lot", iteration=iteration, lot=nb_lots, taille=len(lot), mots=nb_mots_lot, duree_s=round(duree, 4),
+                        exemples_s=round(len(lot) / duree, 1), mots_s=round(nb_mots_lot / duree, 1), perte=round(float(pertes.get("ner", 0.0) - perte_avant), 4))
+    return nb_exemples, nb_mots, nb_lots
 
-    # Commencer l'entraînement
+def entrainer_ner(nlp, donnees_entrainement, nb_iterations=NOMBRE_ITERATIONS, dropout=DROPOUT, tailles_lots=None, journal=print,
+                  proportion_dev=PROPORTION_DEV, patience=PATIENCE, chemin_reprise=None, reprendre=False,
+                  chemin_metriques=None, chemin_profil=None, geler_tok2vec=GELER_TOK2VEC, annulation=None):
+    """
+    Boucle d'entraînement du composant NER, partagée par ce script et l'interface graphique.
+    Les exemples sont passés à nlp.update par lots (`tailles_lots` : entier ou suite de tailles, voir tailles_de_lots ;
+    par défaut, lots croissants de TAILLE_LOT à TAILLE_LOT_MAX).
+    Une part `proportion_dev` des exemples sert à évaluer le modèle après chaque itération : l'entraînement s'arrête
+    après `patience` itérations sans amélioration, et le NER de la meilleure itération est restauré à la fin.
+    `journal` reçoit les messages de progression, dont le débit en exemples par seconde.
+    Si `chemin_reprise` est donné, un point de reprise y est écrit toutes les INTERVALLE_POINT_DE_REPRISE itérations ;
+    avec `reprendre`, l'entraînement repart de ce point (poids, optimiseur, générateurs aléatoires, itération) s'il existe.
+    `chemin_metriques` : fichier JSONL des métriques par lot et par itération (débits, temps par phase, pic de mémoire),
+    complété en cas de reprise. `chemin_profil` : profil cProfile de la boucle de mise à jour (lisible avec pstats ou snakeviz).
+    `geler_tok2vec` : mode rapide, seule la tête du NER est entraînée (voir activer_cache_tok2vec) ; tous les Example
+    sont alors gardés en mémoire, même pour une source en flux.
+    `annulation` (threading.Event) : levé depuis un autre thread, arrête l'entraînement avant le lot suivant. L'itération
+    interrompue n'est ni évaluée ni sauvegardée : le dernier point de reprise reste valable.
+    Retourne les scores de la meilleure itération (None sans jeu de dev).
+    """
+    etat_reprise = charger_point_de_reprise(chemin_reprise) if chemin_reprise and reprendre else None
+    if reprendre and etat_reprise is None:
+        journal("Aucun point de reprise trouvé : l'entraînement démarre depuis le début.")
+    if tailles_lots is None:
+        tailles_lots = tailles_de_lots()
+    donnees_entrainement, examples_dev = separer_dev(nlp, donnees_entrainement, proportion_dev)
+    if examples_dev:
+        journal(f"{len(examples_dev)} exemples mis de côté pour l'évaluation (dev).")
+    ner = nlp.get_pipe("ner")
+    meilleurs_scores = None
+    meilleur_ner = None # NER de la meilleure itération, sérialisé en mémoire
+    meilleure_iteration = 0
+    iteration_depart = 0
+    nb_lots = 0 # Lots déjà passés, pour reprendre la suite des tailles de lots au bon endroit
+    arret_anticipe = False
+    profileur = cProfile.Profile() if chemin_profil else None
+    couche_gelee = couche_tok2vec_interne(ner) if geler_tok2vec else None
+    if geler_tok2vec and couche_gelee is None:
+        journal("Attention : le NER n'a pas de tok2vec interne à geler, entraînement complet.")
+    retablir_tok2vec = None
     # Désactiver les autres composants du pipeline qui ne sont pas nécessaires pour le fine-tuning du NER
     # Cela accélère l'entraînement.
     pipes_a_desactiver = [pipe for pipe in nlp.pipe_names if pipe != "ner"]
-    
-    with nlp.select_pipes(disable=pipes_a_desactiver): # Désactive temporairement les autres pipes
-        print(f"Début du fine-tuning du composant NER pour {NOMBRE_ITERATIONS} itérations...")
+
+    with nlp.select_pipes(disable=pipes_a_desactiver), \
+            (open(chemin_metriques, "a" if reprendre else "w", encoding="utf-8") if chemin_metriques else contextlib.nullcontext()) as fichier_metriques:
+        ecrire_metrique(fichier_metriques, "debut", nb_iterations=nb_iterations, dropout=dropout, nb_dev=len(examples_dev), reprise=etat_reprise is not None)
+        journal(f"Début du fine-tuning du composant NER pour {nb_iterations} itérations...")
+        # begin_training réinitialise tout le NER : en mode gelé, les poids pré-entraînés du tok2vec sont remis ensuite.
+        poids_tok2vec = None
+        if couche_gelee is not None:
+            if all(noeud.has_param(nom) for noeud in couche_gelee.walk() for nom in noeud.param_names):
+                poids_tok2vec = couche_gelee.to_bytes()
+            else:
+                journal("Attention : le tok2vec du modèle de base n'est pas entraîné, il est gelé tel qu'initialisé.")
         optimizer = nlp.begin_training() # Crée un optimiseur
-        
-        for iteration in range(NOMBRE_ITERATIONS):
-            random.shuffle(donnees_entrainement) # Mélanger les données à chaque itération
-            pertes = {} # Pour suivre les erreurs (pertes)
-            
-            # Diviser les données en lots (batches) peut être plus efficace pour de grands datasets
-            # Ici, pour simplifier, nous traitons les exemples un par un, mais spacy.util.minibatch peut être utilisé.
-            for texte, annotations in donnees_entrainement:
-                try:
-                    doc = nlp.make_doc(texte) # Crée un objet Doc à partir du texte
-                    example = Example.from_dict(doc, annotations) # Crée un objet Example
-                    # Mettre à jour le modèle
-                    nlp.update([example], sgd=optimizer, drop=DROPOUT, losses=pertes)
-                except Exception as e:
-                    print(f"Erreur lors de la mise à jour avec le texte : '{texte[:50]}...'")
-                    print(f"Annotations : {annotations}")
-                    print(f"Erreur : {e}")
-                    continue # Passe à l'exemple suivant
-
-            print(f"Itération {iteration + 1}/{NOMBRE_ITERATIONS} - Pertes : {pertes.get('ner', 'N/A')}")
-
-    # Sauvegarder le modèle fine-tuné dans le dossier spécifié
-    nlp.to_disk(CHEMIN_MODELE_FINETUNE)
-    print(f"\nModèle fine-tuné sauvegardé avec succès dans : '{CHEMIN_MODELE_FINETUNE}'")
-    print("Vous pouvez maintenant charger ce modèle en utilisant spacy.load(CHEMIN_MODELE_FINETUNE)")
+        if poids_tok2vec is not None:
+            couche_gelee.from_bytes(poids_tok2vec)
+        if etat_reprise is not None:
+            # begin_training dimensionne le NER pour ses labels ; ses poids sont ensuite remplacés par ceux du point de reprise.
+            ner.from_bytes(etat_reprise["ner"], exclude=["vocab"])
+            restaurer_optimiseur(optimizer, ner.model, etat_reprise["optimiseur"])
+            random.setstate(etat_reprise["random"])
+            numpy.random.set_state(etat_reprise["numpy"])
+            if etat_reprise["rng_donnees"] is not None and hasattr(donnees_entrainement, "rng"):
+                donnees_entrainement.rng.setstate(etat_reprise["rng_donnees"])
+            iteration_depart, nb_lots, arret_anticipe = etat_reprise["iteration"], etat_reprise["nb_lots"], etat_reprise["arret_anticipe"]
+            meilleurs_scores, meilleur_ner, meilleure_iteration = etat_reprise["meilleurs_scores"], etat_reprise["meilleur_ner"], etat_reprise["meilleure_iteration"]
+            if not isinstance(tailles_lots, int):
+                tailles_lots = iter(tailles_lots)
+                # minibatch tire une taille de plus à la fin de chaque itération (lot vide).
+                for _ in itertools.islice(tailles_lots, nb_lots + iteration_depart):
+                    pass
+            journal(f"Reprise depuis '{chemin_reprise}' après l'itération {iteration_depart}.")
+
+        # Données en mémoire : les Example (tokenisation + alignement des entités) sont construits une seule fois,
+        # puis seul l'ordre de la liste est mélangé à chaque itération. Les sources en flux (.jsonl, DocBin)
+        # sont relues à chaque itération pour garder une mémoire bornée.
+        if isinstance(donnees_entrainement, list) or couche_gelee is not None:
+            debut_construction = time.perf_counter()
+            examples = list(iterer_examples(nlp, donnees_entrainement))
+            duree_construction = time.perf_counter() - debut_construction
+            journal(f"{len(examples)} Example construits en {duree_construction:.2f} s, réutilisés à chaque itération.")
+            ecrire_metrique(fichier_metriques, "construction_examples", nb_exemples=len(examples), duree_s=round(duree_construction, 3), rss_max_mo=rss_max_mo())
+        else:
+            examples = None
+        if couche_gelee is not None:
+            debut_precalcul = time.perf_counter()
+            retablir_tok2vec = activer_cache_tok2vec(couche_gelee, [eg.predicted for eg in examples])
+            duree_precalcul = time.perf_counter() - debut_precalcul
+            journal(f"Tok2vec gelé : sorties de {len(examples)} Doc précalculées en {duree_precalcul:.2f} s.")
+            ecrire_metrique(fichier_metriques, "precalcul_tok2vec", nb_docs=len(examples), duree_s=round(duree_precalcul, 3), rss_max_mo=rss_max_mo())
+
+        try:
+            for iteration in range(iteration_depart, nb_iterations if not arret_anticipe else iteration_depart):
+                if examples is not None:
+                    # Mélanger les données à chaque itération (ExemplesEnFlux et ExemplesDocBin se mélangent seuls).
+                    # Nouvelle permutation de l'ordre initial : l'ordre ne dépend que de l'état de `random`, ce qui permet la reprise.
+                    ordre = random.sample(examples, len(examples))
+                pertes = {} # Pour suivre les erreurs (pertes)
+                chronos = {"creation_docs": 0.0, "mise_a_jour": 0.0, "evaluation": 0.0, "point_de_reprise": 0.0} # Temps par phase (s)
+                debut_iteration = time.perf_counter()
+
+                # Les données ont été validées au chargement : aucune erreur n'est à intercepter ici.
+                source = ordre if examples is not None else chronometrer(iterer_examples(nlp, donnees_entrainement), chronos, "creation_docs")
+                if profileur:
+                    profileur.enable()
+                nb_exemples, nb_mots, nb_lots_iteration = passer_lots(nlp, source, tailles_lots, optimizer, dropout, pertes, chronos, fichier_metriques, iteration + 1, annulation)
+                if profileur:
+                    profileur.disable()
+                if annulation is not None and annulation.is_set():
+                    journal(f"Fine-tuning annulé pendant l'itération {iteration + 1}/{nb_iterations}.")
+                    ecrire_metrique(fichier_metriques, "annulation", iteration=iteration + 1, nb_lots=nb_lots_iteration)
+                    break
+                nb_lots += nb_lots_iteration
+
+                duree_entrainement = time.perf_counter() - debut_iteration
+                journal(f"Itération {iteration + 1}/{nb_iterations} - Pertes : {pertes.get('ner', 0.0):.4f} - "
+                        f"{nb_exemples / duree_entrainement:.1f} exemples/s - {nb_mots / duree_entrainement:.0f} mots/s")
+
+                scores = None
+                if examples_dev:
+                    debut_evaluation = time.perf_counter()
+                    scores = evaluer_ner(nlp, examples_dev, journal)
+                    chronos["evaluation"] = time.perf_counter() - debut_evaluation
+                    if meilleurs_scores is None or scores["ents_f"] > meilleurs_scores["ents_f"]:
+                        meilleurs_scores, meilleure_iteration = scores, iteration + 1
+                        meilleur_ner = ner.to_bytes(exclude=["vocab"])
+                    elif patience and iteration + 1 - meilleure_iteration >= patience and iteration + 1 < nb_iterations:
+                        journal(f"Arrêt anticipé : pas d'amélioration sur le dev depuis {patience} itérations.")
+                        arret_anticipe = True
+
+                if chemin_reprise and (arret_anticipe or (iteration + 1) % INTERVALLE_POINT_DE_REPRISE == 0 or iteration + 1 == nb_iterations):
+                    debut_sauvegarde = time.perf_counter()
+                    sauvegarder_point_de_reprise(chemin_reprise, {
+                        "version": VERSION_POINT_DE_REPRISE,
+                        "iteration": iteration + 1,
+                        "nb_lots": nb_lots,
+                        "arret_anticipe": arret_anticipe,
+                        "ner": ner.to_bytes(exclude=["vocab"]),
+                        "optimiseur": etat_optimiseur(optimizer, ner.model),
+                        "random": random.getstate(),
+                        "numpy": numpy.random.get_state(),
+                        "rng_donnees": donnees_entrainement.rng.getstate() if hasattr(donnees_entrainement, "rng") else None,
+                        "meilleurs_scores": meilleurs_scores,
+                        "meilleur_ner": meilleur_ner,
+                        "meilleure_iteration": meilleure_iteration,
+                    })
+                    chronos["point_de_reprise"] = time.perf_counter() - debut_sauvegarde
+
+                ecrire_metrique(fichier_metriques, "iteration", iteration=iteration + 1, nb_exemples=nb_exemples, nb_mots=nb_mots, nb_lots=nb_lots_iteration,
+                                duree_s=round(time.perf_counter() - debut_iteration, 3), exemples_s=round(nb_exemples / duree_entrainement, 1),
+                                mots_s=round(nb_mots / duree_entrainement, 1), perte=round(float(pertes.get("ner", 0.0)), 4),
+                                phases_s={phase: round(duree, 3) for phase, duree in chronos.items()},
+                                f_dev=round(scores["ents_f"], 4) if scores else None, rss_max_mo=rss_max_mo())
+                if arret_anticipe:
+                    break
+        finally:
+            if retablir_tok2vec:
+                retablir_tok2vec() # Le modèle sauvegardé calcule son tok2vec normalement
+
+    if meilleur_ner is not None:
+        ner.from_bytes(meilleur_ner, exclude=["vocab"])
+        journal(f"Meilleure itération : {meilleure_iteration} (F dev : {meilleurs_scores['ents_f']:.3f}), c'est elle qui est conservée.")
+    if profileur:
+        profileur.dump_stats(chemin_profil)
+        journal(f"Profil de la boucle de mise à jour écrit dans '{chemin_profil}' (python -m pstats {chemin_profil}).")
+    return meilleurs_scores
+
+def fine_tuner_modele_spacy(chemin_donnees, modele_base=MODELE_BASE, chemin_sortie=CHEMIN_MODELE_FINETUNE,
+                            nb_iterations=NOMBRE_ITERATIONS, dropout=DROPOUT, tailles_lots=None, proportion_dev=PROPORTION_DEV, patience=PATIENCE,
+                            reprendre=False, chemin_metriques=None, chemin_profil=None, geler_tok2vec=GELER_TOK2VEC):
+    """
+    Fine-tune un modèle SpaCy pour la reconnaissance d'entités nommées sur les données de `chemin_donnees`,
+    chargées après le modèle de base pour être validées avec son tokeniseur. Un point de reprise est écrit à côté de `chemin_sortie` ; avec `reprendre`, l'entraînement repart de ce point.
+    `modele_base` doit alors être le même que pour le premier lancement (tokeniseur, vecteurs et autres composants).
+    Les métriques d'entraînement sont écrites dans `chemin_metriques` (par défaut <sortie>_metriques.jsonl).
+    """
+    try:
+        # Charger le modèle SpaCy pré-entraîné
+        nlp = spacy.load(modele_base)
+        print(f"Modèle de base '{modele_base}' chargé.")
+    except OSError:
+        print(f"ERREUR: Le modèle de base '{modele_base}' n'a pas été trouvé.")
+        print(f"Veuillez le télécharger en utilisant la commande : python -m spacy download {modele_base}")
+        return
+
+    print("Chargement des données d'entraînement...")
+    try:
+        donnees_entrainement = charger_donnees_entrainement(chemin_donnees, nlp)
+    except ValueError as e:
+        print(f"ERREUR : {e}")
+        return
+    if not donnees_entrainement:
+        print("Aucune donnée d'entraînement trouvée. Veuillez d'abord exécuter le script de préparation des données.")
+        return
+    print(f"{len(donnees_entrainement)} exemples d'entraînement chargés.")
+
+    preparer_composant_ner(nlp, donnees_entrainement)
+    entrainer_ner(nlp, donnees_entrainement, nb_iterations, dropout, tailles_lots, proportion_dev=proportion_dev, patience=patience,
+                  chemin_reprise=chemin_point_de_reprise(chemin_sortie), reprendre=reprendre,
+                  chemin_metriques=chemin_metriques or chemin_metriques_par_defaut(chemin_sortie), chemin_profil=chemin_profil,
+                  geler_tok2vec=geler_tok2vec)
+
+    # Sauvegarder le modèle fine-tuné (celui de la meilleure itération s'il y a un jeu de dev) dans le dossier spécifié
+    nlp.to_disk(chemin_sortie)
+    print(f"\nModèle fine-tuné sauvegardé avec succès dans : '{chemin_sortie}'")
+    print(f"Vous pouvez maintenant charger ce modèle en utilisant spacy.load('{chemin_sortie}')")
 
 # --- Programme Principal ---
 if __name__ == "__main__":
-    print("Chargement des données d'entraînement...")
-    TRAIN_DATA = charger_donnees_entrainement(CHEMIN_DONNEES_ENTRAINEMENT)
-    
-    if TRAIN_DATA:
-        print(f"{len(TRAIN_DATA)} exemples d'entraînement chargés.")
-        fine_tuner_modele_spacy(TRAIN_DATA)
-    else:
-        print("Aucune donnée d'entraînement trouvée. Veuillez d'abord exécuter le script de préparation des données.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fine-tune le composant NER d'un modèle SpaCy sur les données générées.")
+    parser.add_argument("--donnees", default=CHEMIN_DONNEES_ENTRAINEMENT, help=f"Données d'entraînement : .json, .jsonl, .spacy ou dossier DocBin (défaut: {CHEMIN_DONNEES_ENTRAINEMENT}).")
+    parser.add_argument("--modele", default=MODELE_BASE, help=f"Modèle SpaCy de base (défaut: {MODELE_BASE}).")
+    parser.add_argument("--sortie", default=CHEMIN_MODELE_FINETUNE, help=f"Dossier de sauvegarde du modèle fine-tuné (défaut: {CHEMIN_MODELE_FINETUNE}).")
+    parser.add_argument("--iterations", type=int, default=NOMBRE_ITERATIONS, help=f"Nombre d'itérations (défaut: {NOMBRE_ITERATIONS}).")
+    parser.add_argument("--dropout", type=float, default=DROPOUT, help=f"Taux de dropout (défaut: {DROPOUT}).")
+    parser.add_argument("--taille_lot", type=int, default=TAILLE_LOT, help=f"Taille (initiale) des lots d'exemples (défaut: {TAILLE_LOT}).")
+    parser.add_argument("--taille_lot_max", type=int, default=TAILLE_LOT_MAX, help=f"Taille maximale des lots, atteinte progressivement ; 0 pour des lots de taille fixe (défaut: {TAILLE_LOT_MAX}).")
+    parser.add_argument("--facteur_lot", type=float, default=FACTEUR_LOT, help=f"Facteur de croissance de la taille des lots à chaque lot (défaut: {FACTEUR_LOT}).")
+    parser.add_argument("--proportion_dev", type=float, default=PROPORTION_DEV, help=f"Part des exemples réservée à l'évaluation à chaque itération ; 0 pour ne pas évaluer (défaut: {PROPORTION_DEV}).")
+    parser.add_argument("--patience", type=int, default=PATIENCE, help=f"Itérations sans amélioration sur le dev avant l'arrêt anticipé ; 0 pour ne jamais s'arrêter avant la fin (défaut: {PATIENCE}).")
+    parser.add_argument("--resume", action="store_true", help="Reprend depuis le dernier point de reprise (<sortie>_reprise.pkl) au lieu de repartir du modèle de base.")
+    parser.add_argument("--metriques", help=f"Fichier JSONL des métriques d'entraînement (défaut: <sortie>{SUFFIXE_METRIQUES}).")
+    parser.add_argument("--profil", help="Écrit un profil cProfile de la boucle de mise à jour dans ce fichier (ex: entrainement.prof).")
+    parser.add_argument("--geler_tok2vec", action="store_true", help="Mode rapide : tok2vec du modèle de base gelé et précalculé, seule la tête du NER est entraînée.")
+    args = parser.parse_args()
+
+    fine_tuner_modele_spacy(args.donnees, args.modele, args.sortie, args.iterations, args.dropout,
+                            tailles_de_lots(args.taille_lot, args.taille_lot_max, args.facteur_lot), args.proportion_dev, args.patience,
+                            args.resume, args.metriques, args.profil, args.geler_tok2vec)
@@ -0,0 +1,142 @@
+import json
+import random
+import textwrap
+
+# --- Configuration ---
+TAILLE_TAMPON_MELANGE = 10000 # Nombre d'exemples gardés en mémoire pour le mélange en flux
+
+
+def normaliser_exemple(item):
+    """
+    Convertit un exemple lu depuis JSON/JSONL au format attendu par SpaCy :
+    ["texte", {"entities": [[0, 4, "PER"]]}] -> ("texte", {"entities": [(0, 4, "PER")]})
+    """
+    texte, annotations = item[0], item[1]
+    if "entities" in annotations:
+        annotations = dict(annotations, entities=[tuple(ent) for ent in annotations["entities"]])
+    return texte, annotations
+
+
+def ecrire_exemples_jsonl(exemples, chemin_fichier_sortie):
+    """
+    Écrit les exemples au format JSONL compact (un exemple JSON par ligne), au fil de l'eau :
+    `exemples` peut être un générateur, rien n'est accumulé en mémoire.
+    Retourne le nombre d'exemples écrits.
+    """
+    nb_exemples = 0
+    with open(chemin_fichier_sortie, "w", encoding="utf-8") as f:
+        for exemple in exemples:
+            f.write(json.dumps(exemple, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            nb_exemples += 1
+    return nb_exemples
+
+
+def ecrire_exemples_json(exemples, chemin_fichier_sortie):
+    """
+    Écrit les exemples sous forme d'une liste JSON indentée, identique à json.dump(..., indent=4),
+    mais au fil de l'eau : `exemples` peut être un générateur. Retourne le nombre d'exemples écrits.
+    """
+    nb_exemples = 0
+    with open(chemin_fichier_sortie, "w", encoding="utf-8") as f:
+        f.write("[")
+        for exemple in exemples:
+            f.write(",\n" if nb_exemples else "\n")
+            f.write(textwrap.indent(json.dumps(exemple, ensure_ascii=False, indent=4), "    "))
+            nb_exemples += 1
+        f.write("\n]" if nb_exemples else "]")
+    return nb_exemples
+
+
+def iterer_exemples(chemin_fichier, exclus=None):
+    """
+    Générateur d'exemples normalisés. Les fichiers .jsonl sont lus ligne par ligne ;
+    les anciens fichiers .json (une seule liste) sont encore acceptés mais chargés en entier.
+    `exclus` : numéros d'exemples à sauter sans les lire (voir valider_donnees.py).
+    """
+    exclus = exclus or {}
+    if chemin_fichier.endswith(".jsonl"):
+        with open(chemin_fichier, "r", encoding="utf-8") as f:
+            lignes = (ligne for ligne in f if ligne.strip())
+            for numero, ligne in enumerate(lignes):
+                if numero not in exclus:
+                    yield normaliser_exemple(json.loads(ligne))
+    else:
+        with open(chemin_fichier, "r", encoding="utf-8") as f:
+            donnees = json.load(f)
+        for numero, item in enumerate(donnees):
+            if numero not in exclus:
+                yield normaliser_exemple(item)
+
+
+def compter_exemples(chemin_fichier):
+    """Compte les exemples d'un fichier sans les garder en mémoire (pour les .jsonl)."""
+    return sum(1 for _ in iterer_exemples(chemin_fichier))
+
+
+def melanger_par_tampon(exemples, taille_tampon=TAILLE_TAMPON_MELANGE, rng=None):
+    """
+    Mélange approximatif en mémoire bornée : un tampon de `taille_tampon` exemples est rempli,
+    puis chaque nouvel exemple prend la place d'un exemple tiré au hasard, qui est produit.
+    Avec un tampon au moins aussi grand que le jeu de données, le mélange est uniforme.
+    """
+    rng = rng or random
+    tampon = []
+    for exemple in exemples:
+        if len(tampon) < taille_tampon:
+            tampon.append(exemple)
+            continue
+        indice = rng.randrange(taille_tampon)
+        yield tampon[indice]
+        tampon[indice] = exemple
+    rng.shuffle(tampon)
+    yield from tampon
+
+
+def entrelacer_flux(flux, tailles, rng=None):
+    """
+    Fusion k-voies en flux : le prochain exemple est pris dans un flux tiré au hasard, avec une
+    probabilité proportionnelle au nombre d'exemples qu'il lui reste (`tailles` donne le total de chaque flux).
+    Tous les entrelacements sont équiprobables et l'ordre interne de chaque flux est conservé ;
+    un seul exemple par flux est en mémoire à la fois.
+    """
+    rng = rng or random
+    iterateurs = [iter(f) for f in flux]
+    restants = list(tailles)
+    total = sum(restants)
+    while total > 0:
+        tirage = rng.randrange(total)
+        indice = 0
+        while tirage >= restants[indice]:
+            tirage -= restants[indice]
+            indice += 1
+        yield next(iterateurs[indice])
+        restants[indice] -= 1
+        total -= 1
+
+
+class ExemplesEnFlux:
+    """
+    Jeu d'exemples relu depuis le disque à chaque itération (donc à chaque époque),
+    mélangé par tampon, en sautant les exemples `exclus` par la validation. S'utilise comme une liste dans les boucles d'entraînement
+    (`for texte, annotations in donnees`), avec une mémoire bornée par le tampon.
+    """
+
+    def __init__(self, chemin_fichier, taille_tampon=TAILLE_TAMPON_MELANGE, melanger=True, graine=None, exclus=None):
+        self.chemin_fichier = chemin_fichier
+        self.exclus = exclus
+        self.taille_tampon = taille_tampon
+        self.melanger = melanger
+        self.rng = random.Random(graine)
+        self.nb_exemples = None
+
+    def __iter__(self):
+        exemples = iterer_exemples(self.chemin_fichier, self.exclus)
+        if self.melanger:
+            exemples = melanger_par_tampon(exemples, self.taille_tampon, self.rng)
+        return iter(exemples)
+
+    def __len__(self):
+        if self.nb_exemples is None:
+            self.nb_exemples = sum(1 for _ in iterer_exemples(self.chemin_fichier, self.exclus))
+        return self.nb_exemples
@@ -2,104 +2,65 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import subprocess
 import spacy
-from spacy.training.example import Example
 import os
 import json
-import random
-
-# --- Logique de Pseudonymisation (adaptée de pseudonymiser_texte.py) ---
+import queue
+import threading
+from moteur_remplacement import pseudonymiser_doc
+from corpus_docbin import ExemplesDocBin, est_corpus_docbin, verifier_tokeniseur_corpus
+from fine_tuner_spacy import (GELER_TOK2VEC, MODELES_SPACY_FR, PATIENCE, PROPORTION_DEV, TAILLE_LOT, TAILLE_LOT_MAX, chemin_metriques_par_defaut, chemin_point_de_reprise, entrainer_ner,
+                              preparer_composant_ner, tailles_de_lots)
+from format_donnees import ExemplesEnFlux, iterer_exemples
+from valider_donnees import obtenir_index_validation
+
+# --- Logique de Pseudonymisation (moteur partagé avec pseudonymiser_texte.py) ---
 def pseudonymiser_texte_pour_gui(nlp_model, texte_original):
     """
     Pseudonymise le texte en utilisant le modèle SpaCy chargé.
     Retourne le texte pseudonymisé et la table de correspondance.
+    Les entités PER, LOC et ORG sont remplacées, chacune avec sa propre numérotation.
     """
     if not nlp_model:
         messagebox.showerror("Erreur Modèle", "Le modèle SpaCy n'est pas chargé pour la pseudonymisation.")
         return None, None
 
-    doc = nlp_model(texte_original)
-    
-    correspondances = {}
-    pseudonyme_compteur = 1
-    
-    entites_a_remplacer = []
-
-    for entite in doc.ents:
-        # On se concentre sur PER pour la pseudonymisation, mais le modèle peut en détecter d'autres.
-        if entite.label_ == "PER": 
-            nom_original = entite.text
-            
-            if nom_original not in correspondances:
-                pseudonyme = f"[PERSONNE_{pseudonyme_compteur}]"
-                correspondances[nom_original] = pseudonyme
-                pseudonyme_compteur += 1
-            else:
-                pseudonyme = correspondances[nom_original]
-            
-            entites_a_remplacer.append((entite.start_char, entite.end_char, pseudonyme))
-
-    # Trier les entités par position de début en ordre inverse pour éviter les problèmes d'indices
-    entites_a_remplacer.sort(key=lambda x: x[0], reverse=True)
-    
-    nouveau_texte_parts = []
-    dernier_index_traite = len(texte_original)
-
-    for start_char, end_char, pseudonyme in entites_a_remplacer:
-        if end_char < dernier_index_traite:
-            nouveau_texte_parts.append(texte_original[end_char:dernier_index_traite])
-        nouveau_texte_parts.append(pseudonyme)
-        dernier_index_traite = start_char
-    
-    nouveau_texte_parts.append(texte_original[0:dernier_index_traite])
-    texte_pseudonymise_final = "".join(reversed(nouveau_texte_parts))
-            
-    return texte_pseudonymise_final, correspondances
+    return pseudonymiser_doc(nlp_model(texte_original))
 
 # --- Fonctions de chargement de données (pour le fine-tuning) ---
-def charger_donnees_entrainement_json(chemin_fichier_json):
-    # ... (Fonction inchangée de la réponse précédente)
-    try:
-        with open(chemin_fichier_json, 'r', encoding='utf-8') as f:
-            donnees = json.load(f)
-        donnees_formatees = []
-        for item in donnees:
-            if isinstance(item, list) and len(item) == 2: 
-                 texte, annotations = item
-            elif isinstance(item, tuple) and len(item) == 2: 
-                 texte, annotations = item
-            else:
-                texte, annotations = item[0], item[1]
-            entites_formatees = []
-            if "entities" in annotations and isinstance(annotations["entities"], list):
-                for ent_item in annotations["entities"]:
-                    if isinstance(ent_item, list) and len(ent_item) == 3:
-                        entites_formatees.append(tuple(ent_item))
-                    elif isinstance(ent_item, tuple) and len(ent_item) == 3:
-                        entites_formatees.append(ent_item)
-                    else:
-                        raise ValueError(f"Format d'entité incorrect: {ent_item}")
-                donnees_formatees.append((texte, {"entities": entites_formatees}))
-            elif "entities" not in annotations :
-                donnees_formatees.append((texte, annotations))
-            else: 
-                donnees_formatees.append((texte, annotations))
-        if not donnees_formatees:
-             messagebox.showwarning("Données Vides", f"Aucune donnée valide trouvée dans '{chemin_fichier_json}'.")
-             return None
-        return donnees_formatees
-    except FileNotFoundError:
-        messagebox.showerror("Erreur Fichier JSON", f"Fichier '{chemin_fichier_json}' introuvable.")
-        return None
-    except Exception as e:
-        messagebox.showerror("Erreur Chargement JSON", f"Erreur chargement/formatage depuis '{chemin_fichier_json}': {e}")
-        return None
+def charger_donnees_entrainement_json(chemin_fichier_json, nlp, journal):
+    """
+    Charge les données du fine-tuning depuis le thread de fine-tuning : le fichier est validé avec le tokeniseur du modèle
+    entraîné (`nlp`), un corpus DocBin doit avoir été découpé par ce tokeniseur. Lève ValueError si aucun exemple n'est utilisable.
+    """
+    # Corpus DocBin pré-tokenisé : un fichier .spacy ou un dossier de fichiers .spacy.
+    if est_corpus_docbin(chemin_fichier_json):
+        verifier_tokeniseur_corpus(chemin_fichier_json, nlp)
+        donnees = ExemplesDocBin(chemin_fichier_json)
+        if not len(donnees):
+            raise ValueError(f"Aucune donnée valide trouvée dans '{chemin_fichier_json}'.")
+        return donnees
+    # Validation unique du fichier (index mis en cache à côté des données) : seuls les exemples valides sont gardés.
+    # Les fichiers .jsonl sont relus en flux à chaque itération au lieu d'être chargés en mémoire.
+    index = obtenir_index_validation(chemin_fichier_json, nlp, journal=journal) # Rapport (exemples exclus et raisons) dans le journal
+    if not index["nb_valides"]:
+        raise ValueError(f"Aucune donnée valide trouvée dans '{chemin_fichier_json}'.")
+    if chemin_fichier_json.endswith(".jsonl"):
+        return ExemplesEnFlux(chemin_fichier_json, exclus=index["exclus"])
+    return list(iterer_exemples(chemin_fichier_json, index["exclus"]))
+
+# --- Configuration ---
+INTERVALLE_SUIVI_MS = 100 # Période de lecture de la file de progression du fine-tuning par la fenêtre
 
 # Variables globales
-MODELES_SPACY_FR = {"Petit (sm)": "fr_core_news_sm", "Moyen (md)": "fr_core_news_md", "Grand (lg)": "fr_core_news_lg"}
 modele_spacy_selectionne = None
 chemin_output_donnees_spacy = None
 chemin_modele_finetune_pour_test = None # Stockera le chemin du modèle qui vient d'être fine-tuné
 mapping_pseudonymes_actuel = None # Stocke le mapping pour la sauvegarde
+# Le fine-tuning tourne dans un thread de travail : il ne touche jamais aux widgets et envoie ses messages
+# dans file_progression, vidée par la fenêtre toutes les INTERVALLE_SUIVI_MS (suivre_fine_tuning).
+thread_fine_tuning = None
+file_progression = queue.Queue()
+evenement_annulation = threading.Event()
 
 # --- Fonctions GUI ---
 def valider_choix_modele():
@@ -145,12 +106,21 @@ def verifier_et_telecharger_modele(nom_modele):
 def choisir_fichier_json_donnees():
     # ... (Fonction inchangée)
     global chemin_output_donnees_spacy
-    chemin_fichier = filedialog.askopenfilename(title="Sélectionner le fichier JSON de données", filetypes=(("Fichiers JSON", "*.json"), ("Tous", "*.*")))
+    chemin_fichier = filedialog.askopenfilename(title="Sélectionner le fichier JSON de données", filetypes=(("Données d'entraînement", "*.json *.jsonl *.spacy"), ("Tous", "*.*")))
     if chemin_fichier:
         var_chemin_donnees_json.set(chemin_fichier)
         chemin_output_donnees_spacy = chemin_fichier
         label_statut_selection_donnees.config(text=f"Fichier : {os.path.basename(chemin_fichier)}")
 
+def choisir_dossier_docbin_donnees():
+    # Corpus DocBin réparti en plusieurs fichiers .spacy (sortie de --format spacy des scripts de préparation)
+    global chemin_output_donnees_spacy
+    chemin_dossier = filedialog.askdirectory(title="Sélectionner le dossier de données DocBin (.spacy)")
+    if chemin_dossier:
+        var_chemin_donnees_json.set(chemin_dossier)
+        chemin_output_donnees_spacy = chemin_dossier
+        label_statut_selection_donnees.config(text=f"Dossier : {os.path.basename(chemin_dossier)}")
+
 def valider_fichier_donnees():
     # ... (Fonction inchangée)
     if not chemin_output_donnees_spacy or not os.path.exists(chemin_output_donnees_spacy):
@@ -158,7 +128,10 @@ def valider_fichier_donnees():
         label_statut_selection_donnees.config(text="Aucun fichier valide.")
         return
     try:
-        with open(chemin_output_donnees_spacy, 'r', encoding='utf-8') as f: json.load(f)
+        if chemin_output_donnees_spacy.endswith(".jsonl"): next(iterer_exemples(chemin_output_donnees_spacy)) # Vérifie la première ligne sans tout charger
+        elif est_corpus_docbin(chemin_output_donnees_spacy): len(ExemplesDocBin(chemin_output_donnees_spacy)) # Vérifie que les fichiers DocBin se lisent
+        else:
+            with open(chemin_output_donnees_spacy, 'r', encoding='utf-8') as f: json.load(f)
         messagebox.showinfo("Données Prêtes", "Fichier de données validé.\nConfigurez le fine-tuning.")
         label_statut_selection_donnees.config(text="Fichier de données prêt.")
         bouton_valider_fichier_donnees.config(state="disabled")
@@ -173,65 +146,112 @@ def choisir_dossier_sauvegarde_modele():
     chemin_dossier = filedialog.askdirectory(title="Sélectionner le dossier de sauvegarde du modèle")
     if chemin_dossier: var_chemin_sauvegarde_modele.set(chemin_dossier)
 
-def lancer_fine_tuning_gui():
+def lancer_fine_tuning_gui(reprendre=False):
     # ... (Début de la fonction inchangé : récupération et validation des params)
-    global modele_spacy_selectionne, chemin_output_donnees_spacy, chemin_modele_finetune_pour_test
+    # reprendre : repartir du point de reprise écrit à côté du dossier de sauvegarde par un lancement précédent
+    global thread_fine_tuning
+    if thread_fine_tuning and thread_fine_tuning.is_alive(): return
     if not modele_spacy_selectionne: messagebox.showerror("Erreur", "Modèle SpaCy non sélectionné."); return
     if not chemin_output_donnees_spacy or not os.path.exists(chemin_output_donnees_spacy): messagebox.showerror("Erreur", "Fichier de données JSON introuvable."); return
     try:
         iterations = var_iterations.get(); dropout = var_dropout.get(); chemin_sauvegarde = var_chemin_sauvegarde_modele.get()
+        taille_lot = var_taille_lot.get(); taille_lot_max = var_taille_lot_max.get()
+        proportion_dev = var_proportion_dev.get(); patience = var_patience.get(); geler_tok2vec = var_geler_tok2vec.get()
         if iterations <= 0: messagebox.showerror("Config Erreur", "Itérations > 0."); return
+        if taille_lot <= 0 or taille_lot_max < 0: messagebox.showerror("Config Erreur", "Taille de lot > 0 (taille max 0 = lots fixes)."); return
         if not (0.0 <= dropout <= 1.0): messagebox.showerror("Config Erreur", "Dropout entre 0.0 et 1.0."); return
+        if not (0.0 <= proportion_dev < 1.0) or patience < 0: messagebox.showerror("Config Erreur", "Part dev entre 0.0 et 1.0, patience >= 0."); return
         if not chemin_sauvegarde: messagebox.showerror("Config Erreur", "Spécifiez un dossier de sauvegarde."); return
-    except tk.TclError: messagebox.showerror("Config Erreur", "Valeurs numériques valides pour itérations/dropout."); return
-    TRAIN_DATA = charger_donnees_entrainement_json(chemin_output_donnees_spacy)
-    if not TRAIN_DATA: log_fine_tuning("Échec chargement données. Vérifiez JSON."); return
-
-    log_fine_tuning("Fine-tuning démarré...\n" + f"Modèle: {modele_spacy_selectionne}, Données: {os.path.basename(chemin_output_donnees_spacy)} ({len(TRAIN_DATA)} ex.), It: {iterations}, Drop: {dropout}, Sauvegarde: {chemin_sauvegarde}\n")
-    bouton_lancer_fine_tuning.config(state="disabled"); fenetre.update_idletasks()
+        if reprendre and not os.path.exists(chemin_point_de_reprise(chemin_sauvegarde)): messagebox.showerror("Reprise", f"Aucun point de reprise trouvé :\n{chemin_point_de_reprise(chemin_sauvegarde)}"); return
+    except tk.TclError: messagebox.showerror("Config Erreur", "Valeurs numériques valides pour itérations/dropout/lots/dev."); return
+    log_fine_tuning(("Reprise du fine-tuning...\n" if reprendre else "Fine-tuning démarré...\n") + f"Modèle: {modele_spacy_selectionne}, Données: {os.path.basename(chemin_output_donnees_spacy)}, It: {iterations}, Drop: {dropout}, Lots: {taille_lot}-{taille_lot_max or taille_lot}, Dev: {proportion_dev}, Patience: {patience}, Tok2vec gelé: {'oui' if geler_tok2vec else 'non'}, Sauvegarde: {chemin_sauvegarde}\n")
+    bouton_lancer_fine_tuning.config(state="disabled"); bouton_reprendre_fine_tuning.config(state="disabled"); bouton_annuler_fine_tuning.config(state="normal")
+    evenement_annulation.clear()
+    parametres = dict(modele=modele_spacy_selectionne, chemin_donnees=chemin_output_donnees_spacy, iterations=iterations, dropout=dropout, tailles_lots=tailles_de_lots(taille_lot, taille_lot_max),
+                      proportion_dev=proportion_dev, patience=patience, geler_tok2vec=geler_tok2vec, chemin_sauvegarde=chemin_sauvegarde, reprendre=reprendre)
+    thread_fine_tuning = threading.Thread(target=executer_fine_tuning, kwargs=parametres, daemon=True)
+    thread_fine_tuning.start()
+    fenetre.after(INTERVALLE_SUIVI_MS, suivre_fine_tuning)
+
+
+def executer_fine_tuning(modele, chemin_donnees, iterations, dropout, tailles_lots, proportion_dev, patience, geler_tok2vec, chemin_sauvegarde, reprendre):
+    """
+    Corps du thread de fine-tuning : les données sont chargées (et validées avec le tokeniseur du modèle) après le modèle, puis même boucle que fine_tuner_spacy.py (lots d'exemples, évaluation sur le dev,
+    arrêt anticipé, meilleure itération conservée). Les messages passent par file_progression ; le dernier est
+    ("termine", chemin), ("annule", None) ou ("erreur", message).
+    """
+    journal = lambda message: file_progression.put(("log", message))
     try:
-        nlp = spacy.load(modele_spacy_selectionne)
-        log_fine_tuning(f"Modèle '{modele_spacy_selectionne}' chargé.")
-        ner = nlp.get_pipe("ner") if "ner" in nlp.pipe_names else nlp.add_pipe("ner", last=True)
-        labels_dans_donnees = set()
-        for _, annotations in TRAIN_DATA:
-            for ent in annotations.get("entities", []): labels_dans_donnees.add(ent[2])
-        for label in labels_dans_donnees: ner.add_label(label)
-        log_fine_tuning(f"Labels pour NER : {labels_dans_donnees}")
-        with nlp.select_pipes(disable=[p for p in nlp.pipe_names if p != "ner"]):
-            optimizer = nlp.begin_training()
-            for i in range(iterations):
-                random.shuffle(TRAIN_DATA); pertes = {}
-                for texte, annots in TRAIN_DATA:
-                    try:
-                        doc = nlp.make_doc(texte)
-                        example = Example.from_dict(doc, annots)
-                        nlp.update([example], sgd=optimizer, drop=dropout, losses=pertes)
-                    except Exception as e_upd: log_fine_tuning(f"Err nlp.update (it {i+1}, ex. ignoré): {e_upd}"); continue
-                log_fine_tuning(f"It {i+1}/{iterations} - Perte NER: {pertes.get('ner',0.0):.4f}")
-                fenetre.update_idletasks()
+        nlp = spacy.load(modele)
+        journal(f"Modèle '{modele}' chargé.")
+        donnees = charger_donnees_entrainement_json(chemin_donnees, nlp, journal)
+        journal(f"{len(donnees)} exemples d'entraînement chargés depuis '{os.path.basename(chemin_donnees)}'.")
+        preparer_composant_ner(nlp, donnees, journal=journal)
+        entrainer_ner(nlp, donnees, iterations, dropout, tailles_lots, journal=journal,
+                      proportion_dev=proportion_dev, patience=patience, chemin_reprise=chemin_point_de_reprise(chemin_sauvegarde), reprendre=reprendre,
+                      chemin_metriques=chemin_metriques_par_defaut(chemin_sauvegarde), geler_tok2vec=geler_tok2vec, annulation=evenement_annulation)
+        if evenement_annulation.is_set():
+            file_progression.put(("annule", None))
+            return
         if not os.path.exists(chemin_sauvegarde): os.makedirs(chemin_sauvegarde)
         nlp.to_disk(chemin_sauvegarde)
-        log_fine_tuning(f"\nModèle fine-tuné sauvegardé dans : '{chemin_sauvegarde}'")
-        messagebox.showinfo("Fine-tuning Terminé", f"Modèle sauvegardé dans\n{chemin_sauvegarde}")
-        chemin_modele_finetune_pour_test = chemin_sauvegarde # Sauvegarder pour l'étape de test
-        activer_cadre_test_modele(True) # Activer le cadre de test
+        journal(f"\nModèle fine-tuné sauvegardé dans : '{chemin_sauvegarde}' (métriques : '{chemin_metriques_par_defaut(chemin_sauvegarde)}')")
+        file_progression.put(("termine", chemin_sauvegarde))
     except Exception as e:
-        log_fine_tuning(f"\nErreur majeure fine-tuning : {e}"); messagebox.showerror("Erreur Fine-tuning", f"Erreur : {e}")
-    finally:
-        bouton_lancer_fine_tuning.config(state="normal")
+        file_progression.put(("erreur", str(e)))
+
+
+def suivre_fine_tuning():
+    """Vide la file de progression (messages regroupés en un seul ajout au log) et traite la fin du fine-tuning."""
+    global chemin_modele_finetune_pour_test
+    messages = []
+    fin = None
+    try:
+        while fin is None:
+            nature, contenu = file_progression.get_nowait()
+            if nature == "log": messages.append(contenu)
+            else: fin = (nature, contenu)
+    except queue.Empty:
+        pass
+    if messages: log_fine_tuning("\n".join(messages))
+    if fin is None:
+        fenetre.after(INTERVALLE_SUIVI_MS, suivre_fine_tuning)
+        return
+    nature, contenu = fin
+    bouton_lancer_fine_tuning.config(state="normal"); bouton_reprendre_fine_tuning.config(state="normal"); bouton_annuler_fine_tuning.config(state="disabled")
+    if nature == "termine":
+        messagebox.showinfo("Fine-tuning Terminé", f"Modèle sauvegardé dans\n{contenu}")
+        chemin_modele_finetune_pour_test = contenu # Sauvegarder pour l'étape de test
+        activer_cadre_test_modele(True) # Activer le cadre de test
+    elif nature == "annule":
+        log_fine_tuning("Fine-tuning annulé : modèle non sauvegardé. « Reprendre » repart du dernier point de reprise.")
+    else:
+        log_fine_tuning(f"\nErreur majeure fine-tuning : {contenu}"); messagebox.showerror("Erreur Fine-tuning", f"Erreur : {contenu}")
+
+def annuler_fine_tuning():
+    # Le thread s'arrête avant le prochain lot d'exemples ; suivre_fine_tuning réactive ensuite les boutons.
+    if thread_fine_tuning and thread_fine_tuning.is_alive():
+        evenement_annulation.set()
+        bouton_annuler_fine_tuning.config(state="disabled")
+        log_fine_tuning("Annulation demandée...")
+
+def fermer_fenetre():
+    if thread_fine_tuning and thread_fine_tuning.is_alive():
+        if not messagebox.askyesno("Fine-tuning en cours", "Un fine-tuning est en cours. L'annuler et quitter ?"): return
+        evenement_annulation.set()
+    fenetre.destroy()
 
 
 def log_fine_tuning(message): # ... (inchangée)
-    text_log_fine_tuning.config(state="normal"); text_log_fine_tuning.insert(tk.END, message + "\n"); text_log_fine_tuning.see(tk.END); text_log_fine_tuning.config(state="disabled"); fenetre.update_idletasks()
+    text_log_fine_tuning.config(state="normal"); text_log_fine_tuning.insert(tk.END, message + "\n"); text_log_fine_tuning.see(tk.END); text_log_fine_tuning.config(state="disabled")
 
 def activer_cadre_selection_donnees(activer): # ... (inchangée)
-    etat = "normal" if activer else "disabled"; bouton_choisir_fichier_json.config(state=etat); entry_chemin_donnees_json.config(state="readonly" if activer else "disabled"); bouton_valider_fichier_donnees.config(state=etat)
+    etat = "normal" if activer else "disabled"; bouton_choisir_fichier_json.config(state=etat); bouton_choisir_dossier_docbin.config(state=etat); entry_chemin_donnees_json.config(state="readonly" if activer else "disabled"); bouton_valider_fichier_donnees.config(state=etat)
     if not activer: var_chemin_donnees_json.set(""); label_statut_selection_donnees.config(text="")
 
 def activer_cadre_fine_tuning(activer): # ... (inchangée)
-    etat = "normal" if activer else "disabled"; entry_iterations.config(state=etat); entry_dropout.config(state=etat); entry_chemin_sauvegarde_modele.config(state="readonly" if activer else "disabled"); bouton_choisir_dossier_modele.config(state=etat); bouton_lancer_fine_tuning.config(state=etat); text_log_fine_tuning.config(state="normal" if activer else "disabled")
-    if not activer: var_iterations.set(10); var_dropout.set(0.3); var_chemin_sauvegarde_modele.set(""); text_log_fine_tuning.config(state="normal"); text_log_fine_tuning.delete(1.0, tk.END); text_log_fine_tuning.config(state="disabled")
+    etat = "normal" if activer else "disabled"; entry_iterations.config(state=etat); entry_dropout.config(state=etat); entry_taille_lot.config(state=etat); entry_taille_lot_max.config(state=etat); entry_proportion_dev.config(state=etat); entry_patience.config(state=etat); case_geler_tok2vec.config(state=etat); entry_chemin_sauvegarde_modele.config(state="readonly" if activer else "disabled"); bouton_choisir_dossier_modele.config(state=etat); bouton_lancer_fine_tuning.config(state=etat); bouton_reprendre_fine_tuning.config(state=etat); bouton_annuler_fine_tuning.config(state="disabled"); text_log_fine_tuning.config(state="normal" if activer else "disabled")
+    if not activer: var_iterations.set(10); var_dropout.set(0.3); var_taille_lot.set(TAILLE_LOT); var_taille_lot_max.set(TAILLE_LOT_MAX); var_proportion_dev.set(PROPORTION_DEV); var_patience.set(PATIENCE); var_geler_tok2vec.set(GELER_TOK2VEC); var_chemin_sauvegarde_modele.set(""); text_log_fine_tuning.config(state="normal"); text_log_fine_tuning.delete(1.0, tk.END); text_log_fine_tuning.config(state="disabled")
 
 # --- Nouvelles Fonctions pour le Cadre de Test ---
 def choisir_fichier_test_txt():
@@ -373,6 +393,8 @@ entry_chemin_donnees_json = ttk.Entry(frame_json_selection, textvariable=var_che
 entry_chemin_donnees_json.pack(side=tk.LEFT, expand=True, fill="x", padx=(0,5))
 bouton_choisir_fichier_json = ttk.Button(frame_json_selection, text="Parcourir...", command=choisir_fichier_json_donnees)
 bouton_choisir_fichier_json.pack(side=tk.LEFT)
+bouton_choisir_dossier_docbin = ttk.Button(frame_json_selection, text="Dossier .spacy...", command=choisir_dossier_docbin_donnees)
+bouton_choisir_dossier_docbin.pack(side=tk.LEFT, padx=(5,0))
 bouton_valider_fichier_donnees = ttk.Button(cadre_selection_donnees, text="Valider Fichier de Données", command=valider_fichier_donnees)
 bouton_valider_fichier_donnees.pack(pady=10)
 label_statut_selection_donnees = ttk.Label(cadre_selection_donnees, text="")
@@ -389,11 +411,28 @@ entry_iterations = ttk.Spinbox(frame_iter, from_=1, to=1000, textvariable=var_it
 frame_drop = ttk.Frame(cadre_fine_tuning); frame_drop.pack(fill="x", pady=2)
 ttk.Label(frame_drop, text="Taux de Dropout (0.0-1.0):", width=25).pack(side=tk.LEFT, padx=(0,5))
 entry_dropout = ttk.Spinbox(frame_drop, from_=0.0, to=1.0, increment=0.05, textvariable=var_dropout, width=10, format="%.2f"); entry_dropout.pack(side=tk.LEFT)
+var_taille_lot = tk.IntVar(value=TAILLE_LOT); var_taille_lot_max = tk.IntVar(value=TAILLE_LOT_MAX)
+frame_lots = ttk.Frame(cadre_fine_tuning); frame_lots.pack(fill="x", pady=2)
+ttk.Label(frame_lots, text="Taille des lots (début / max):", width=25).pack(side=tk.LEFT, padx=(0,5))
+entry_taille_lot = ttk.Spinbox(frame_lots, from_=1, to=1024, textvariable=var_taille_lot, width=6); entry_taille_lot.pack(side=tk.LEFT)
+entry_taille_lot_max = ttk.Spinbox(frame_lots, from_=0, to=1024, textvariable=var_taille_lot_max, width=6); entry_taille_lot_max.pack(side=tk.LEFT, padx=(5,5))
+ttk.Label(frame_lots, text="(max 0 = taille fixe)").pack(side=tk.LEFT)
+var_proportion_dev = tk.DoubleVar(value=PROPORTION_DEV); var_patience = tk.IntVar(value=PATIENCE)
+frame_dev = ttk.Frame(cadre_fine_tuning); frame_dev.pack(fill="x", pady=2)
+ttk.Label(frame_dev, text="Part dev / patience:", width=25).pack(side=tk.LEFT, padx=(0,5))
+entry_proportion_dev = ttk.Spinbox(frame_dev, from_=0.0, to=0.5, increment=0.05, textvariable=var_proportion_dev, width=6, format="%.2f"); entry_proportion_dev.pack(side=tk.LEFT)
+entry_patience = ttk.Spinbox(frame_dev, from_=0, to=100, textvariable=var_patience, width=6); entry_patience.pack(side=tk.LEFT, padx=(5,5))
+ttk.Label(frame_dev, text="(part 0 = pas d'évaluation, patience 0 = pas d'arrêt anticipé)").pack(side=tk.LEFT)
+var_geler_tok2vec = tk.BooleanVar(value=GELER_TOK2VEC)
+case_geler_tok2vec = ttk.Checkbutton(cadre_fine_tuning, text="Mode rapide : tok2vec du modèle de base gelé (seule la tête du NER est entraînée)", variable=var_geler_tok2vec); case_geler_tok2vec.pack(anchor="w", pady=2)
 frame_sauvegarde_modele = ttk.Frame(cadre_fine_tuning); frame_sauvegarde_modele.pack(fill="x", pady=2)
 ttk.Label(frame_sauvegarde_modele, text="Dossier de sauvegarde du modèle:", width=25).pack(side=tk.LEFT, padx=(0,5))
 entry_chemin_sauvegarde_modele = ttk.Entry(frame_sauvegarde_modele, textvariable=var_chemin_sauvegarde_modele, state="readonly", width=40); entry_chemin_sauvegarde_modele.pack(side=tk.LEFT, expand=True, fill="x", padx=(0,5))
 bouton_choisir_dossier_modele = ttk.Button(frame_sauvegarde_modele, text="Parcourir...", command=choisir_dossier_sauvegarde_modele); bouton_choisir_dossier_modele.pack(side=tk.LEFT)
-bouton_lancer_fine_tuning = ttk.Button(cadre_fine_tuning, text="Lancer le Fine-tuning", command=lancer_fine_tuning_gui); bouton_lancer_fine_tuning.pack(pady=10)
+frame_boutons_fine_tuning = ttk.Frame(cadre_fine_tuning); frame_boutons_fine_tuning.pack(pady=10)
+bouton_lancer_fine_tuning = ttk.Button(frame_boutons_fine_tuning, text="Lancer le Fine-tuning", command=lancer_fine_tuning_gui); bouton_lancer_fine_tuning.pack(side=tk.LEFT, padx=5)
+bouton_reprendre_fine_tuning = ttk.Button(frame_boutons_fine_tuning, text="Reprendre depuis le point de reprise", command=lambda: lancer_fine_tuning_gui(reprendre=True)); bouton_reprendre_fine_tuning.pack(side=tk.LEFT, padx=5)
+bouton_annuler_fine_tuning = ttk.Button(frame_boutons_fine_tuning, text="Annuler", command=annuler_fine_tuning, state="disabled"); bouton_annuler_fine_tuning.pack(side=tk.LEFT, padx=5)
 ttk.Label(cadre_fine_tuning, text="Log du Fine-tuning:").pack(anchor="w", pady=(5,0))
 text_log_fine_tuning = scrolledtext.ScrolledText(cadre_fine_tuning, height=8, width=80, state="disabled", wrap=tk.WORD); text_log_fine_tuning.pack(pady=5, fill="x", expand=False)
 
@@ -440,4 +479,5 @@ activer_cadre_selection_donnees(False)
 activer_cadre_fine_tuning(False)
 activer_cadre_test_modele(False)
 
+fenetre.protocol("WM_DELETE_WINDOW", fermer_fenetre)
 fenetre.mainloop()
\ No newline at end of file
@@ -0,0 +1,20 @@
+def lire_entites_depuis_fichier(chemin_fichier):
+    """
+    Lit une liste d'entités (une par ligne) depuis un fichier.
+    """
+    entites = []
+    try:
+        with open(chemin_fichier, 'r', encoding='utf-8') as f:
+            for ligne in f:
+                entite_texte = ligne.strip()
+                if entite_texte:
+                    entites.append(entite_texte)
+        if not entites:
+            print(f"Attention : Aucun contenu trouvé dans le fichier d'entités : {chemin_fichier}")
+        return entites
+    except FileNotFoundError:
+        print(f"ERREUR : Le fichier d'entités '{chemin_fichier}' est introuvable.")
+        return None
+    except Exception as e:
+        print(f"ERREUR : Erreur lors de la lecture du fichier d'entités '{chemin_fichier}': {e}")
+        return None
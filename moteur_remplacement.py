@@ -0,0 +1,157 @@
+import argparse
+import random
+import time
+
+# --- Configuration ---
+# Préfixe des pseudonymes par label : "PER" -> "[PERSONNE_1]", "LOC" -> "[LIEU_1]", "ORG" -> "[ORGANISATION_1]"
+PREFIXES_PSEUDONYMES = {"PER": "PERSONNE", "LOC": "LIEU", "ORG": "ORGANISATION"}
+LABELS_PAR_DEFAUT = ("PER", "LOC", "ORG")
+
+
+class TablePseudonymes:
+    """
+    Table de correspondance {label: {texte original: pseudonyme}} avec un compteur par label,
+    de sorte que chaque label a sa propre numérotation ([PERSONNE_1], [LIEU_1], ...).
+    Un même texte garde, pour un label donné, le pseudonyme attribué à sa première apparition ; détecté sous deux labels,
+    il reçoit deux pseudonymes, comme dans le stock persistant (clé (original, label)).
+    Avec un `stock` (StockCorrespondances), les pseudonymes viennent du stock persistant.
+    Le format est celui des fichiers *_correspondances.json et de l'export du stock sans label.
+    """
+
+    def __init__(self, stock=None):
+        self.correspondances = {}
+        self.compteurs = {}
+        self.stock = stock
+
+    def attribuer(self, entites):
+        """Attribue un pseudonyme à chaque (original, label) encore inconnu, dans l'ordre d'apparition."""
+        nouvelles = [(original, label) for original, label in entites if original not in self.correspondances.get(label, ())]
+        if not nouvelles:
+            return
+        pseudonymes_stock = self.stock.obtenir_pseudonymes(nouvelles) if self.stock is not None else None
+        for original, label in nouvelles:
+            correspondances_label = self.correspondances.setdefault(label, {})
+            if original in correspondances_label:
+                continue
+            if pseudonymes_stock is not None:
+                pseudonyme = pseudonymes_stock[(original, label)]
+            else:
+                numero = self.compteurs.get(label, 0) + 1
+                self.compteurs[label] = numero
+                pseudonyme = f"[{PREFIXES_PSEUDONYMES.get(label, label)}_{numero}]"
+            correspondances_label[original] = pseudonyme
+
+
+def resoudre_chevauchements(entites):
+    """
+    Trie les entités (debut, fin, label) et élimine les chevauchements en une passe :
+    en cas de conflit, l'entité qui commence la première l'emporte, puis la plus longue.
+    Les entités d'un Doc sont déjà triées et disjointes ; ce n'est utile que pour des spans d'origines mélangées.
+    """
+    resultat = []
+    fin_precedente = 0
+    for debut, fin, label in sorted(entites, key=lambda e: (e[0], -e[1])):
+        if debut >= fin_precedente:
+            resultat.append((debut, fin, label))
+            fin_precedente = fin
+    return resultat
+
+
+def remplacer_spans(texte, entites, correspondances):
+    """Construit le texte pseudonymisé en une seule passe avant sur des entités triées et disjointes."""
+    morceaux = []
+    curseur = 0
+    for debut, fin, label in entites:
+        morceaux.append(texte[curseur:debut])
+        morceaux.append(correspondances[label][texte[debut:fin]])
+        curseur = fin
+    morceaux.append(texte[curseur:])
+    return "".join(morceaux)
+
+
+def pseudonymiser_spans(texte, entites, table=None, labels=LABELS_PAR_DEFAUT):
+    """
+    Pseudonymise `texte` à partir d'entités (debut, fin, label), par exemple issues d'un Doc ou du cache.
+    Seuls les `labels` demandés sont remplacés. Une `table` existante est complétée sur place,
+    ce qui garde des pseudonymes cohérents entre plusieurs blocs d'un même document.
+    Retourne le texte modifié ainsi que la table de correspondance.
+    """
+    if table is None:
+        table = TablePseudonymes()
+    entites = resoudre_chevauchements(e for e in entites if e[2] in labels)
+    table.attribuer([(texte[debut:fin], label) for debut, fin, label in entites])
+    return remplacer_spans(texte, entites, table.correspondances), table.correspondances
+
+
+def pseudonymiser_doc(doc, table=None, stock=None, labels=LABELS_PAR_DEFAUT):
+    """
+    Pseudonymise un Doc déjà analysé par le modèle (par exemple issu de nlp.pipe).
+    Retourne le texte modifié ainsi que la table de correspondance.
+    """
+    if table is None:
+        table = TablePseudonymes(stock)
+    entites = [(entite.start_char, entite.end_char, entite.label_) for entite in doc.ents]
+    return pseudonymiser_spans(doc.text, entites, table, labels)
+
+
+def remplacer_par_tri_inverse(texte, entites, correspondances):
+    """Ancienne implémentation (tri inverse puis inversion de la liste), conservée comme référence de mesure."""
+    a_remplacer = sorted(((debut, fin, correspondances[label][texte[debut:fin]]) for debut, fin, label in entites), key=lambda x: x[0], reverse=True)
+    morceaux = []
+    dernier_index_traite = len(texte)
+    for debut, fin, pseudonyme in a_remplacer:
+        if fin < dernier_index_traite:
+            morceaux.append(texte[fin:dernier_index_traite])
+        morceaux.append(pseudonyme)
+        dernier_index_traite = debut
+    morceaux.append(texte[0:dernier_index_traite])
+    return "".join(reversed(morceaux))
+
+
+def generer_texte_annote(nb_entites, graine=0):
+    """Génère un texte synthétique très annoté : une entité tous les quelques mots, labels PER/LOC/ORG mélangés."""
+    rng = random.Random(graine)
+    noms = {"PER": [f"Personne{i} NOM{i}" for i in range(500)], "LOC": [f"Ville{i}" for i in range(200)], "ORG": [f"Collège Numéro {i}" for i in range(200)]}
+    morceaux = []
+    entites = []
+    position = 0
+    for _ in range(nb_entites):
+        liaison = rng.choice([" a rencontré ", ", à ", " et ", " pour le compte de "])
+        label = rng.choice(LABELS_PAR_DEFAUT)
+        nom = rng.choice(noms[label])
+        position += len(liaison)
+        entites.append((position, position + len(nom), label))
+        morceaux.extend([liaison, nom])
+        position += len(nom)
+    return "".join(morceaux), entites
+
+
+def mesurer_remplacement(nb_entites=200000, repetitions=5):
+    """Compare l'ancienne reconstruction (tri inverse) et la passe avant sur un texte très annoté."""
+    texte, entites = generer_texte_annote(nb_entites)
+    table = TablePseudonymes()
+    table.attribuer([(texte[debut:fin], label) for debut, fin, label in entites])
+    print(f"Texte synthétique : {len(texte)} caractères, {len(entites)} entités, {sum(len(c) for c in table.correspondances.values())} pseudonymes distincts.")
+
+    for nom, fonction in (("tri inverse", remplacer_par_tri_inverse), ("passe avant", remplacer_spans)):
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            resultat = fonction(texte, entites, table.correspondances)
+            durees.append(time.perf_counter() - debut)
+        meilleure = min(durees)
+        print(f"{nom:<12} : {meilleure * 1000:8.1f} ms ({len(entites) / meilleure:,.0f} entités/s)")
+    print(f"Résultats identiques : {remplacer_par_tri_inverse(texte, entites, table.correspondances) == resultat}")
+
+    debut = time.perf_counter()
+    pseudonymiser_spans(texte, entites)
+    print(f"Chaîne complète (chevauchements + attribution + remplacement) : {(time.perf_counter() - debut) * 1000:.1f} ms")
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure le moteur de remplacement sur un texte synthétique très annoté.")
+    parser.add_argument("--nb_entites", type=int, default=200000, help="Nombre d'entités dans le texte synthétique (défaut: 200000).")
+    args = parser.parse_args()
+
+    mesurer_remplacement(args.nb_entites)
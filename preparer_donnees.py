@@ -1,4 +1,9 @@
-import re # Utilisé pour trouver la position exacte du nom
+import argparse
+import random
+from compilateur_modeles import compiler_modele, echantillonner_exemples_modeles, iterer_exemples_modeles
+from corpus_docbin import TAILLE_PARTIE_PAR_DEFAUT, ecrire_exemples_docbin
+from fine_tuner_spacy import MODELE_BASE
+from format_donnees import ecrire_exemples_jsonl
 
 def lire_noms(chemin_fichier_noms):
     """
@@ -44,35 +49,39 @@ def lire_phrases_modeles(chemin_fichier_phrases):
                 print(f"Attention : La phrase modèle suivante ne contient pas {{NOM}} ou est vide après nettoyage : '{ligne.strip()}'")
     return phrases
 
-def generer_donnees_entrainement(noms, phrases_modeles):
+def generer_donnees_entrainement(noms, phrases_modeles, budget=None, rng=None):
     """
     Génère les données d'entraînement au format SpaCy.
     """
-    donnees_entrainement = []
-    label_entite = "PER" # Étiquette pour les personnes
+    return list(iterer_donnees_entrainement(noms, phrases_modeles, budget, rng))
 
-    for nom in noms:
-        for phrase_modele in phrases_modeles:
-            # Remplace le placeholder {NOM} par le nom actuel
-            phrase_formatee = phrase_modele.replace("{NOM}", nom)
-            
-            # Trouve les indices de début et de fin du nom dans la phrase formatée
-            # Utiliser re.escape pour gérer les caractères spéciaux dans les noms (s'il y en avait)
-            match = re.search(re.escape(nom), phrase_formatee)
-            if match:
-                debut, fin = match.span()
-                entite = (debut, fin, label_entite)
-                donnees_entrainement.append((phrase_formatee, {"entities": [entite]}))
-            else:
-                # Cela peut arriver si le nom contient des caractères que .replace modifie
-                # ou si le nom est un sous-ensemble d'un mot plus grand après remplacement.
-                # Pour des noms simples, cela ne devrait pas poser problème.
-                print(f"Attention : Impossible de trouver le nom '{nom}' dans la phrase générée '{phrase_formatee}'")
-
-    return donnees_entrainement
+def iterer_donnees_entrainement(noms, phrases_modeles, budget=None, rng=None):
+    """
+    Version générateur de generer_donnees_entrainement : les exemples sont produits un par un,
+    pour pouvoir être écrits en JSONL sans tout garder en mémoire.
+    Avec un `budget`, seuls `budget` exemples distincts sont tirés (stratifiés par nom et par modèle)
+    au lieu de toutes les combinaisons noms × phrases modèles.
+    """
+    # Chaque phrase modèle est compilée une seule fois en fragments littéraux et emplacements :
+    # les positions du nom sont ensuite calculées par simple addition de longueurs.
+    modeles_compiles = [compiler_modele(phrase_modele, {"{NOM}": "PER"}) for phrase_modele in phrases_modeles]
+    if budget is not None:
+        yield from echantillonner_exemples_modeles(noms, modeles_compiles, "{NOM}", budget, rng=rng)
+    else:
+        yield from iterer_exemples_modeles(noms, modeles_compiles, "{NOM}", rng=rng)
 
 # --- Programme Principal ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère des données d'entraînement PER à partir d'un annuaire et de phrases modèles.")
+    parser.add_argument("--format", choices=["json", "jsonl", "spacy"], default="json", help="Format de sortie : 'json' (liste indentée), 'jsonl' (un exemple par ligne, écrit en flux) ou 'spacy' (fichiers DocBin pré-tokenisés). Défaut : json.")
+    parser.add_argument("--n_process", type=int, default=1, help="Format spacy : nombre de processus construisant les fichiers DocBin en parallèle (défaut: 1).")
+    parser.add_argument("--modele", default=MODELE_BASE, help=f"Format spacy : modèle de base du fine-tuning, dont le tokeniseur découpe le corpus (défaut: {MODELE_BASE}).")
+    parser.add_argument("--taille_partie", type=int, default=TAILLE_PARTIE_PAR_DEFAUT, help=f"Format spacy : nombre d'exemples par fichier .spacy (défaut: {TAILLE_PARTIE_PAR_DEFAUT}).")
+    parser.add_argument("--budget", type=int, help="Nombre d'exemples à générer, tirés de façon stratifiée parmi les combinaisons noms × phrases modèles (défaut : toutes les combinaisons).")
+    parser.add_argument("--graine", type=int, help="Graine aléatoire pour rendre le tirage reproductible.")
+    args = parser.parse_args()
+    rng = random.Random(args.graine)
+
     chemin_annuaire = "annuaire_simplifié.txt"
     chemin_phrases = "phrases_modeles.txt"
 
@@ -88,9 +97,20 @@ if __name__ == "__main__":
     if modeles_phrases:
         print(f"Exemple de phrase modèle lue : '{modeles_phrases[0]}'")
 
-    if noms_propres and modeles_phrases:
+    if noms_propres and modeles_phrases and args.format == "spacy":
+        print("\nGénération des données d'entraînement pré-tokenisées (DocBin)...")
+        try:
+            nb_exemples, nb_fichiers, _ = ecrire_exemples_docbin(iterer_donnees_entrainement(noms_propres, modeles_phrases, args.budget, rng), "donnees_entrainement_spacy_docbin", args.taille_partie, args.n_process, args.modele)
+            print(f"{nb_exemples} exemples d'entraînement sauvegardés dans 'donnees_entrainement_spacy_docbin' ({nb_fichiers} fichiers .spacy)")
+        except OSError as e:
+            print(f"ERREUR : Impossible de charger le modèle de base '{args.modele}' ou d'écrire le corpus : {e}")
+    elif noms_propres and modeles_phrases and args.format == "jsonl":
+        print("\nGénération des données d'entraînement en flux...")
+        nb_exemples = ecrire_exemples_jsonl(iterer_donnees_entrainement(noms_propres, modeles_phrases, args.budget, rng), "donnees_entrainement_spacy.jsonl")
+        print(f"{nb_exemples} exemples d'entraînement sauvegardés dans 'donnees_entrainement_spacy.jsonl'")
+    elif noms_propres and modeles_phrases:
         print("\nGénération des données d'entraînement...")
-        donnees_pour_spacy = generer_donnees_entrainement(noms_propres, modeles_phrases)
+        donnees_pour_spacy = generer_donnees_entrainement(noms_propres, modeles_phrases, args.budget, rng)
         print(f"Nombre d'exemples d'entraînement générés : {len(donnees_pour_spacy)}")
 
         if donnees_pour_spacy:
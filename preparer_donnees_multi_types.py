@@ -1,30 +1,25 @@
-import re
+import hashlib
 import json
 import os
+import argparse
+import itertools
+import random
+import shutil
+from multiprocessing import Pool
+from compilateur_modeles import PLACEHOLDERS_LABELS, compiler_modele, echantillonner_exemples_modeles, iterer_exemples_modeles
+from corpus_docbin import TAILLE_PARTIE_PAR_DEFAUT, ecrire_exemples_docbin
+from fine_tuner_spacy import MODELE_BASE
+from format_donnees import TAILLE_TAMPON_MELANGE, compter_exemples, ecrire_exemples_json, ecrire_exemples_jsonl, entrelacer_flux, iterer_exemples, melanger_par_tampon
+from listes_entites import lire_entites_depuis_fichier
 # from tkinter import messagebox # Retiré car c'est un script CLI pour l'instant. On utilise print.
 
-# --- Fonctions de base ---
+# --- Configuration ---
+TAILLE_TRANCHE_ENTITES = 5000 # Nombre d'entités par tâche de génération : les gros types sont découpés en plusieurs parties
+DOSSIER_PARTIES = "donnees_entrainement_parties" # Fichiers JSONL intermédiaires, un par tâche, réutilisés d'une exécution à l'autre
+CHEMIN_MANIFESTE = os.path.join(DOSSIER_PARTIES, "manifeste.json") # Empreintes des entrées de chaque type et parties produites
+VERSION_MANIFESTE = 1 # À incrémenter si le format des exemples générés change
 
-def lire_entites_depuis_fichier(chemin_fichier):
-    """
-    Lit une liste d'entités (une par ligne) depuis un fichier.
-    """
-    entites = []
-    try:
-        with open(chemin_fichier, 'r', encoding='utf-8') as f:
-            for ligne in f:
-                entite_texte = ligne.strip()
-                if entite_texte:
-                    entites.append(entite_texte)
-        if not entites:
-            print(f"Attention : Aucun contenu trouvé dans le fichier d'entités : {chemin_fichier}")
-        return entites
-    except FileNotFoundError:
-        print(f"ERREUR : Le fichier d'entités '{chemin_fichier}' est introuvable.")
-        return None
-    except Exception as e:
-        print(f"ERREUR : Erreur lors de la lecture du fichier d'entités '{chemin_fichier}': {e}")
-        return None
+# --- Fonctions de base ---
 
 def lire_phrases_modeles_specifiques(chemin_fichier_phrases, placeholder_attendu):
     """
@@ -63,47 +58,182 @@ def lire_phrases_modeles_specifiques(chemin_fichier_phrases, placeholder_attendu
         print(f"ERREUR : Erreur lors de la lecture du fichier de modèles de phrases '{chemin_fichier_phrases}': {e}")
         return None
 
-def generer_donnees_pour_type(liste_entites, liste_phrases_modeles, label_entite, placeholder):
+def iterer_donnees_pour_type(liste_entites, liste_phrases_modeles, label_entite, placeholder, entites_par_placeholder=None, budget=None, rng=None):
     """
-    Génère les données d'entraînement au format SpaCy pour un type d'entité spécifique.
+    Génère les données d'entraînement au format SpaCy pour un type d'entité spécifique. Les exemples sont produits
+    un par un, pour pouvoir être écrits en JSONL sans tout garder en mémoire.
+    Une phrase modèle peut contenir d'autres placeholders (ex: {NOM} et {ORG}) : ils sont remplis
+    à partir de `entites_par_placeholder` ({placeholder: liste d'entités}) et annotés eux aussi.
+    Avec un `budget`, seuls `budget` exemples distincts sont tirés au lieu du produit cartésien complet.
     """
-    donnees_entrainement = []
-    if not liste_entites or not liste_phrases_modeles:
-        print(f"Impossible de générer des données pour le label '{label_entite}' car la liste d'entités ou de phrases modèles est vide/invalide.")
-        return donnees_entrainement
-
-    for entite_texte in liste_entites:
-        for phrase_modele in liste_phrases_modeles:
-            phrase_formatee = phrase_modele.replace(placeholder, entite_texte)
-            
-            match = re.search(re.escape(entite_texte), phrase_formatee)
-            if match:
-                debut, fin = match.span()
-                entite_spacy = (debut, fin, label_entite)
-                donnees_entrainement.append((phrase_formatee, {"entities": [entite_spacy]}))
-            else:
-                print(f"Attention : Impossible de trouver l'entité '{entite_texte}' (label: {label_entite}) dans la phrase générée '{phrase_formatee}' avec le placeholder '{placeholder}'.")
-    
-    return donnees_entrainement
+    placeholders_labels = dict(PLACEHOLDERS_LABELS)
+    placeholders_labels[placeholder] = label_entite
+    modeles_compiles = [compiler_modele(phrase_modele, placeholders_labels) for phrase_modele in liste_phrases_modeles]
+    if budget is not None:
+        yield from echantillonner_exemples_modeles(liste_entites, modeles_compiles, placeholder, budget, entites_par_placeholder, rng)
+    else:
+        yield from iterer_exemples_modeles(liste_entites, modeles_compiles, placeholder, entites_par_placeholder, rng)
+
+# --- Génération parallèle par parties ---
+
+_entites_par_placeholder_worker = None # Listes d'entités de tous les types, transmises une fois par processus
 
-def sauvegarder_donnees_json(donnees, chemin_fichier_sortie):
+def _initialiser_worker(entites_par_placeholder):
+    global _entites_par_placeholder_worker
+    _entites_par_placeholder_worker = entites_par_placeholder
+
+def repartir(total, poids):
+    """Répartit l'entier `total` proportionnellement à `poids` ; le reste va aux premiers éléments."""
+    somme_poids = sum(poids)
+    parts = [total * p // somme_poids for p in poids]
+    for i in range(total - sum(parts)):
+        parts[i] += 1
+    return parts
+
+def decouper_type_en_taches(config_type, entites, phrases_modeles, budget_type, graine, indice_depart=0, taille_tranche=TAILLE_TRANCHE_ENTITES):
+    """
+    Découpe un type en tranches d'au plus `taille_tranche` entités : une tâche par tranche, écrite dans sa propre partie.
+    Le budget éventuel du type est réparti entre les tranches au prorata de leur nombre d'entités.
+    Chaque tâche reçoit sa propre graine, dérivée de `graine`, du label et de l'indice de tranche ;
+    `indice_depart` permet d'ajouter des tranches à la suite de celles d'une exécution précédente.
+    """
+    tranches = [entites[i:i + taille_tranche] for i in range(0, len(entites), taille_tranche)]
+    budgets_tranches = repartir(budget_type, [len(t) for t in tranches]) if budget_type is not None else [None] * len(tranches)
+    taches = []
+    for indice, (tranche, budget_tranche) in enumerate(zip(tranches, budgets_tranches), indice_depart):
+        graine_tache = f"{graine}-{config_type['label']}-{indice}" if graine is not None else None
+        chemin_partie = os.path.join(DOSSIER_PARTIES, f"{config_type['label'].lower()}_{indice:04d}.jsonl")
+        taches.append((config_type["label"], config_type["placeholder"], tranche, phrases_modeles, budget_tranche, graine_tache, chemin_partie))
+    return taches
+
+def generer_partie(tache):
+    """Génère les exemples d'une tranche d'entités dans son propre fichier JSONL (exécuté dans un processus de travail)."""
+    label, placeholder, entites, phrases_modeles, budget, graine, chemin_partie = tache
+    exemples = iterer_donnees_pour_type(entites, phrases_modeles, label, placeholder, _entites_par_placeholder_worker, budget, random.Random(graine))
+    return label, chemin_partie, ecrire_exemples_jsonl(exemples, chemin_partie)
+
+def generer_parties(taches, entites_par_placeholder, n_process=1):
+    """Exécute les tâches, en parallèle si `n_process` > 1. Retourne [(label, chemin_partie, nb_exemples)] dans l'ordre des tâches."""
+    os.makedirs(DOSSIER_PARTIES, exist_ok=True)
+    if n_process > 1:
+        with Pool(n_process, initializer=_initialiser_worker, initargs=(entites_par_placeholder,)) as pool:
+            return pool.map(generer_partie, taches, chunksize=1)
+    _initialiser_worker(entites_par_placeholder)
+    return [generer_partie(tache) for tache in taches]
+
+# --- Manifeste de construction (reconstruction incrémentale) ---
+
+def empreinte_entites(entites, nb_prefixe=0):
+    """
+    Empreinte SHA-256 de la liste d'entités, ainsi que celle de ses `nb_prefixe` premières entités
+    (pour reconnaître une liste à laquelle on a seulement ajouté des noms à la fin).
+    """
+    hachage = hashlib.sha256()
+    empreinte_prefixe = None
+    for indice, entite in enumerate(entites):
+        if indice == nb_prefixe:
+            empreinte_prefixe = hachage.hexdigest()
+        hachage.update(entite.encode("utf-8") + b"\n")
+    empreinte = hachage.hexdigest()
+    return empreinte, empreinte if nb_prefixe == len(entites) else empreinte_prefixe
+
+def empreinte_parametres(config_type, phrases_modeles, budget_type, graine, entites_par_placeholder):
     """
-    Sauvegarde les données générées dans un fichier JSON.
+    Empreinte de tout ce qui, en dehors de la liste d'entités du type, détermine les exemples produits :
+    phrases modèles, label, placeholder, budget, graine, découpage en tranches, et listes des autres
+    placeholders utilisés par les phrases modèles (leurs valeurs sont tirées dans ces listes).
     """
-    if not donnees:
-        print(f"Aucune donnée à sauvegarder pour '{chemin_fichier_sortie}'.")
-        return False
+    autres_placeholders = sorted({p for phrase in phrases_modeles for p in compiler_modele(phrase).emplacements if p != config_type["placeholder"]})
+    parametres = {
+        "version": VERSION_MANIFESTE,
+        "label": config_type["label"],
+        "placeholder": config_type["placeholder"],
+        "phrases_modeles": hashlib.sha256("\n".join(phrases_modeles).encode("utf-8")).hexdigest(),
+        "budget": budget_type,
+        "graine": graine,
+        "taille_tranche": TAILLE_TRANCHE_ENTITES,
+        "autres_listes": {p: empreinte_entites(entites_par_placeholder.get(p, []))[0] for p in autres_placeholders},
+    }
+    return hashlib.sha256(json.dumps(parametres, sort_keys=True).encode("utf-8")).hexdigest()
+
+def charger_manifeste(chemin_manifeste=CHEMIN_MANIFESTE):
     try:
-        with open(chemin_fichier_sortie, "w", encoding="utf-8") as outfile:
-            json.dump(donnees, outfile, ensure_ascii=False, indent=4)
-        print(f"{len(donnees)} exemples d'entraînement sauvegardés dans '{chemin_fichier_sortie}'")
-        return True
-    except Exception as e:
-        print(f"ERREUR : Impossible de sauvegarder les données dans '{chemin_fichier_sortie}': {e}")
-        return False
+        with open(chemin_manifeste, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"types": {}}
+
+def sauvegarder_manifeste(manifeste, chemin_manifeste=CHEMIN_MANIFESTE):
+    os.makedirs(os.path.dirname(chemin_manifeste), exist_ok=True)
+    with open(chemin_manifeste, "w", encoding="utf-8") as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=4)
+
+def supprimer_parties(parties):
+    for chemin_partie, _ in parties:
+        if os.path.exists(chemin_partie):
+            os.remove(chemin_partie)
+
+def planifier_type(config_type, entites, phrases_modeles, budget_type, graine, entites_par_placeholder, entree_precedente):
+    """
+    Compare les entrées d'un type à celles enregistrées dans le manifeste et décide quoi générer :
+    - rien si rien n'a changé (les parties précédentes sont réutilisées) ;
+    - seulement les nouvelles entités si la liste a uniquement été complétée à la fin (hors mode budget,
+      où l'ajout d'entités change la répartition du tirage) ;
+    - tout le type sinon (les anciennes parties sont supprimées).
+    Retourne (tâches à exécuter, parties réutilisées, nouvelle entrée du manifeste sans ses parties).
+    """
+    label = config_type["label"]
+    parametres = empreinte_parametres(config_type, phrases_modeles, budget_type, graine, entites_par_placeholder)
+    nb_entites_precedent = entree_precedente["nb_entites"] if entree_precedente else 0
+    empreinte, empreinte_prefixe = empreinte_entites(entites, nb_entites_precedent if nb_entites_precedent <= len(entites) else 0)
+    nouvelle_entree = {"empreinte_parametres": parametres, "empreinte_entites": empreinte, "nb_entites": len(entites)}
+
+    reutilisable = (
+        entree_precedente is not None
+        and entree_precedente["empreinte_parametres"] == parametres
+        and all(os.path.exists(chemin) for chemin, _ in entree_precedente["parties"])
+    )
+    if reutilisable and entree_precedente["empreinte_entites"] == empreinte:
+        print(f"{label} : entrées inchangées, {len(entree_precedente['parties'])} parties réutilisées.")
+        nouvelle_entree["nb_tranches"] = entree_precedente["nb_tranches"]
+        return [], entree_precedente["parties"], nouvelle_entree
+    if reutilisable and budget_type is None and nb_entites_precedent < len(entites) and empreinte_prefixe == entree_precedente["empreinte_entites"]:
+        nouvelles_entites = entites[nb_entites_precedent:]
+        print(f"{label} : {len(nouvelles_entites)} nouvelles entités, seules celles-ci sont générées.")
+        taches = decouper_type_en_taches(config_type, nouvelles_entites, phrases_modeles, budget_type, graine, entree_precedente["nb_tranches"])
+        nouvelle_entree["nb_tranches"] = entree_precedente["nb_tranches"] + len(taches)
+        return taches, entree_precedente["parties"], nouvelle_entree
+
+    if entree_precedente:
+        supprimer_parties(entree_precedente["parties"])
+    if budget_type is not None:
+        print(f"Budget pour {label} : {budget_type} exemples.")
+    taches = decouper_type_en_taches(config_type, entites, phrases_modeles, budget_type, graine)
+    nouvelle_entree["nb_tranches"] = len(taches)
+    return taches, [], nouvelle_entree
+
+def fusionner_parties(parties, rng, taille_tampon=TAILLE_TAMPON_MELANGE):
+    """
+    Fusion en flux de fichiers d'exemples [(chemin, nb_exemples)] : entrelacement k-voies pondéré
+    par le nombre d'exemples restant dans chaque fichier, puis mélange par tampon.
+    Seuls le tampon et une ligne par fichier sont en mémoire.
+    """
+    flux = [iterer_exemples(chemin) for chemin, _ in parties]
+    return melanger_par_tampon(entrelacer_flux(flux, [nb for _, nb in parties], rng), taille_tampon, rng)
 
 # --- Programme Principal ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère des données d'entraînement SpaCy pour plusieurs types d'entités.")
+    parser.add_argument("--format", choices=["json", "jsonl", "spacy"], default="json", help="Format de sortie : 'json' (listes indentées), 'jsonl' (un exemple par ligne, écrit en flux, mémoire bornée) ou 'spacy' (fichiers DocBin pré-tokenisés). Défaut : json.")
+    parser.add_argument("--n_process", type=int, default=1, help="Nombre de processus générant les parties (et construisant les fichiers DocBin) en parallèle (défaut: 1).")
+    parser.add_argument("--modele", default=MODELE_BASE, help=f"Format spacy : modèle de base du fine-tuning, dont le tokeniseur découpe le corpus (défaut: {MODELE_BASE}).")
+    parser.add_argument("--taille_partie", type=int, default=TAILLE_PARTIE_PAR_DEFAUT, help=f"Format spacy : nombre d'exemples par fichier .spacy (défaut: {TAILLE_PARTIE_PAR_DEFAUT}).")
+    parser.add_argument("--budget", type=int, help="Nombre total d'exemples à générer, réparti également entre les types d'entités et tiré de façon stratifiée (défaut : toutes les combinaisons).")
+    parser.add_argument("--graine", type=int, help="Graine aléatoire pour rendre le tirage et le mélange reproductibles.")
+    parser.add_argument("--reconstruire", action="store_true", help=f"Ignore le manifeste ('{CHEMIN_MANIFESTE}') et régénère tous les types.")
+    args = parser.parse_args()
+    rng = random.Random(args.graine)
+
     print("Outil de génération de données d'entraînement SpaCy pour types d'entités multiples.\n")
 
     # Définition des types d'entités à traiter
@@ -133,21 +263,16 @@ if __name__ == "__main__":
         # }
     ]
 
-    donnees_combinees_pour_fine_tuning = []
-
-    # Charger d'abord les données PER existantes si elles ont été générées par l'ancien script
-    # et que vous ne les régénérez pas avec celui-ci.
-    # Exemple :
-    # if os.path.exists("donnees_entrainement_per.json"): # Remplacez par le nom de votre fichier PER
-    #     print("Chargement des données PER pré-existantes...")
-    #     with open("donnees_entrainement_per.json", "r", encoding="utf-8") as f_per:
-    #         donnees_per = json.load(f_per)
-    #         donnees_combinees_pour_fine_tuning.extend(donnees_per)
-    #         print(f"{len(donnees_per)} exemples PER chargés.")
-
+    # Fichiers d'exemples déjà générés (.json ou .jsonl) à inclure dans le fichier combiné,
+    # par exemple des données PER produites par preparer_donnees.py et que vous ne régénérez pas ici :
+    # fichiers_existants_a_fusionner = ["donnees_entrainement_spacy.json"]
+    fichiers_existants_a_fusionner = []
 
+    # Lecture de toutes les listes d'abord : une phrase modèle d'un type peut contenir le placeholder
+    # d'un autre type (ex: "{NOM} travaille au {ORG}."), rempli alors depuis la liste de cet autre type.
+    types_valides = []
     for config_type in types_a_generer:
-        print(f"\n--- Traitement du type d'entité : {config_type['label']} ---")
+        print(f"\n--- Lecture des fichiers pour le type d'entité : {config_type['label']} ---")
         
         entites = lire_entites_depuis_fichier(config_type["fichier_entites"])
         if entites is None: # Si le fichier n'existe pas ou erreur de lecture
@@ -162,22 +287,102 @@ if __name__ == "__main__":
         if not entites or not phrases_modeles: # Si les listes sont vides après lecture
             print(f"Pas assez de données (entités ou phrases valides) pour générer les exemples pour {config_type['label']}.")
             continue
-            
-        print(f"Génération des données pour {config_type['label']}...")
-        donnees_generees = generer_donnees_pour_type(entites, phrases_modeles, config_type["label"], config_type["placeholder"])
-        
-        if donnees_generees:
-            sauvegarder_donnees_json(donnees_generees, config_type["fichier_sortie_json"])
-            donnees_combinees_pour_fine_tuning.extend(donnees_generees)
-        else:
-            print(f"Aucune donnée n'a été générée pour {config_type['label']}.")
 
-    # Sauvegarder toutes les données combinées dans un unique fichier pour le fine-tuning
-    if donnees_combinees_pour_fine_tuning:
-        chemin_fichier_combine = "donnees_entrainement_combinees.json"
-        print(f"\nSauvegarde de toutes les données combinées ({len(donnees_combinees_pour_fine_tuning)} exemples)...")
-        sauvegarder_donnees_json(donnees_combinees_pour_fine_tuning, chemin_fichier_combine)
-    else:
+        types_valides.append((config_type, entites, phrases_modeles))
+
+    entites_par_placeholder = {config_type["placeholder"]: entites for config_type, entites, _ in types_valides}
+
+    if not types_valides and not fichiers_existants_a_fusionner:
         print("\nAucune donnée combinée à sauvegarder. Vérifiez vos fichiers d'entrée et les logs.")
-        
-    print("\nTerminé.")
\ No newline at end of file
+    else:
+        # 1. Planification : le manifeste de l'exécution précédente indique ce qui peut être réutilisé.
+        if args.reconstruire:
+            shutil.rmtree(DOSSIER_PARTIES, ignore_errors=True)
+        manifeste = charger_manifeste()
+        anciens_types = manifeste.get("types", {})
+        budgets_par_type = repartir(args.budget, [1] * len(types_valides)) if args.budget is not None and types_valides else [None] * len(types_valides)
+        taches = []
+        parties_par_type = {}
+        nouveaux_types = {}
+        for (config_type, entites, phrases_modeles), budget_type in zip(types_valides, budgets_par_type):
+            label = config_type["label"]
+            taches_type, parties_reutilisees, nouveaux_types[label] = planifier_type(
+                config_type, entites, phrases_modeles, budget_type, args.graine, entites_par_placeholder, anciens_types.get(label))
+            taches.extend(taches_type)
+            parties_par_type[label] = list(parties_reutilisees)
+        for label, entree in anciens_types.items():
+            if label not in nouveaux_types: # Type retiré de types_a_generer
+                supprimer_parties(entree["parties"])
+
+        # 2. Génération : une partie JSONL par tranche d'entités, en parallèle sur --n_process processus.
+        if taches:
+            print(f"\nGénération de {len(taches)} parties sur {args.n_process} processus...")
+            for label, chemin_partie, nb_exemples in generer_parties(taches, entites_par_placeholder, args.n_process):
+                parties_par_type[label].append([chemin_partie, nb_exemples])
+        for label, entree in nouveaux_types.items():
+            entree["parties"] = parties_par_type[label]
+        # Une sortie n'est réécrite que si sa signature (empreintes des parties qui la composent) a changé.
+        anciennes_sorties = manifeste.get("sorties", {})
+        manifeste = {"types": nouveaux_types, "sorties": dict(anciennes_sorties)}
+
+        def sortie_a_jour(chemin_sortie, signature):
+            manifeste["sorties"][chemin_sortie] = signature
+            return anciennes_sorties.get(chemin_sortie) == signature and os.path.exists(chemin_sortie)
+
+        # 3. Fichier par type (sauf en DocBin, où seul le corpus combiné est écrit) : parties du type mises bout à bout.
+        for config_type, _, _ in types_valides:
+            parties_type = parties_par_type[config_type["label"]]
+            nb_exemples_type = sum(nb for _, nb in parties_type)
+            signature_type = hashlib.sha256(json.dumps(nouveaux_types[config_type["label"]], sort_keys=True).encode("utf-8")).hexdigest()
+            if not nb_exemples_type:
+                print(f"Aucune donnée n'a été générée pour {config_type['label']}.")
+            elif args.format == "json":
+                if sortie_a_jour(config_type["fichier_sortie_json"], signature_type):
+                    print(f"'{config_type['fichier_sortie_json']}' est à jour.")
+                    continue
+                ecrire_exemples_json(itertools.chain.from_iterable(iterer_exemples(c) for c, _ in parties_type), config_type["fichier_sortie_json"])
+                print(f"{nb_exemples_type} exemples d'entraînement sauvegardés dans '{config_type['fichier_sortie_json']}'")
+            elif args.format == "jsonl":
+                chemin_sortie_jsonl = os.path.splitext(config_type["fichier_sortie_json"])[0] + ".jsonl"
+                if sortie_a_jour(chemin_sortie_jsonl, signature_type):
+                    print(f"'{chemin_sortie_jsonl}' est à jour.")
+                    continue
+                with open(chemin_sortie_jsonl, "w", encoding="utf-8") as fichier_type:
+                    for chemin_partie, _ in parties_type:
+                        with open(chemin_partie, "r", encoding="utf-8") as f_partie:
+                            shutil.copyfileobj(f_partie, fichier_type)
+                print(f"{nb_exemples_type} exemples d'entraînement sauvegardés dans '{chemin_sortie_jsonl}'")
+
+        # 4. Fusion en flux de toutes les parties (et des fichiers existants) dans le fichier combiné.
+        a_fusionner = [(chemin, nb) for label in parties_par_type for chemin, nb in parties_par_type[label] if nb]
+        a_fusionner += [(chemin, compter_exemples(chemin)) for chemin in fichiers_existants_a_fusionner]
+        if args.format == "spacy":
+            chemin_fichier_combine = "donnees_entrainement_combinees_docbin"
+        else:
+            chemin_fichier_combine = f"donnees_entrainement_combinees.{args.format}"
+        signature_combine = hashlib.sha256(json.dumps({
+            "types": nouveaux_types,
+            "fichiers_existants": [(chemin, os.path.getsize(chemin), os.path.getmtime(chemin)) for chemin in fichiers_existants_a_fusionner],
+            "graine": args.graine,
+            "taille_partie": args.taille_partie if args.format == "spacy" else None,
+            "modele": args.modele if args.format == "spacy" else None, # Un autre tokeniseur découpe autrement le corpus
+        }, sort_keys=True).encode("utf-8")).hexdigest()
+        if sortie_a_jour(chemin_fichier_combine, signature_combine):
+            print(f"\nLe fichier combiné '{chemin_fichier_combine}' est à jour.")
+        else:
+            exemples_combines = fusionner_parties(a_fusionner, rng)
+            print(f"\nFusion de {len(a_fusionner)} fichiers ({sum(nb for _, nb in a_fusionner)} exemples)...")
+            if args.format == "spacy":
+                try:
+                    nb_exemples, nb_fichiers, _ = ecrire_exemples_docbin(exemples_combines, chemin_fichier_combine, args.taille_partie, args.n_process, args.modele)
+                    print(f"Données combinées ({nb_exemples} exemples) sauvegardées dans '{chemin_fichier_combine}' ({nb_fichiers} fichiers .spacy).")
+                except OSError as e:
+                    print(f"ERREUR : Impossible de charger le modèle de base '{args.modele}' ou d'écrire le corpus : {e}")
+                    del manifeste["sorties"][chemin_fichier_combine] # Corpus à regénérer au prochain lancement
+            else:
+                ecrire = ecrire_exemples_jsonl if args.format == "jsonl" else ecrire_exemples_json
+                nb_exemples = ecrire(exemples_combines, chemin_fichier_combine)
+                print(f"Données combinées ({nb_exemples} exemples) sauvegardées dans '{chemin_fichier_combine}'.")
+        sauvegarder_manifeste(manifeste)
+
+    print("\nTerminé.")
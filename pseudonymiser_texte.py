@@ -2,9 +2,22 @@ import spacy
 import json
 import argparse # Pour gérer les arguments de la ligne de commande
 import os
+import glob
+import re
+import time
+from spacy.util import minibatch
+from cache_entites import TAILLE_MAX_PAR_DEFAUT, CacheEntites, calculer_empreinte_modele, calculer_empreinte_paragraphe
+from entites_connues import MODES_DETECTION, configurer_detection
+from moteur_remplacement import LABELS_PAR_DEFAUT, TablePseudonymes, pseudonymiser_doc, pseudonymiser_spans
+from stock_correspondances import StockCorrespondances
 
 # Chemin par défaut vers ton modèle fine-tuné
 CHEMIN_MODELE_PAR_DEFAUT = "./modele_pseudonymisation_finetune" 
+# Taille maximale (en caractères) d'un bloc envoyé au modèle en mode flux.
+# Doit rester bien en dessous de nlp.max_length (1 000 000 par défaut).
+TAILLE_BLOC_PAR_DEFAUT = 100000
+# Fin de phrase suivie d'espaces : point de découpe utilisé pour les lignes trop longues.
+MOTIF_FIN_DE_PHRASE = re.compile(r"(?<=[.!?…])\s+")
 
 def charger_modele_spacy(chemin_modele):
     """Charge le modèle SpaCy fine-tuné."""
@@ -32,64 +45,253 @@ def lire_fichier_texte(chemin_fichier):
         print(f"Erreur lors de la lecture du fichier '{chemin_fichier}': {e}")
         return None
 
-def ecrire_fichier_texte(texte, chemin_fichier):
+def ecrire_fichier_texte(texte, chemin_fichier, silencieux=False):
     """Écrit du texte dans un fichier."""
     try:
         with open(chemin_fichier, 'w', encoding='utf-8') as f:
             f.write(texte)
-        print(f"Texte pseudonymisé sauvegardé dans : '{chemin_fichier}'")
+        if not silencieux:
+            print(f"Texte pseudonymisé sauvegardé dans : '{chemin_fichier}'")
     except Exception as e:
         print(f"Erreur lors de l'écriture du fichier '{chemin_fichier}': {e}")
 
-def ecrire_fichier_json(dictionnaire, chemin_fichier):
+def ecrire_fichier_json(dictionnaire, chemin_fichier, silencieux=False):
     """Écrit un dictionnaire dans un fichier JSON."""
     try:
         with open(chemin_fichier, 'w', encoding='utf-8') as f:
             json.dump(dictionnaire, f, ensure_ascii=False, indent=4)
-        print(f"Table de correspondance sauvegardée dans : '{chemin_fichier}'")
+        if not silencieux:
+            print(f"Table de correspondance sauvegardée dans : '{chemin_fichier}'")
     except Exception as e:
         print(f"Erreur lors de l'écriture du fichier JSON '{chemin_fichier}': {e}")
 
-def pseudonymiser_texte(nlp, texte_original):
+def pseudonymiser_texte(nlp, texte_original, stock=None, labels=LABELS_PAR_DEFAUT):
     """
     Pseudonymise le texte en utilisant le modèle SpaCy et retourne le texte modifié
     ainsi que la table de correspondance.
     """
-    doc = nlp(texte_original)
-    
-    correspondances = {}
-    pseudonyme_compteur = 1
-    
-    entites_a_remplacer = []
-
-    for entite in doc.ents:
-        if entite.label_ == "PER": 
-            nom_original = entite.text
-            
-            if nom_original not in correspondances:
-                pseudonyme = f"[PERSONNE_{pseudonyme_compteur}]"
-                correspondances[nom_original] = pseudonyme
-                pseudonyme_compteur += 1
-            else:
-                pseudonyme = correspondances[nom_original]
-            
-            entites_a_remplacer.append((entite.start_char, entite.end_char, pseudonyme))
-
-    entites_a_remplacer.sort(key=lambda x: x[0], reverse=True)
-    
-    nouveau_texte_parts = []
-    dernier_index_traite = len(texte_original)
-
-    for start_char, end_char, pseudonyme in entites_a_remplacer:
-        if end_char < dernier_index_traite:
-            nouveau_texte_parts.append(texte_original[end_char:dernier_index_traite])
-        nouveau_texte_parts.append(pseudonyme)
-        dernier_index_traite = start_char
-    
-    nouveau_texte_parts.append(texte_original[0:dernier_index_traite])
-    texte_pseudonymise_final = "".join(reversed(nouveau_texte_parts))
-            
-    return texte_pseudonymise_final, correspondances
+    return pseudonymiser_doc(nlp(texte_original), stock=stock, labels=labels)
+
+def detecter_entites_avec_cache(nlp, textes, cache, batch_size=64):
+    """
+    Retourne les entités (debut, fin, label) de chaque texte, paragraphe par paragraphe, en réutilisant le cache :
+    une seule lecture du cache pour tous les textes, puis seuls les paragraphes absents passent dans le modèle.
+    """
+    paragraphes_par_texte = [texte.splitlines(keepends=True) for texte in textes]
+    empreintes_par_texte = [[calculer_empreinte_paragraphe(p) for p in paragraphes] for paragraphes in paragraphes_par_texte]
+    spans_par_empreinte = cache.obtenir_lot(e for paragraphes, empreintes in zip(paragraphes_par_texte, empreintes_par_texte)
+                                            for p, e in zip(paragraphes, empreintes) if p.strip())
+
+    a_analyser = {}
+    for paragraphes, empreintes in zip(paragraphes_par_texte, empreintes_par_texte):
+        for paragraphe, empreinte in zip(paragraphes, empreintes):
+            if paragraphe.strip() and empreinte not in spans_par_empreinte:
+                a_analyser[empreinte] = paragraphe
+    nouveaux_spans = {}
+    for doc, empreinte in nlp.pipe(((p, e) for e, p in a_analyser.items()), as_tuples=True, batch_size=batch_size):
+        nouveaux_spans[empreinte] = [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]
+    if nouveaux_spans:
+        cache.enregistrer_lot(nouveaux_spans)
+        spans_par_empreinte.update(nouveaux_spans)
+
+    # Les spans du cache sont relatifs à leur paragraphe : on les décale à la position du paragraphe dans le texte.
+    entites_par_texte = []
+    for paragraphes, empreintes in zip(paragraphes_par_texte, empreintes_par_texte):
+        entites = []
+        decalage = 0
+        for paragraphe, empreinte in zip(paragraphes, empreintes):
+            for debut, fin, label in spans_par_empreinte.get(empreinte, []):
+                entites.append((debut + decalage, fin + decalage, label))
+            decalage += len(paragraphe)
+        entites_par_texte.append(entites)
+    return entites_par_texte
+
+def pseudonymiser_texte_avec_cache(nlp, texte_original, cache, batch_size=64, stock=None, labels=LABELS_PAR_DEFAUT, table=None):
+    """
+    Pseudonymise le texte paragraphe par paragraphe en réutilisant les entités du cache :
+    seuls les paragraphes nouveaux ou modifiés passent dans le modèle.
+    Le résultat est identique à un traitement paragraphe par paragraphe sans cache.
+    Une `table` existante est complétée sur place (blocs successifs d'un même fichier en mode flux).
+    """
+    entites = detecter_entites_avec_cache(nlp, [texte_original], cache, batch_size)[0]
+    return pseudonymiser_spans(texte_original, entites, table or TablePseudonymes(stock), labels)
+
+def afficher_statistiques_cache(cache):
+    """Affiche le taux de succès du cache des entités pour le passage en cours."""
+    stats_cache = cache.statistiques()
+    print(f"Cache : {stats_cache['succes']} paragraphes réutilisés, {stats_cache['echecs']} analysés "
+          f"(taux de succès : {stats_cache['taux_succes']:.1%}, {stats_cache['entrees']} entrées, {stats_cache['evictions']} évictions)")
+
+def decouper_ligne_longue(ligne, taille_bloc):
+    """
+    Découpe une ligne plus longue que `taille_bloc` en morceaux, de préférence
+    après une fin de phrase, sinon de manière brute à `taille_bloc` caractères.
+    La concaténation des morceaux redonne exactement la ligne d'origine.
+    """
+    morceaux = []
+    debut = 0
+    while len(ligne) - debut > taille_bloc:
+        limite = debut + taille_bloc
+        coupure = None
+        for match in MOTIF_FIN_DE_PHRASE.finditer(ligne, debut + 1, limite):
+            coupure = match.end()
+        if coupure is None:
+            coupure = limite
+        morceaux.append(ligne[debut:coupure])
+        debut = coupure
+    morceaux.append(ligne[debut:])
+    return morceaux
+
+def lire_fichier_par_blocs(chemin_fichier, taille_bloc=TAILLE_BLOC_PAR_DEFAUT):
+    """
+    Générateur qui lit un fichier texte ligne par ligne et produit des blocs d'au plus
+    `taille_bloc` caractères, coupés sur des fins de ligne (paragraphes) ou, à défaut,
+    sur des fins de phrase. Le fichier n'est jamais chargé entièrement en mémoire.
+    """
+    bloc = []
+    taille_courante = 0
+    with open(chemin_fichier, 'r', encoding='utf-8') as f:
+        for ligne in f:
+            morceaux = decouper_ligne_longue(ligne, taille_bloc) if len(ligne) > taille_bloc else [ligne]
+            for morceau in morceaux:
+                if bloc and taille_courante + len(morceau) > taille_bloc:
+                    yield "".join(bloc)
+                    bloc = []
+                    taille_courante = 0
+                bloc.append(morceau)
+                taille_courante += len(morceau)
+    if bloc:
+        yield "".join(bloc)
+
+def pseudonymiser_fichier_en_flux(nlp, chemin_input, chemin_output_txt, chemin_output_json, taille_bloc=TAILLE_BLOC_PAR_DEFAUT, batch_size=8, stock=None, labels=LABELS_PAR_DEFAUT, cache=None):
+    """
+    Pseudonymise un fichier de taille arbitraire en mode flux : le texte est découpé en blocs,
+    les blocs passent dans nlp.pipe sous forme de générateur et le résultat est écrit au fur et à mesure.
+    La table de correspondance est partagée entre les blocs, de sorte qu'un même nom reçoit
+    le même pseudonyme dans tout le fichier.
+    La mémoire utilisée dépend de la taille des blocs (et du lot), pas de la taille du fichier.
+    Avec un `cache`, chaque bloc est analysé paragraphe par paragraphe et seuls les paragraphes absents du cache passent dans le modèle.
+    """
+    table = TablePseudonymes(stock)
+    nb_caracteres = 0
+    debut = time.perf_counter()
+
+    with open(chemin_output_txt, 'w', encoding='utf-8') as sortie:
+        if cache is None:
+            for doc in nlp.pipe(lire_fichier_par_blocs(chemin_input, taille_bloc), batch_size=batch_size):
+                texte_resultat, _ = pseudonymiser_doc(doc, table, labels=labels)
+                sortie.write(texte_resultat)
+                nb_caracteres += len(doc.text)
+        else:
+            for bloc in lire_fichier_par_blocs(chemin_input, taille_bloc):
+                texte_resultat, _ = pseudonymiser_texte_avec_cache(nlp, bloc, cache, labels=labels, table=table)
+                sortie.write(texte_resultat)
+                nb_caracteres += len(bloc)
+    print(f"Texte pseudonymisé sauvegardé dans : '{chemin_output_txt}'")
+    ecrire_fichier_json(table.correspondances, chemin_output_json)
+
+    duree = time.perf_counter() - debut
+    return {
+        "documents": 1,
+        "caracteres": nb_caracteres,
+        "duree_s": duree,
+        "docs_par_s": 1 / duree if duree > 0 else 0.0,
+        "caracteres_par_s": nb_caracteres / duree if duree > 0 else 0.0,
+    }
+
+def lister_fichiers_corpus(source):
+    """
+    Liste les fichiers .txt à traiter en mode corpus.
+    `source` peut être un dossier (tous les .txt qu'il contient) ou un motif glob (ex: "exports/**/*.txt").
+    Les fichiers déjà produits par la pseudonymisation (*_pseudonymise.txt) sont ignorés.
+    """
+    if os.path.isdir(source):
+        chemins = glob.glob(os.path.join(source, "*.txt"))
+    else:
+        chemins = glob.glob(source, recursive=True)
+    return sorted(c for c in chemins if os.path.isfile(c) and not c.endswith("_pseudonymise.txt"))
+
+def iterer_textes_corpus(chemins):
+    """
+    Générateur qui lit les fichiers un par un et produit des tuples (texte, chemin),
+    au format attendu par nlp.pipe(..., as_tuples=True).
+    Seul le lot en cours de traitement est gardé en mémoire.
+    """
+    for chemin in chemins:
+        texte = lire_fichier_texte(chemin)
+        if not texte:
+            print(f"Fichier ignoré (vide ou illisible) : '{chemin}'")
+            continue
+        yield texte, chemin
+
+def racine_corpus(chemins):
+    """Dossier commun à tous les fichiers du corpus : leur arborescence est reproduite sous le dossier de sortie."""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(chemin)) for chemin in chemins])
+
+def ecrire_resultats_corpus(texte, entites, chemin, dossier_sortie=None, stock=None, labels=LABELS_PAR_DEFAUT, racine=None):
+    """
+    Pseudonymise un document du corpus à partir de ses entités (debut, fin, label), écrit ses deux fichiers de sortie et retourne sa longueur.
+    Avec `dossier_sortie`, les fichiers sont écrits dans le sous-dossier correspondant à la place du document sous `racine`
+    (voir racine_corpus) : deux documents de même nom dans des dossiers différents ne s'écrasent pas.
+    """
+    texte_resultat, table_correspondance = pseudonymiser_spans(texte, entites, TablePseudonymes(stock), labels)
+    nom_base_input = os.path.splitext(os.path.basename(chemin))[0]
+    if dossier_sortie:
+        dossier_input = os.path.dirname(os.path.abspath(chemin))
+        dossier = os.path.join(dossier_sortie, os.path.relpath(dossier_input, racine or dossier_input))
+        os.makedirs(dossier, exist_ok=True)
+    else:
+        dossier = os.path.dirname(chemin)
+    ecrire_fichier_texte(texte_resultat, os.path.join(dossier, f"{nom_base_input}_pseudonymise.txt"), silencieux=True)
+    ecrire_fichier_json(table_correspondance, os.path.join(dossier, f"{nom_base_input}_correspondances.json"), silencieux=True)
+    return len(texte)
+
+def pseudonymiser_corpus(nlp, chemins, dossier_sortie=None, batch_size=32, n_process=1, stock=None, labels=LABELS_PAR_DEFAUT, cache=None):
+    """
+    Pseudonymise une liste de fichiers en chargeant le modèle une seule fois.
+    Les textes sont envoyés par lots dans nlp.pipe (éventuellement sur plusieurs processus),
+    et les fichiers _pseudonymise.txt / _correspondances.json sont écrits au fil de l'eau
+    (sous `dossier_sortie`, dans la même arborescence que les fichiers d'entrée).
+    Avec un `stock`, les pseudonymes de tout un lot sont résolus en une seule requête groupée.
+    Avec un `cache`, les fichiers sont lus par lots de `batch_size` et seuls leurs paragraphes absents du cache
+    passent dans le modèle, dans le processus principal (`n_process` n'est pas utilisé).
+    Retourne un dictionnaire de statistiques de débit.
+    """
+    racine = racine_corpus(chemins) if dossier_sortie and chemins else None
+
+    nb_documents = 0
+    nb_caracteres = 0
+    debut = time.perf_counter()
+
+    if cache is None:
+        docs = nlp.pipe(iterer_textes_corpus(chemins), as_tuples=True, batch_size=batch_size, n_process=n_process)
+        lots = ([(doc.text, [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents], chemin) for doc, chemin in lot]
+                for lot in minibatch(docs, batch_size))
+    else:
+        lots = ([(texte, entites, chemin) for (texte, chemin), entites in zip(lot, detecter_entites_avec_cache(nlp, [texte for texte, _ in lot], cache, batch_size))]
+                for lot in minibatch(iterer_textes_corpus(chemins), batch_size))
+    for lot in lots:
+        if stock is not None:
+            stock.obtenir_pseudonymes((texte[debut:fin], label) for texte, entites, _ in lot for debut, fin, label in entites if label in labels)
+        for texte, entites, chemin in lot:
+            nb_caracteres += ecrire_resultats_corpus(texte, entites, chemin, dossier_sortie, stock, labels, racine)
+            nb_documents += 1
+            if nb_documents % 1000 == 0:
+                print(f"{nb_documents} documents traités...")
+
+    duree = time.perf_counter() - debut
+    return {
+        "documents": nb_documents,
+        "caracteres": nb_caracteres,
+        "duree_s": duree,
+        "docs_par_s": nb_documents / duree if duree > 0 else 0.0,
+        "caracteres_par_s": nb_caracteres / duree if duree > 0 else 0.0,
+    }
+
+def afficher_debit(statistiques):
+    """Affiche le résumé de débit d'un traitement par lots."""
+    print(f"\n{statistiques['documents']} documents ({statistiques['caracteres']} caractères) traités en {statistiques['duree_s']:.2f} s")
+    print(f"Débit : {statistiques['docs_par_s']:.1f} docs/s, {statistiques['caracteres_par_s']:.0f} caractères/s")
 
 # --- Programme Principal ---
 if __name__ == "__main__":
@@ -98,8 +300,45 @@ if __name__ == "__main__":
     parser.add_argument("--output_txt", help="Chemin vers le fichier .txt de sortie (texte pseudonymisé).")
     parser.add_argument("--output_json", help="Chemin vers le fichier .json de sortie (table de correspondance).")
     parser.add_argument("--modele", default=CHEMIN_MODELE_PAR_DEFAUT, help=f"Chemin vers le dossier du modèle SpaCy fine-tuné (défaut: {CHEMIN_MODELE_PAR_DEFAUT}).")
+    parser.add_argument("--corpus", help="Mode corpus : dossier ou motif glob (ex: 'exports/**/*.txt') des fichiers à pseudonymiser en une seule passe.")
+    parser.add_argument("--output_dir", help="Mode corpus : dossier de sortie, où l'arborescence des fichiers d'entrée est reproduite (défaut : à côté de chaque fichier d'entrée).")
+    parser.add_argument("--batch_size", type=int, default=32, help="Mode corpus : nombre de documents par lot envoyé à nlp.pipe (défaut: 32).")
+    parser.add_argument("--n_process", type=int, default=1, help="Mode corpus : nombre de processus utilisés par nlp.pipe (défaut: 1).")
+    parser.add_argument("--detection", choices=MODES_DETECTION, default="ner", help="Mode de détection : 'ner' (modèle seul), 'liste' (listes d'entités connues seules, très rapide) ou 'hybride' (listes puis modèle). Défaut : ner.")
+    parser.add_argument("--cache", help="Fichier SQLite du cache des entités par paragraphe : seuls les paragraphes modifiés depuis le dernier passage sont ré-analysés (fichier unique, flux ou corpus).")
+    parser.add_argument("--cache_taille_max", type=int, default=TAILLE_MAX_PAR_DEFAUT, help=f"Nombre maximal de paragraphes gardés en cache, éviction LRU au-delà (défaut: {TAILLE_MAX_PAR_DEFAUT}).")
+    parser.add_argument("--stock", help="Fichier SQLite du stock persistant de correspondances : un même nom reçoit le même pseudonyme dans tous les documents.")
+    parser.add_argument("--labels", nargs="+", default=list(LABELS_PAR_DEFAUT), help=f"Labels d'entités à pseudonymiser (défaut: {' '.join(LABELS_PAR_DEFAUT)}).")
+    parser.add_argument("--flux", action="store_true", help="Traite le fichier d'entrée en flux, bloc par bloc (pour les fichiers volumineux). Activé automatiquement si le fichier dépasse nlp.max_length.")
+    parser.add_argument("--taille_bloc", type=int, default=TAILLE_BLOC_PAR_DEFAUT, help=f"Mode flux : taille maximale d'un bloc en caractères (défaut: {TAILLE_BLOC_PAR_DEFAUT}).")
     
     args = parser.parse_args()
+    if args.cache and args.corpus and args.n_process > 1:
+        parser.error("--cache analyse les paragraphes dans le processus principal : il ne se combine pas avec --n_process > 1.")
+
+    stock = StockCorrespondances(args.stock) if args.stock else None
+
+    if args.corpus:
+        chemins_corpus = lister_fichiers_corpus(args.corpus)
+        if not chemins_corpus:
+            print(f"Aucun fichier .txt trouvé pour : '{args.corpus}'")
+            exit()
+        print(f"{len(chemins_corpus)} fichiers à pseudonymiser.")
+
+        nlp_modele = charger_modele_spacy(args.modele)
+        if not nlp_modele:
+            exit()
+        configurer_detection(nlp_modele, args.detection)
+        cache = CacheEntites(args.cache, calculer_empreinte_modele(nlp_modele), args.cache_taille_max) if args.cache else None
+
+        print("\nPseudonymisation du corpus en cours...")
+        statistiques = pseudonymiser_corpus(nlp_modele, chemins_corpus, args.output_dir, args.batch_size, args.n_process, stock, args.labels, cache)
+        afficher_debit(statistiques)
+        if cache:
+            afficher_statistiques_cache(cache)
+            cache.fermer()
+        print("\nPseudonymisation terminée !")
+        exit()
     
     chemin_input = args.input
     chemin_output_txt = args.output_txt
@@ -133,6 +372,19 @@ if __name__ == "__main__":
     nlp_modele = charger_modele_spacy(args.modele)
     if not nlp_modele:
         exit() 
+    configurer_detection(nlp_modele, args.detection)
+    cache = CacheEntites(args.cache, calculer_empreinte_modele(nlp_modele), args.cache_taille_max) if args.cache else None
+
+    # Les fichiers volumineux sont traités en flux pour ne pas dépasser nlp.max_length
+    if args.flux or os.path.getsize(chemin_input) > nlp_modele.max_length:
+        print("\nPseudonymisation en flux en cours...")
+        statistiques = pseudonymiser_fichier_en_flux(nlp_modele, chemin_input, chemin_output_txt, chemin_output_json, args.taille_bloc, stock=stock, labels=args.labels, cache=cache)
+        afficher_debit(statistiques)
+        if cache:
+            afficher_statistiques_cache(cache)
+            cache.fermer()
+        print("\nPseudonymisation terminée !")
+        exit()
         
     # 2. Lire le fichier d'entrée
     texte_a_traiter = lire_fichier_texte(chemin_input)
@@ -141,7 +393,12 @@ if __name__ == "__main__":
         
     # 3. Pseudonymiser
     print("\nPseudonymisation en cours...")
-    texte_resultat, table_correspondance = pseudonymiser_texte(nlp_modele, texte_a_traiter)
+    if cache:
+        texte_resultat, table_correspondance = pseudonymiser_texte_avec_cache(nlp_modele, texte_a_traiter, cache, stock=stock, labels=args.labels)
+        afficher_statistiques_cache(cache)
+        cache.fermer()
+    else:
+        texte_resultat, table_correspondance = pseudonymiser_texte(nlp_modele, texte_a_traiter, stock, args.labels)
     
     # 4. Écrire les fichiers de sortie
     ecrire_fichier_texte(texte_resultat, chemin_output_txt)
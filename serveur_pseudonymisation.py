@@ -0,0 +1,243 @@
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from entites_connues import MODES_DETECTION, configurer_detection
+from moteur_remplacement import pseudonymiser_doc
+from pseudonymiser_texte import CHEMIN_MODELE_PAR_DEFAUT, charger_modele_spacy, lire_fichier_texte
+from stock_correspondances import StockCorrespondances
+
+# --- Configuration ---
+HOTE_PAR_DEFAUT = "127.0.0.1" # Écoute locale uniquement : le service manipule des données personnelles
+PORT_PAR_DEFAUT = 8765
+TAILLE_LOT_MAX = 32 # Nombre maximal de requêtes regroupées dans un même appel à nlp.pipe
+DELAI_MAX_MS = 10 # Attente maximale (en ms) pour compléter un lot avant de le traiter
+TAILLE_FENETRE_LATENCES = 1000 # Nombre de latences récentes conservées pour les statistiques
+# Connexions en attente d'acceptation (listen) : au moins TAILLE_LOT_MAX, sinon une rafale de clients concurrents
+# dépasse la file par défaut de socketserver (5) et les connexions en trop sont refusées avant d'être lotisées.
+TAILLE_FILE_CONNEXIONS = 128
+
+
+class MicroLotisseur:
+    """
+    Regroupe les requêtes concurrentes en micro-lots pour nlp.pipe.
+    Un thread unique possède le modèle : il attend une première requête, puis complète le lot
+    jusqu'à `taille_lot_max` requêtes ou jusqu'à l'expiration de `delai_max_ms`.
+    Avec un `stock`, les pseudonymes sont stables d'une requête à l'autre.
+    """
+
+    def __init__(self, nlp, taille_lot_max=TAILLE_LOT_MAX, delai_max_ms=DELAI_MAX_MS, stock=None):
+        self.nlp = nlp
+        self.stock = stock
+        self.taille_lot_max = taille_lot_max
+        self.delai_max_s = delai_max_ms / 1000.0
+        self.file_attente = queue.Queue()
+        self.verrou = threading.Lock()
+        self.latences_ms = deque(maxlen=TAILLE_FENETRE_LATENCES)
+        self.requetes_traitees = 0
+        self.requetes_en_erreur = 0
+        self.lots_traites = 0
+        self.profondeur_file_max = 0
+        self.thread = threading.Thread(target=self.boucle_traitement, daemon=True)
+        self.thread.start()
+
+    def soumettre(self, texte):
+        """Ajoute un texte à la file d'attente et retourne un Future (texte pseudonymisé, correspondances)."""
+        future = Future()
+        self.file_attente.put((texte, future, time.perf_counter()))
+        with self.verrou:
+            self.profondeur_file_max = max(self.profondeur_file_max, self.file_attente.qsize())
+        return future
+
+    def collecter_lot(self):
+        """Bloque jusqu'à la première requête puis complète le lot jusqu'à l'échéance."""
+        lot = [self.file_attente.get()]
+        echeance = time.perf_counter() + self.delai_max_s
+        while len(lot) < self.taille_lot_max:
+            restant = echeance - time.perf_counter()
+            if restant <= 0:
+                break
+            try:
+                lot.append(self.file_attente.get(timeout=restant))
+            except queue.Empty:
+                break
+        return lot
+
+    def boucle_traitement(self):
+        while True:
+            lot = self.collecter_lot()
+            textes = [texte for texte, _, _ in lot]
+            try:
+                docs = list(self.nlp.pipe(textes, batch_size=len(textes)))
+                resultats = [pseudonymiser_doc(doc, stock=self.stock) for doc in docs]
+            except Exception as e:
+                for _, future, _ in lot:
+                    future.set_exception(e)
+                with self.verrou:
+                    self.requetes_en_erreur += len(lot)
+                continue
+
+            fin = time.perf_counter()
+            for (_, future, debut), resultat in zip(lot, resultats):
+                future.set_result(resultat)
+            with self.verrou:
+                self.lots_traites += 1
+                self.requetes_traitees += len(lot)
+                self.latences_ms.extend((fin - debut) * 1000.0 for _, _, debut in lot)
+
+    def statistiques(self):
+        """Compteurs de latence (sur les dernières requêtes) et de profondeur de file."""
+        with self.verrou:
+            latences = sorted(self.latences_ms)
+            stats = {
+                "requetes_traitees": self.requetes_traitees,
+                "requetes_en_erreur": self.requetes_en_erreur,
+                "lots_traites": self.lots_traites,
+                "taille_moyenne_lot": self.requetes_traitees / self.lots_traites if self.lots_traites else 0.0,
+                "profondeur_file": self.file_attente.qsize(),
+                "profondeur_file_max": self.profondeur_file_max,
+            }
+        if latences:
+            stats["latence_ms"] = {
+                "moyenne": sum(latences) / len(latences),
+                "p50": latences[len(latences) // 2],
+                "p95": latences[min(len(latences) - 1, int(len(latences) * 0.95))],
+                "max": latences[-1],
+            }
+        return stats
+
+
+def creer_gestionnaire_http(lotisseur):
+    """Crée la classe de gestionnaire HTTP liée au micro-lotisseur."""
+
+    class GestionnairePseudonymisation(BaseHTTPRequestHandler):
+        def envoyer_json(self, code, contenu):
+            corps = json.dumps(contenu, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def do_GET(self):
+            if self.path == "/statistiques":
+                self.envoyer_json(200, lotisseur.statistiques())
+            elif self.path == "/sante":
+                self.envoyer_json(200, {"statut": "ok"})
+            else:
+                self.envoyer_json(404, {"erreur": f"Chemin inconnu : {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/pseudonymiser":
+                self.envoyer_json(404, {"erreur": f"Chemin inconnu : {self.path}"})
+                return
+            try:
+                longueur = int(self.headers.get("Content-Length", 0))
+                requete = json.loads(self.rfile.read(longueur).decode("utf-8"))
+                texte = requete["texte"]
+                if not isinstance(texte, str):
+                    raise ValueError("'texte' doit être une chaîne de caractères")
+            except Exception as e:
+                self.envoyer_json(400, {"erreur": f"Requête invalide, JSON {{\"texte\": ...}} attendu : {e}"})
+                return
+            try:
+                texte_pseudonymise, correspondances = lotisseur.soumettre(texte).result()
+            except Exception as e:
+                self.envoyer_json(500, {"erreur": f"Erreur lors de la pseudonymisation : {e}"})
+                return
+            self.envoyer_json(200, {"texte_pseudonymise": texte_pseudonymise, "correspondances": correspondances})
+
+        def log_message(self, format, *args):
+            # Pas de journal par requête : il coûterait plus cher que la pseudonymisation elle-même.
+            pass
+
+    return GestionnairePseudonymisation
+
+
+class ServeurPseudonymisation(ThreadingHTTPServer):
+    """ThreadingHTTPServer dont la file de connexions en attente est dimensionnée pour des micro-lots complets."""
+
+    def __init__(self, adresse, gestionnaire, taille_file_connexions=TAILLE_FILE_CONNEXIONS):
+        self.request_queue_size = taille_file_connexions # Lu par server_activate (listen) dans le constructeur parent
+        super().__init__(adresse, gestionnaire)
+
+
+def lancer_serveur(chemin_modele, hote=HOTE_PAR_DEFAUT, port=PORT_PAR_DEFAUT, taille_lot_max=TAILLE_LOT_MAX, delai_max_ms=DELAI_MAX_MS, mode_detection="ner", chemin_stock=None,
+                   taille_file_connexions=TAILLE_FILE_CONNEXIONS):
+    """Charge le modèle une seule fois et sert les requêtes jusqu'à interruption (Ctrl+C)."""
+    nlp = charger_modele_spacy(chemin_modele)
+    if not nlp:
+        return
+    configurer_detection(nlp, mode_detection)
+    stock = StockCorrespondances(chemin_stock) if chemin_stock else None
+    lotisseur = MicroLotisseur(nlp, taille_lot_max, delai_max_ms, stock)
+    serveur = ServeurPseudonymisation((hote, port), creer_gestionnaire_http(lotisseur), max(taille_file_connexions, taille_lot_max))
+    print(f"Serveur de pseudonymisation à l'écoute sur http://{hote}:{port}")
+    print("  POST /pseudonymiser   {\"texte\": ...} -> texte pseudonymisé et correspondances")
+    print("  GET  /statistiques    latences et profondeur de file")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        print("\nArrêt du serveur.")
+    finally:
+        serveur.server_close()
+
+
+def pseudonymiser_via_serveur(texte, url=f"http://{HOTE_PAR_DEFAUT}:{PORT_PAR_DEFAUT}", timeout=60):
+    """Client : envoie un texte au serveur et retourne (texte pseudonymisé, correspondances)."""
+    requete = urllib.request.Request(
+        f"{url}/pseudonymiser",
+        data=json.dumps({"texte": texte}, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json; charset=utf-8"},
+    )
+    with urllib.request.urlopen(requete, timeout=timeout) as reponse:
+        resultat = json.loads(reponse.read().decode("utf-8"))
+    return resultat["texte_pseudonymise"], resultat["correspondances"]
+
+
+def obtenir_statistiques_serveur(url=f"http://{HOTE_PAR_DEFAUT}:{PORT_PAR_DEFAUT}", timeout=10):
+    """Client : retourne les compteurs exposés par le serveur."""
+    with urllib.request.urlopen(f"{url}/statistiques", timeout=timeout) as reponse:
+        return json.loads(reponse.read().decode("utf-8"))
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service de pseudonymisation résident : garde le modèle SpaCy chargé et regroupe les requêtes en micro-lots.")
+    sous_commandes = parser.add_subparsers(dest="commande", required=True)
+
+    parser_serveur = sous_commandes.add_parser("serveur", help="Lance le serveur HTTP local.")
+    parser_serveur.add_argument("--modele", default=CHEMIN_MODELE_PAR_DEFAUT, help=f"Chemin vers le dossier du modèle SpaCy fine-tuné (défaut: {CHEMIN_MODELE_PAR_DEFAUT}).")
+    parser_serveur.add_argument("--detection", choices=MODES_DETECTION, default="ner", help="Mode de détection : 'ner', 'liste' ou 'hybride' (défaut: ner).")
+    parser_serveur.add_argument("--stock", help="Fichier SQLite du stock persistant de correspondances (pseudonymes stables entre requêtes).")
+    parser_serveur.add_argument("--hote", default=HOTE_PAR_DEFAUT, help=f"Adresse d'écoute (défaut: {HOTE_PAR_DEFAUT}).")
+    parser_serveur.add_argument("--port", type=int, default=PORT_PAR_DEFAUT, help=f"Port d'écoute (défaut: {PORT_PAR_DEFAUT}).")
+    parser_serveur.add_argument("--taille_lot_max", type=int, default=TAILLE_LOT_MAX, help=f"Nombre maximal de requêtes par micro-lot (défaut: {TAILLE_LOT_MAX}).")
+    parser_serveur.add_argument("--delai_max_ms", type=float, default=DELAI_MAX_MS, help=f"Délai maximal d'attente pour compléter un micro-lot, en ms (défaut: {DELAI_MAX_MS}).")
+    parser_serveur.add_argument("--file_connexions", type=int, default=TAILLE_FILE_CONNEXIONS, help=f"Connexions en attente d'acceptation, au moins --taille_lot_max (défaut: {TAILLE_FILE_CONNEXIONS}).")
+
+    parser_client = sous_commandes.add_parser("client", help="Envoie un fichier texte au serveur et écrit le résultat.")
+    parser_client.add_argument("--input", required=True, help="Chemin vers le fichier .txt à pseudonymiser.")
+    parser_client.add_argument("--url", default=f"http://{HOTE_PAR_DEFAUT}:{PORT_PAR_DEFAUT}", help="URL du serveur.")
+
+    parser_stats = sous_commandes.add_parser("statistiques", help="Affiche les compteurs du serveur.")
+    parser_stats.add_argument("--url", default=f"http://{HOTE_PAR_DEFAUT}:{PORT_PAR_DEFAUT}", help="URL du serveur.")
+
+    args = parser.parse_args()
+
+    if args.commande == "serveur":
+        lancer_serveur(args.modele, args.hote, args.port, args.taille_lot_max, args.delai_max_ms, args.detection, args.stock, args.file_connexions)
+    elif args.commande == "client":
+        texte_a_traiter = lire_fichier_texte(args.input)
+        if texte_a_traiter:
+            texte_resultat, table_correspondance = pseudonymiser_via_serveur(texte_a_traiter, args.url)
+            print(texte_resultat)
+            print(json.dumps(table_correspondance, ensure_ascii=False, indent=4))
+    elif args.commande == "statistiques":
+        print(json.dumps(obtenir_statistiques_serveur(args.url), ensure_ascii=False, indent=4))
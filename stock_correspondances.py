@@ -0,0 +1,132 @@
+import argparse
+import json
+import sqlite3
+
+from moteur_remplacement import PREFIXES_PSEUDONYMES
+
+# --- Configuration ---
+TAILLE_REQUETE_SQL = 500 # Nombre de clés par requête "IN (...)" (limite de variables de SQLite)
+DELAI_ATTENTE_VERROU_MS = 30000 # Attente maximale quand un autre processus écrit dans le stock
+
+
+class StockCorrespondances:
+    """
+    Table de correspondance persistante (SQLite en mode WAL) partagée entre documents et processus.
+    Un même (texte original, label) reçoit toujours le même pseudonyme dans tout le corpus.
+    Les lectures sont concurrentes ; les nouvelles attributions sont sérialisées par une transaction
+    BEGIN IMMEDIATE, ce qui garantit des numéros uniques même avec plusieurs processus.
+    """
+
+    def __init__(self, chemin_stock):
+        self.chemin_stock = chemin_stock
+        # Les pseudonymes attribués ne changent jamais : on peut les garder en mémoire sans invalidation.
+        self.memoire = {}
+        # isolation_level=None : les transactions sont gérées explicitement (BEGIN IMMEDIATE / COMMIT).
+        self.connexion = sqlite3.connect(chemin_stock, timeout=DELAI_ATTENTE_VERROU_MS / 1000, isolation_level=None, check_same_thread=False)
+        self.connexion.execute("PRAGMA journal_mode=WAL")
+        self.connexion.execute("PRAGMA synchronous=NORMAL")
+        self.connexion.execute(f"PRAGMA busy_timeout={DELAI_ATTENTE_VERROU_MS}")
+        self.connexion.execute(
+            "CREATE TABLE IF NOT EXISTS correspondances ("
+            " label TEXT NOT NULL,"
+            " original TEXT NOT NULL,"
+            " pseudonyme TEXT NOT NULL UNIQUE,"
+            " PRIMARY KEY (label, original))"
+        )
+        self.connexion.execute("CREATE TABLE IF NOT EXISTS compteurs (label TEXT PRIMARY KEY, valeur INTEGER NOT NULL)")
+
+    def lire_existants(self, label, originaux):
+        """Lit en base les pseudonymes déjà attribués pour une liste de textes d'un même label."""
+        trouves = {}
+        for i in range(0, len(originaux), TAILLE_REQUETE_SQL):
+            tranche = originaux[i:i + TAILLE_REQUETE_SQL]
+            marqueurs = ",".join("?" * len(tranche))
+            lignes = self.connexion.execute(
+                f"SELECT original, pseudonyme FROM correspondances WHERE label = ? AND original IN ({marqueurs})",
+                [label, *tranche],
+            )
+            for original, pseudonyme in lignes:
+                trouves[(original, label)] = pseudonyme
+        return trouves
+
+    def obtenir_pseudonymes(self, entites):
+        """
+        Retourne {(original, label): pseudonyme} pour un lot d'entités (couples (original, label)),
+        en attribuant de nouveaux pseudonymes à celles qui n'en ont pas encore.
+        Une seule lecture groupée par label, puis une seule transaction d'écriture pour tout le lot.
+        """
+        resultat = {}
+        manquants_par_label = {}
+        for original, label in set(entites):
+            if (original, label) in self.memoire:
+                resultat[(original, label)] = self.memoire[(original, label)]
+            else:
+                manquants_par_label.setdefault(label, []).append(original)
+
+        a_creer = []
+        for label, originaux in manquants_par_label.items():
+            trouves = self.lire_existants(label, originaux)
+            resultat.update(trouves)
+            a_creer.extend((original, label) for original in originaux if (original, label) not in trouves)
+
+        if a_creer:
+            self.connexion.execute("BEGIN IMMEDIATE")
+            try:
+                # Un autre processus a pu attribuer certains pseudonymes entre la lecture et le verrou.
+                for label in {label for _, label in a_creer}:
+                    resultat.update(self.lire_existants(label, [o for o, l in a_creer if l == label]))
+                for original, label in a_creer:
+                    if (original, label) in resultat:
+                        continue
+                    ligne = self.connexion.execute("SELECT valeur FROM compteurs WHERE label = ?", (label,)).fetchone()
+                    numero = (ligne[0] if ligne else 0) + 1
+                    self.connexion.execute("INSERT OR REPLACE INTO compteurs (label, valeur) VALUES (?, ?)", (label, numero))
+                    pseudonyme = f"[{PREFIXES_PSEUDONYMES.get(label, label)}_{numero}]"
+                    self.connexion.execute(
+                        "INSERT INTO correspondances (label, original, pseudonyme) VALUES (?, ?, ?)",
+                        (label, original, pseudonyme),
+                    )
+                    resultat[(original, label)] = pseudonyme
+                self.connexion.execute("COMMIT")
+            except Exception:
+                self.connexion.execute("ROLLBACK")
+                raise
+
+        self.memoire.update(resultat)
+        return resultat
+
+    def exporter_dictionnaire(self, label=None):
+        """
+        Exporte le stock. Sans label : format des fichiers *_correspondances.json, {label: {original: pseudonyme}},
+        car un même texte peut avoir un pseudonyme différent sous chaque label. Avec un `label` : {original: pseudonyme}.
+        """
+        if label:
+            lignes = self.connexion.execute("SELECT original, pseudonyme FROM correspondances WHERE label = ? ORDER BY rowid", (label,))
+            return dict(lignes)
+        correspondances = {}
+        for label_ligne, original, pseudonyme in self.connexion.execute("SELECT label, original, pseudonyme FROM correspondances ORDER BY rowid"):
+            correspondances.setdefault(label_ligne, {})[original] = pseudonyme
+        return correspondances
+
+    def exporter_json(self, chemin_fichier, label=None):
+        correspondances = self.exporter_dictionnaire(label)
+        nb_correspondances = len(correspondances) if label else sum(len(par_label) for par_label in correspondances.values())
+        with open(chemin_fichier, 'w', encoding='utf-8') as f:
+            json.dump(correspondances, f, ensure_ascii=False, indent=4)
+        print(f"{nb_correspondances} correspondances exportées dans : '{chemin_fichier}'")
+
+    def fermer(self):
+        self.connexion.close()
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporte le stock persistant de correspondances au format JSON habituel.")
+    parser.add_argument("--stock", required=True, help="Chemin vers le fichier SQLite du stock de correspondances.")
+    parser.add_argument("--output_json", required=True, help="Chemin vers le fichier .json de sortie.")
+    parser.add_argument("--label", help="N'exporter que les correspondances de ce label (ex: PER), au format {original: pseudonyme} ; sans label, {label: {original: pseudonyme}}.")
+    args = parser.parse_args()
+
+    stock = StockCorrespondances(args.stock)
+    stock.exporter_json(args.output_json, args.label)
+    stock.fermer()
@@ -0,0 +1,43 @@
+import json
+
+import spacy
+
+import balayage_hyperparametres
+from balayage_hyperparametres import _initialiser_worker, executer_essai
+from fine_tuner_spacy import separer_dev
+
+PARAMETRES = {"iterations": 1, "dropout": 0.2, "taille_lot": 4}
+
+
+def preparer(tmp_path, monkeypatch, entrainer_ner):
+    chemin_modele = tmp_path / "modele"
+    spacy.blank("fr").to_disk(chemin_modele)
+    chemin_donnees = tmp_path / "donnees.jsonl"
+    with open(chemin_donnees, "w", encoding="utf-8") as f:
+        for numero in range(40):
+            f.write(json.dumps([f"Texte numéro {numero} de Jean.", {"entities": [[len(f"Texte numéro {numero} de "), len(f"Texte numéro {numero} de Jean"), "PER"]]}]) + "\n")
+    monkeypatch.setattr(balayage_hyperparametres, "entrainer_ner", entrainer_ner)
+    _initialiser_worker(str(chemin_donnees))
+    return dict(PARAMETRES, modele=str(chemin_modele))
+
+
+def test_un_essai_en_erreur_n_interrompt_pas_le_balayage(tmp_path, monkeypatch):
+    def entrainer_ner(*args, **kwargs):
+        raise ValueError("perte NaN")
+    parametres = preparer(tmp_path, monkeypatch, entrainer_ner)
+    resultat = executer_essai((1, parametres, 0.1, 0))
+    assert resultat["erreur"] == "ValueError : perte NaN"
+    assert resultat["f"] == "" and resultat["duree_s"] != ""
+
+
+def test_ordre_des_donnees_reproductible_par_essai(tmp_path, monkeypatch):
+    ordres = []
+    def entrainer_ner(nlp, donnees, *args, proportion_dev=0.1, **kwargs):
+        entrainement, _ = separer_dev(nlp, donnees, proportion_dev)
+        ordres.append([texte for texte, _ in entrainement])
+        return {"ents_p": 1.0, "ents_r": 1.0, "ents_f": 1.0}
+    parametres = preparer(tmp_path, monkeypatch, entrainer_ner)
+    for numero in (1, 2, 1):
+        assert executer_essai((numero, parametres, 0.1, 0))["erreur"] == ""
+    assert ordres[0] == ordres[2]
+    assert ordres[0] != ordres[1]
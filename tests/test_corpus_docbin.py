@@ -0,0 +1,42 @@
+import os
+
+import pytest
+import spacy
+from spacy.attrs import ORTH
+
+from corpus_docbin import FICHIER_TOKENISEUR, ecrire_exemples_docbin
+from fine_tuner_spacy import charger_donnees_entrainement
+
+EXEMPLES = [("JeanPaul arrive.", {"entities": [(0, 4, "PER")]})]
+
+
+def modele_a_tokeniseur_special(chemin):
+    nlp = spacy.blank("fr")
+    nlp.tokenizer.add_special_case("JeanPaul", [{ORTH: "Jean"}, {ORTH: "Paul"}])
+    nlp.to_disk(chemin)
+    return spacy.load(chemin)
+
+
+def test_corpus_decoupe_par_le_tokeniseur_du_modele(tmp_path):
+    nlp = modele_a_tokeniseur_special(tmp_path / "modele")
+    dossier = str(tmp_path / "corpus")
+
+    nb_exemples, _, nb_ignores = ecrire_exemples_docbin(EXEMPLES, dossier, modele=str(tmp_path / "modele"))
+
+    assert (nb_exemples, nb_ignores) == (1, 0) # « Jean » n'est un token que pour le tokeniseur du modèle
+    donnees = charger_donnees_entrainement(dossier, nlp)
+    assert [token.text for doc in donnees.iterer_docs(nlp.vocab) for token in doc] == ["Jean", "Paul", "arrive", "."]
+
+
+def test_corpus_d_un_autre_tokeniseur_refuse(tmp_path):
+    nlp = modele_a_tokeniseur_special(tmp_path / "modele")
+    dossier = str(tmp_path / "corpus")
+    ecrire_exemples_docbin([("Jean arrive.", {"entities": [(0, 4, "PER")]})], dossier)
+
+    with pytest.raises(ValueError, match="tokeniseur"):
+        charger_donnees_entrainement(dossier, nlp)
+    charger_donnees_entrainement(dossier, spacy.blank("fr"))
+
+    os.remove(os.path.join(dossier, FICHIER_TOKENISEUR)) # Corpus généré avant l'enregistrement de l'empreinte
+    with pytest.raises(ValueError, match="empreinte"):
+        charger_donnees_entrainement(dossier, spacy.blank("fr"))
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+import spacy
+
+import entites_connues
+from entites_connues import mesurer_mode
+
+
+def test_import_sans_le_script_de_preparation():
+    code = "import sys, entites_connues; assert 'preparer_donnees_multi_types' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(entites_connues.__file__))
+
+
+def test_mesurer_mode_charge_le_modele_comme_les_scripts(tmp_path):
+    chemin_modele = tmp_path / "modele"
+    spacy.blank("fr").to_disk(chemin_modele)
+    chemin_liste = tmp_path / "noms.txt"
+    chemin_liste.write_text("Jean Dupont\n", encoding="utf-8")
+    exemples = [["Jean Dupont arrive.", {"entities": [[0, 11, "PER"]]}]]
+
+    resultat = mesurer_mode(str(chemin_modele), "liste", exemples, [(str(chemin_liste), "PER")])
+
+    assert resultat["labels"]["PER"] == {"rappel": 1.0, "precision": 1.0}
+    assert mesurer_mode(str(tmp_path / "absent"), "liste", exemples, [(str(chemin_liste), "PER")]) is None
@@ -0,0 +1,29 @@
+import spacy
+from spacy.training import Example
+
+from fine_tuner_spacy import activer_cache_tok2vec, couche_tok2vec_interne
+
+TEXTES = [("Jean Dupont habite à Lyon.", [(0, 11, "PER")]), ("Paul Durand dort bien.", [(0, 11, "PER")]),
+          ("Anne Martin mange une pomme.", [(0, 11, "PER")])]
+
+
+def test_cache_tok2vec_sert_les_docs_copies_par_update():
+    nlp = spacy.blank("fr")
+    nlp.add_pipe("ner")
+    examples = [Example.from_dict(nlp.make_doc(texte), {"entities": entites}) for texte, entites in TEXTES]
+    optimizer = nlp.initialize(lambda: examples)
+    couche = couche_tok2vec_interne(nlp.get_pipe("ner"))
+    appels = []
+    forward = couche._func
+    couche._func = lambda model, docs, is_train: (appels.append(len(docs)), forward(model, docs, is_train))[1]
+
+    retablir = activer_cache_tok2vec(couche, [eg.predicted for eg in examples])
+    appels.clear()
+    nlp.update(examples, sgd=optimizer) # nlp.update copie les Doc prédits : le cache doit les reconnaître à leurs tokens
+    assert appels == []
+
+    nlp("Un texte jamais vu.") # Doc absent du cache : calculé à la volée
+    assert appels == [1]
+    retablir()
+    nlp(TEXTES[0][0]) # Tok2vec normal rétabli : plus de cache
+    assert appels == [1, 1]
@@ -0,0 +1,21 @@
+import json
+
+from depseudonymiser_texte import charger_table_inverse, depseudonymiser_texte
+from moteur_remplacement import TablePseudonymes, pseudonymiser_spans
+from stock_correspondances import StockCorrespondances
+
+TEXTE = "Paris a écrit depuis Paris."
+ENTITES = [(0, 5, "PER"), (21, 26, "LOC")]
+
+
+def test_meme_texte_sous_deux_labels_avec_et_sans_stock(tmp_path):
+    stock = StockCorrespondances(str(tmp_path / "stock.sqlite"))
+    for table in (TablePseudonymes(), TablePseudonymes(stock)):
+        texte_resultat, correspondances = pseudonymiser_spans(TEXTE, ENTITES, table)
+
+        assert texte_resultat == "[PERSONNE_1] a écrit depuis [LIEU_1]."
+        assert correspondances == {"PER": {"Paris": "[PERSONNE_1]"}, "LOC": {"Paris": "[LIEU_1]"}}
+        chemin_json = tmp_path / "correspondances.json"
+        chemin_json.write_text(json.dumps(correspondances), encoding="utf-8")
+        assert depseudonymiser_texte(texte_resultat, charger_table_inverse([str(chemin_json)])) == TEXTE
+    stock.fermer()
@@ -0,0 +1,47 @@
+import os
+
+import spacy
+
+from cache_entites import CacheEntites, calculer_empreinte_modele
+from pseudonymiser_texte import lister_fichiers_corpus, pseudonymiser_corpus, pseudonymiser_fichier_en_flux
+
+
+def modele_jean():
+    nlp = spacy.blank("fr")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "PER", "pattern": "Jean"}])
+    return nlp
+
+
+def test_corpus_recursif_meme_nom_dans_deux_dossiers(tmp_path):
+    for dossier, texte in (("a", "Rapport A."), ("b", "Rapport B.")):
+        os.makedirs(tmp_path / "exports" / dossier)
+        (tmp_path / "exports" / dossier / "rapport.txt").write_text(texte, encoding="utf-8")
+    chemins = lister_fichiers_corpus(str(tmp_path / "exports" / "**" / "*.txt"))
+    sortie = tmp_path / "sorties"
+
+    statistiques = pseudonymiser_corpus(spacy.blank("fr"), chemins, str(sortie))
+
+    assert statistiques["documents"] == 2
+    assert (sortie / "a" / "rapport_pseudonymise.txt").read_text(encoding="utf-8") == "Rapport A."
+    assert (sortie / "b" / "rapport_pseudonymise.txt").read_text(encoding="utf-8") == "Rapport B."
+    assert (sortie / "a" / "rapport_correspondances.json").exists() and (sortie / "b" / "rapport_correspondances.json").exists()
+
+
+def test_cache_en_mode_corpus_et_flux(tmp_path):
+    nlp = modele_jean()
+    texte = "Jean arrive.\nRien ici.\nJean repart.\n"
+    (tmp_path / "entree").mkdir()
+    (tmp_path / "entree" / "note.txt").write_text(texte, encoding="utf-8")
+    chemins = [str(tmp_path / "entree" / "note.txt")]
+
+    for _ in range(2):
+        cache = CacheEntites(str(tmp_path / "cache.sqlite"), calculer_empreinte_modele(nlp))
+        pseudonymiser_corpus(nlp, chemins, str(tmp_path / "corpus"), cache=cache)
+        pseudonymiser_fichier_en_flux(nlp, chemins[0], str(tmp_path / "flux.txt"), str(tmp_path / "flux.json"), taille_bloc=15, cache=cache)
+        statistiques = cache.statistiques()
+        cache.fermer()
+
+    assert statistiques["echecs"] == 0 and statistiques["succes"] > 0 # Second passage : tout vient du cache
+    attendu = "[PERSONNE_1] arrive.\nRien ici.\n[PERSONNE_1] repart.\n"
+    assert (tmp_path / "corpus" / "note_pseudonymise.txt").read_text(encoding="utf-8") == attendu
+    assert (tmp_path / "flux.txt").read_text(encoding="utf-8") == attendu
@@ -0,0 +1,29 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import spacy
+
+from serveur_pseudonymisation import MicroLotisseur, ServeurPseudonymisation, TAILLE_LOT_MAX, creer_gestionnaire_http, pseudonymiser_via_serveur
+
+NB_CLIENTS = 64
+
+
+def test_clients_concurrents_tous_servis():
+    lotisseur = MicroLotisseur(spacy.blank("fr"), TAILLE_LOT_MAX)
+    serveur = ServeurPseudonymisation(("127.0.0.1", 0), creer_gestionnaire_http(lotisseur))
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{serveur.server_address[1]}"
+    depart = threading.Barrier(NB_CLIENTS) # Toutes les connexions arrivent en même temps
+
+    def client(numero):
+        depart.wait()
+        return pseudonymiser_via_serveur(f"Texte {numero}.", url, timeout=30)[0]
+
+    try:
+        with ThreadPoolExecutor(NB_CLIENTS) as executeur:
+            resultats = list(executeur.map(client, range(NB_CLIENTS)))
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
+    assert resultats == [f"Texte {numero}." for numero in range(NB_CLIENTS)]
+    assert lotisseur.statistiques()["requetes_traitees"] == NB_CLIENTS
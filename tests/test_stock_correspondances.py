@@ -0,0 +1,22 @@
+import json
+
+from depseudonymiser_texte import charger_table_inverse
+from stock_correspondances import StockCorrespondances
+
+
+def test_export_sans_label_garde_chaque_label(tmp_path):
+    stock = StockCorrespondances(str(tmp_path / "stock.sqlite"))
+    pseudonymes = stock.obtenir_pseudonymes([("Lyon", "PER"), ("Lyon", "ORG"), ("Paris", "LOC")])
+
+    assert stock.exporter_dictionnaire() == {
+        "PER": {"Lyon": pseudonymes[("Lyon", "PER")]},
+        "ORG": {"Lyon": pseudonymes[("Lyon", "ORG")]},
+        "LOC": {"Paris": pseudonymes[("Paris", "LOC")]},
+    }
+    assert stock.exporter_dictionnaire("ORG") == {"Lyon": pseudonymes[("Lyon", "ORG")]}
+
+    chemin_json = tmp_path / "correspondances.json"
+    stock.exporter_json(str(chemin_json))
+    stock.fermer()
+    assert sum(len(par_label) for par_label in json.loads(chemin_json.read_text(encoding="utf-8")).values()) == 3
+    assert charger_table_inverse([str(chemin_json)]) == {pseudonyme: original for (original, _), pseudonyme in pseudonymes.items()}
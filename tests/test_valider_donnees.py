@@ -0,0 +1,36 @@
+import json
+
+import spacy
+from spacy.attrs import ORTH
+
+from valider_donnees import chemin_index_validation, obtenir_index_validation
+
+
+def test_index_de_validation_propre_au_tokeniseur(tmp_path):
+    chemin_donnees = tmp_path / "donnees.json"
+    with open(chemin_donnees, "w", encoding="utf-8") as f:
+        json.dump([["JeanPaul arrive demain.", {"entities": [[0, 4, "PER"]]}]], f)
+    nlp_base = spacy.blank("fr")
+    nlp_modele = spacy.blank("fr")
+    nlp_modele.tokenizer.add_special_case("JeanPaul", [{ORTH: "Jean"}, {ORTH: "Paul"}])
+
+    index_base = obtenir_index_validation(str(chemin_donnees), nlp_base)
+    index_modele = obtenir_index_validation(str(chemin_donnees), nlp_modele)
+
+    assert index_base["nb_valides"] == 0 # « Jean » ne tombe pas sur une frontière de token du tokeniseur de base
+    assert index_modele["nb_valides"] == 1
+    assert chemin_index_validation(str(chemin_donnees), nlp_base) != chemin_index_validation(str(chemin_donnees), nlp_modele)
+    assert obtenir_index_validation(str(chemin_donnees), nlp_base)["nb_valides"] == 0 # Index relu : pas écrasé par l'autre tokeniseur
+
+
+def test_rapport_de_validation_dans_le_journal(tmp_path, capsys):
+    chemin_donnees = tmp_path / "donnees.json"
+    with open(chemin_donnees, "w", encoding="utf-8") as f:
+        json.dump([["Jean arrive.", {"entities": [[0, 4, "PER"]]}], ["Jean arrive.", {"entities": [[0, 2, "PER"]]}]], f)
+    messages = []
+
+    obtenir_index_validation(str(chemin_donnees), spacy.blank("fr"), journal=messages.append)
+
+    assert messages[0] == f"Validation de '{chemin_donnees}' : 1/2 exemples valides."
+    assert any("exclus" in message for message in messages[1:])
+    assert capsys.readouterr().out == ""
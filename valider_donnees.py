@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+
+import spacy
+
+# --- Configuration ---
+LANGUE_TOKENISEUR = "fr" # Même tokeniseur que les modèles fr_core_news_*
+SUFFIXE_INDEX = ".validation.{tokeniseur}.json" # L'index est écrit à côté du fichier de données, un par tokeniseur
+LONGUEUR_EMPREINTE_NOM = 12 # Caractères de l'empreinte du tokeniseur gardés dans le nom de l'index
+TAILLE_LECTURE_EMPREINTE = 1024 * 1024
+
+
+def empreinte_fichier(chemin_fichier):
+    """Empreinte SHA-256 du contenu d'un fichier, lu par blocs."""
+    hachage = hashlib.sha256()
+    with open(chemin_fichier, "rb") as f:
+        for bloc in iter(lambda: f.read(TAILLE_LECTURE_EMPREINTE), b""):
+            hachage.update(bloc)
+    return hachage.hexdigest()
+
+
+def empreinte_tokeniseur(nlp):
+    """Deux tokeniseurs de même empreinte découpent les textes de la même façon."""
+    return hashlib.sha256(nlp.tokenizer.to_bytes(exclude=["vocab"])).hexdigest()
+
+
+def iterer_elements_bruts(chemin_fichier):
+    """
+    Éléments d'un fichier .json ou .jsonl tels quels, numérotés comme dans format_donnees.iterer_exemples
+    (les lignes vides d'un .jsonl ne comptent pas). Une ligne JSONL illisible donne None.
+    """
+    if chemin_fichier.endswith(".jsonl"):
+        with open(chemin_fichier, "r", encoding="utf-8") as f:
+            for ligne in f:
+                if not ligne.strip():
+                    continue
+                try:
+                    yield json.loads(ligne)
+                except json.JSONDecodeError:
+                    yield None
+    else:
+        with open(chemin_fichier, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def verifier_exemple(nlp, texte, entites, doc=None):
+    """
+    Retourne la raison pour laquelle un exemple (texte, [(debut, fin, label)]) est inutilisable,
+    ou None s'il est valide : positions hors du texte, entités qui se chevauchent,
+    ou entité dont les bornes ne tombent pas sur des frontières de tokens.
+    `doc` : texte déjà tokenisé, s'il est disponible.
+    """
+    fin_precedente = 0
+    for debut, fin, _ in sorted(entites):
+        if not (0 <= debut < fin <= len(texte)):
+            return "positions_invalides"
+        if debut < fin_precedente:
+            return "chevauchement"
+        fin_precedente = fin
+    for debut, fin, label in entites:
+        doc = doc or nlp.make_doc(texte)
+        if doc.char_span(debut, fin, label=label) is None:
+            return "non_aligne"
+    return None
+
+
+def lire_exemple_brut(element):
+    """Contrôle la forme d'un élément brut et retourne (texte, entités), ou None s'il est mal formé."""
+    if not isinstance(element, (list, tuple)) or len(element) != 2:
+        return None
+    texte, annotations = element
+    if not isinstance(texte, str) or not isinstance(annotations, dict):
+        return None
+    entites = annotations.get("entities", [])
+    if not isinstance(entites, list):
+        return None
+    for ent in entites:
+        if not (isinstance(ent, (list, tuple)) and len(ent) == 3 and isinstance(ent[0], int) and isinstance(ent[1], int) and isinstance(ent[2], str)):
+            return None
+    return texte, [tuple(ent) for ent in entites]
+
+
+def valider_exemples(elements, nlp):
+    """
+    Passe de validation unique sur un jeu d'exemples bruts. Retourne un index compact :
+    les numéros des exemples exclus avec leur raison (les autres sont valides),
+    le nombre d'exclusions par raison et le nombre d'entités par label parmi les exemples conservés.
+    Les doublons exacts sont exclus ; un même texte annoté différemment est exclu comme "conflit".
+    """
+    exclus = {}
+    labels = Counter()
+    annotations_par_texte = {} # empreinte du texte -> empreinte des annotations (16 octets chacune)
+    nb_exemples = 0
+    for numero, element in enumerate(elements):
+        nb_exemples += 1
+        exemple = lire_exemple_brut(element)
+        if exemple is None:
+            exclus[numero] = "malforme"
+            continue
+        texte, entites = exemple
+        raison = verifier_exemple(nlp, texte, entites)
+        if raison is None:
+            cle_texte = hashlib.blake2b(texte.encode("utf-8"), digest_size=16).digest()
+            cle_annotations = hashlib.blake2b(repr(sorted(entites)).encode("utf-8"), digest_size=16).digest()
+            if cle_texte in annotations_par_texte:
+                raison = "doublon" if annotations_par_texte[cle_texte] == cle_annotations else "conflit"
+            else:
+                annotations_par_texte[cle_texte] = cle_annotations
+        if raison:
+            exclus[numero] = raison
+            continue
+        labels.update(label for _, _, label in entites)
+    return {
+        "nb_exemples": nb_exemples,
+        "nb_valides": nb_exemples - len(exclus),
+        "exclus": exclus,
+        "raisons": dict(Counter(exclus.values())),
+        "labels": dict(labels),
+    }
+
+
+def afficher_rapport(index, chemin_fichier, journal=print):
+    journal(f"Validation de '{chemin_fichier}' : {index['nb_valides']}/{index['nb_exemples']} exemples valides.")
+    for raison, nb in sorted(index["raisons"].items()):
+        journal(f"  - {nb} exclus ({raison})")
+    journal(f"  Entités par label : {', '.join(f'{label}={nb}' for label, nb in sorted(index['labels'].items())) or 'aucune'}")
+
+
+def chemin_index_validation(chemin_fichier, nlp):
+    """`<fichier>.validation.<empreinte du tokeniseur>.json` : chaque tokeniseur a son propre index."""
+    return chemin_fichier + SUFFIXE_INDEX.format(tokeniseur=empreinte_tokeniseur(nlp)[:LONGUEUR_EMPREINTE_NOM])
+
+
+def obtenir_index_validation(chemin_fichier, nlp=None, forcer=False, journal=print):
+    """
+    Retourne l'index de validation d'un fichier .json/.jsonl, calculé une seule fois puis relu depuis
+    `<fichier>.validation.<empreinte du tokeniseur>.json` tant que le fichier de données et le tokeniseur n'ont pas changé.
+    `nlp` : modèle dont le tokeniseur découpera les textes à l'entraînement (l'alignement des entités en dépend) ;
+    à défaut, tokeniseur français de base. Les numéros d'exemples exclus sont des entiers (les clés JSON sont reconverties).
+    Le rapport de validation passe par `journal` (le journal de l'interface graphique, par exemple).
+    """
+    nlp = nlp or spacy.blank(LANGUE_TOKENISEUR)
+    chemin_index = chemin_index_validation(chemin_fichier, nlp)
+    empreintes = {"empreinte_donnees": empreinte_fichier(chemin_fichier), "empreinte_tokeniseur": empreinte_tokeniseur(nlp)}
+    index = None
+    if not forcer and os.path.exists(chemin_index):
+        with open(chemin_index, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if all(index.get(cle) == valeur for cle, valeur in empreintes.items()):
+            index["exclus"] = {int(numero): raison for numero, raison in index["exclus"].items()}
+            journal(f"Index de validation réutilisé : '{chemin_index}'")
+        else:
+            index = None
+    if index is None:
+        index = valider_exemples(iterer_elements_bruts(chemin_fichier), nlp)
+        index.update(empreintes)
+        # Écriture atomique : plusieurs processus (balayage d'hyperparamètres) peuvent calculer le même index en même temps.
+        chemin_temporaire = f"{chemin_index}.{os.getpid()}.tmp"
+        with open(chemin_temporaire, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=4)
+        os.replace(chemin_temporaire, chemin_index)
+    afficher_rapport(index, chemin_fichier, journal)
+    return index
+
+
+# --- Programme Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Valide une fois pour toutes un fichier de données d'entraînement (.json ou .jsonl).")
+    parser.add_argument("--donnees", required=True, help="Fichier de données d'entraînement à valider.")
+    parser.add_argument("--modele", help="Modèle SpaCy dont le tokeniseur sert à vérifier l'alignement (défaut : tokeniseur français de base).")
+    parser.add_argument("--forcer", action="store_true", help="Recalcule l'index même s'il est à jour.")
+    args = parser.parse_args()
+
+    obtenir_index_validation(args.donnees, spacy.load(args.modele) if args.modele else None, args.forcer)